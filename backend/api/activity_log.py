@@ -0,0 +1,125 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .models import UserActivityLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # 'buffered': escritura diferida en lotes, 'sync': un INSERT por registro
+    'MODE': 'buffered',
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_PENDING': 10000,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'ACTIVITY_LOG', {}).get(name, DEFAULTS[name])
+
+
+class ActivityLogBuffer:
+    """
+    Cola en memoria de registros de actividad.
+
+    Los registros se acumulan y un hilo en segundo plano los inserta con
+    bulk_create cuando se alcanza BATCH_SIZE o pasa FLUSH_INTERVAL, de modo
+    que las peticiones no esperan el INSERT ni el bloqueo de escritura.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            pending = len(self._entries)
+        if pending >= get_setting('MAX_PENDING'):
+            # El hilo no da abasto: la petición escribe la cola ella misma en vez
+            # de descartar registros (p. ej. failed_login) o dejarla crecer sin límite
+            self.flush()
+            return
+        self._ensure_worker()
+        if pending >= get_setting('BATCH_SIZE'):
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            entries, self._entries = self._entries, []
+        if not entries:
+            return 0
+        try:
+            UserActivityLog.objects.bulk_create(entries, batch_size=get_setting('BATCH_SIZE'))
+        except Exception:
+            logger.exception('Error al registrar actividad en lote')
+            # Un registro inválido no debe descartar el lote completo
+            for entry in entries:
+                try:
+                    entry.save()
+                except Exception:
+                    logger.exception('Error al registrar actividad: %s', entry.activity_type)
+        return len(entries)
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _ensure_worker(self):
+        # Tras un fork (p. ej. gunicorn --preload) el hilo no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='activity-log-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(get_setting('FLUSH_INTERVAL'))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # El hilo tiene su propia conexión; se cierra para no dejarla abierta
+                connection.close()
+
+
+buffer = ActivityLogBuffer()
+
+
+def record_activity(user, activity_type, details, ip_address=None, company_id=None):
+    try:
+        company_id = int(company_id) if company_id else None
+    except (TypeError, ValueError):
+        company_id = None
+
+    entry = UserActivityLog(
+        user_id=user.pk,
+        activity_type=activity_type,
+        details=details,
+        ip_address=ip_address or None,
+        company_id=company_id,
+    )
+    if get_setting('MODE') == 'sync':
+        entry.save()
+    else:
+        buffer.add(entry)
+    return entry
+
+
+def flush():
+    return buffer.flush()
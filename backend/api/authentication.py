@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .shared_cache import is_process_local
+
+# Los claims van en un único objeto compacto y versionado dentro del token
+CLAIMS_KEY = 'ctx'
+CLAIMS_FORMAT = 1
+VERSION_CACHE_KEY = 'jwt_claims_version:{}'
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'VERSION_TTL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'JWT_CLAIMS', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def build_user_claims(user):
+    """Claims de autorización que viajan en el access token."""
+    companies = {
+        str(company_id): [role, int(is_admin)]
+        for company_id, role, is_admin in user.company_users.filter(
+            is_active=True,
+            company__is_active=True
+        ).values_list('company_id', 'role', 'is_company_admin')
+    }
+    return {
+        'f': CLAIMS_FORMAT,
+        'v': user.claims_version,
+        'un': user.username,
+        'su': int(user.is_superuser),
+        'sa': int(user.is_system_admin),
+        'st': int(user.is_staff),
+        'g': list(user.groups.values_list('id', flat=True)),
+        'c': companies,
+    }
+
+
+def load_claims_version(user_id):
+    return User.objects.filter(pk=user_id, is_active=True).values_list(
+        'claims_version', flat=True
+    ).first()
+
+
+def get_claims_version(user_id):
+    """Versión vigente de los claims del usuario; None si no existe o está inactivo."""
+    if is_process_local(get_setting('CACHE_ALIAS')):
+        # Una caché por proceso no ve las revocaciones hechas en otros workers:
+        # se consulta la versión (una fila por PK) en cada petición
+        return load_claims_version(user_id)
+    key = VERSION_CACHE_KEY.format(user_id)
+    version = get_cache().get(key)
+    if version is None:
+        version = load_claims_version(user_id)
+        if version is not None:
+            get_cache().set(key, version, get_setting('VERSION_TTL'))
+    return version
+
+
+def forget_claims_version(*user_ids):
+    if not is_process_local(get_setting('CACHE_ALIAS')):
+        get_cache().delete_many([VERSION_CACHE_KEY.format(user_id) for user_id in user_ids])
+
+
+def bump_claims_version(*user_ids):
+    """Invalida los claims emitidos para los usuarios indicados."""
+    if not user_ids:
+        return
+    User.objects.filter(pk__in=user_ids).update(claims_version=F('claims_version') + 1)
+    forget_claims_version(*user_ids)
+
+
+class ClaimsUser:
+    """
+    Usuario construido desde los claims del token.
+
+    Expone sin consultas los datos que viajan en el token (flags, grupos y
+    roles por empresa); cualquier otro atributo carga el User real desde la
+    base de datos la primera vez que se usa.
+    """
+    is_active = True
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, user_id, claims):
+        self._user = None
+        self.id = self.pk = user_id
+        self.username = claims.get('un', '')
+        self.claims_version = claims.get('v')
+        self.is_superuser = bool(claims.get('su'))
+        self.is_system_admin = bool(claims.get('sa'))
+        self.is_staff = bool(claims.get('st'))
+        self.group_ids = claims.get('g', [])
+        self.company_roles = {
+            int(company_id): (role, bool(is_admin))
+            for company_id, (role, is_admin) in claims.get('c', {}).items()
+        }
+
+    def get_db_user(self):
+        if self._user is None:
+            self._user = User.objects.get(pk=self.pk)
+        return self._user
+
+    def __getattr__(self, name):
+        # Solo se invoca para atributos que no vienen en los claims
+        if name.startswith('__') or name == '_user':
+            raise AttributeError(name)
+        return getattr(self.get_db_user(), name)
+
+    def __eq__(self, other):
+        return isinstance(other, (ClaimsUser, User)) and self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.username
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que evita el SELECT del usuario en cada petición.
+
+    Si el token trae claims con la versión vigente del usuario se devuelve un
+    ClaimsUser; si faltan o están obsoletos se usa la carga normal desde la
+    base de datos.
+    """
+
+    def get_user(self, validated_token):
+        claims = validated_token.get(CLAIMS_KEY)
+        if not isinstance(claims, dict) or claims.get('f') != CLAIMS_FORMAT:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = get_claims_version(user_id)
+        if version is None:
+            # Usuario eliminado o inactivo: se deja que la ruta normal lo rechace
+            return super().get_user(validated_token)
+        if version != claims.get('v'):
+            return super().get_user(validated_token)
+        return ClaimsUser(user_id, claims)
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend que verifica la contraseña en el pool de hashing.
+
+    Con una ráfaga de logins al inicio de turno el costo del hasher queda
+    en los procesos del pool y no en los hilos del servidor; si la cola
+    está llena se lanza HashingBusy (503 con Retry-After).
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Mismo costo que con un usuario existente para no revelar cuáles existen
+            hashing.hash_password(password)
+            return None
+        if hashing.verify_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,151 @@
+import io
+import json
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+DEFAULTS = {
+    # Máximo de sub-peticiones por lote
+    'MAX_REQUESTS': 20,
+}
+
+# Cabeceras que cada sub-petición puede fijar; el resto se hereda de la petición del lote
+ALLOWED_HEADERS = ('If-None-Match', 'If-Modified-Since')
+# Condiciones de la petición del lote que no se heredan: cada sub-petición trae las suyas
+CONDITIONAL_META = (
+    'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IF_RANGE',
+)
+# Cabeceras de la respuesta que se devuelven al cliente
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Retry-After')
+
+
+def get_setting(name):
+    return getattr(settings, 'BATCH_REQUESTS', {}).get(name, DEFAULTS[name])
+
+
+class BatchError(Exception):
+    """El lote está mal formado; no se ejecutó ninguna sub-petición."""
+
+
+def parse_batch(data):
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError('Se espera una lista requests')
+    max_requests = get_setting('MAX_REQUESTS')
+    if len(items) > max_requests:
+        raise BatchError(f'Máximo {max_requests} peticiones por lote')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) or not item['path'].startswith('/'):
+            raise BatchError(f'Petición {index}: path debe ser una ruta absoluta')
+        method = str(item.get('method', 'GET')).upper()
+        if method != 'GET':
+            raise BatchError(f'Petición {index}: solo se admiten peticiones GET')
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict) or set(headers) - set(ALLOWED_HEADERS):
+            raise BatchError(f'Petición {index}: solo se admiten las cabeceras {", ".join(ALLOWED_HEADERS)}')
+        parsed.append((method, item['path'], headers))
+    return parsed
+
+
+def build_request(request, method, url, headers):
+    """
+    Sub-petición que comparte usuario, empresa y membresías con la del lote.
+
+    Se copia el META original (X-Company-ID, Host, Accept...) y se fuerza
+    la autenticación ya resuelta, así las vistas no vuelven a validar el
+    JWT ni a consultar la empresa del usuario. Las cabeceras condicionales
+    del lote no se copian: un If-None-Match dirigido al lote no debe
+    convertir en 304 las sub-peticiones.
+    """
+    parent = request._request
+    parts = urlsplit(url)
+    environ = dict(parent.META)
+    environ.pop('CONTENT_TYPE', None)
+    for name in CONDITIONAL_META:
+        environ.pop(name, None)
+    environ.update({
+        'REQUEST_METHOD': method,
+        # Como en WSGI: la ruta sin codificar, como bytes leídos en latin-1
+        'PATH_INFO': unquote_to_bytes(parts.path).decode('iso-8859-1'),
+        'QUERY_STRING': parts.query,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in headers.items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+
+    sub = WSGIRequest(environ)
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    # El tenant ya resuelto (SimpleLazyObject) y las membresías memoizadas
+    sub.company = getattr(parent, 'company', None)
+    if hasattr(parent, '_company_memberships'):
+        sub._company_memberships = parent._company_memberships
+    return sub
+
+
+def response_body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset or 'utf-8')
+
+
+def dispatch(request, method, url, headers, batch_view):
+    """Ejecuta una sub-petición contra el URLconf y devuelve su resultado."""
+    sub = build_request(request, method, url, headers)
+    try:
+        match = resolve(sub.path_info)
+    except Resolver404:
+        return {'status': 404, 'headers': {}, 'body': {'detail': 'No encontrado.'}}
+    if match.func is batch_view:
+        return {'status': 400, 'headers': {}, 'body': {'detail': 'No se pueden anidar lotes'}}
+    # Solo vistas DRF: el admin o los archivos de media devuelven plantillas sin
+    # renderizar o lanzan excepciones que tumbarían el lote completo
+    view_class = getattr(match.func, 'cls', None)
+    if not (isinstance(view_class, type) and issubclass(view_class, APIView)):
+        return {'status': 400, 'headers': {}, 'body': {'detail': 'Ruta no disponible en un lote'}}
+
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Http404:
+        return {'status': 404, 'headers': {}, 'body': {'detail': 'No encontrado.'}}
+    except PermissionDenied:
+        return {'status': 403, 'headers': {}, 'body': {'detail': 'No tiene permiso para realizar esta acción.'}}
+    if response.streaming:
+        # Exportes, archivos y ?stream=1 no tienen tamaño acotado: no se arman en memoria dentro del lote
+        response.close()
+        return {
+            'status': 400, 'headers': {},
+            'body': {'detail': 'Las respuestas en streaming no se pueden incluir en un lote'},
+        }
+
+    # Las membresías cargadas por una sub-petición sirven para las siguientes
+    parent = request._request
+    if hasattr(sub, '_company_memberships') and not hasattr(parent, '_company_memberships'):
+        parent._company_memberships = sub._company_memberships
+
+    return {
+        'status': response.status_code,
+        'headers': {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)},
+        'body': response_body(response),
+    }
+
+
+def run_batch(request, items, batch_view):
+    return [dispatch(request, method, url, headers, batch_view) for method, url, headers in items]
@@ -0,0 +1,245 @@
+import decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    # False vuelve a serializar con DRF (útil para comparar salidas)
+    'ENABLED': True,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'COMPILED_SERIALIZERS', {}).get(name, DEFAULTS[name])
+
+
+def identity(value):
+    return value
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != 'iso-8601' or hasattr(field, 'timezone'):
+        return field.to_representation
+    fallback = field.to_representation
+
+    def convert(value, timezone):
+        # Mismo resultado que DateTimeField.to_representation para fechas con zona
+        if not value or value.tzinfo is None or timezone is None:
+            return fallback(value)
+        value = value.astimezone(timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    convert.needs_timezone = True
+    return convert
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or field.normalize_output or not coerce_to_string or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+    fallback = field.to_representation
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return fallback(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def file_converter(field, model_field):
+    storage = model_field.storage
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def convert(value, request):
+        # values() entrega el nombre del archivo, no un FieldFile
+        if not value:
+            return None
+        if not use_url:
+            return value
+        url = storage.url(value)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    convert.needs_request = True
+    return convert
+
+
+def choice_converter(field):
+    choices = field.choice_strings_to_values
+
+    def convert(value):
+        if value in ('', None):
+            return value
+        return choices.get(str(value), value)
+    return convert
+
+
+def simple_converter(field):
+    if isinstance(field, (serializers.BooleanField, serializers.PrimaryKeyRelatedField)):
+        return identity
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.CharField):
+        return str
+    return None
+
+
+class CompiledSerializer:
+    """
+    Ruta de lectura rápida para un ModelSerializer existente.
+
+    Al primer uso se recorren los campos de serializer_class y se arma un
+    plan: la columna de values() de cada campo y un conversor ya resuelto
+    (Decimal, fechas, URL de imágenes). Luego cada fila es un dict de la
+    base convertido con un diccionario por comprensión, sin instanciar
+    modelos ni campos de DRF. La salida es idéntica a la del serializer.
+
+    Los SerializerMethodField se resuelven por lote con un método
+    fetch_<campo>(rows) que devuelve {pk: valor}. Con fields=[...] solo se
+    leen las columnas de esos campos (y no se consultan los demás).
+    """
+    serializer_class = None
+
+    def __init__(self, context=None, fields=None):
+        self.context = context or {}
+        plan = self.get_plan()
+        if fields is not None:
+            plan = [step for step in plan if step[0] in fields]
+        self.plan = plan
+
+    @classmethod
+    def get_plan(cls):
+        # Se compila una vez por clase
+        plan = cls.__dict__.get('_plan')
+        if plan is None:
+            plan = cls.compile()
+            cls._plan = plan
+        return plan
+
+    @classmethod
+    def compile(cls):
+        serializer = cls.serializer_class()
+        model = serializer.Meta.model
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if not hasattr(cls, f'fetch_{name}'):
+                    raise ImproperlyConfigured(f'{cls.__name__} necesita fetch_{name}(rows)')
+                plan.append((name, None, None, None))
+                continue
+
+            attrs = field.source_attrs
+            if len(attrs) > 2:
+                raise ImproperlyConfigured(f'{cls.__name__}: {field.source} cruza más de una relación')
+            column = LOOKUP_SEP.join(attrs)
+            model_field = model._meta.get_field(attrs[0])
+            relation = None
+            if len(attrs) > 1:
+                # Con una FK opcional se lee también su id: si es NULL DRF omite el campo
+                if model_field.null:
+                    relation = attrs[0]
+                model_field = model_field.related_model._meta.get_field(attrs[-1])
+
+            if isinstance(field, serializers.DateTimeField):
+                converter = datetime_converter(field)
+            elif isinstance(field, serializers.DecimalField):
+                converter = decimal_converter(field)
+            elif isinstance(field, serializers.FileField):
+                converter = file_converter(field, model_field)
+            elif isinstance(field, serializers.ChoiceField):
+                converter = choice_converter(field)
+            else:
+                converter = simple_converter(field) or field.to_representation
+
+            missing = empty
+            if relation:
+                if field.default is not empty:
+                    missing = field.get_default()
+                elif field.allow_null:
+                    missing = None
+            plan.append((name, column, converter, (relation, missing)))
+        return plan
+
+    @classmethod
+    def field_names(cls):
+        return [step[0] for step in cls.get_plan()]
+
+    def columns(self):
+        columns = []
+        for name, column, converter, missing in self.plan:
+            if column is None:
+                continue
+            columns.append(column)
+            relation = missing[0]
+            if relation and relation not in columns:
+                columns.append(relation)
+        pk_name = self.serializer_class.Meta.model._meta.pk.name
+        if pk_name not in columns:
+            columns.append(pk_name)
+        return columns
+
+    def values(self, queryset):
+        """El queryset como dicts con las columnas que necesita el plan."""
+        return queryset.values(*self.columns())
+
+    def paginate(self, paginator, queryset, request):
+        """Respuesta paginada con las filas leídas como dicts."""
+        page = paginator.paginate_queryset(queryset, request, values=self.columns())
+        return paginator.get_paginated_response(self.serialize(page))
+
+    def serialize(self, rows):
+        """Lista de dicts a partir de filas de values(), en el mismo orden."""
+        rows = list(rows)
+        request = self.context.get('request')
+        timezone = serializers.DateTimeField().default_timezone()
+        pk_name = self.serializer_class.Meta.model._meta.pk.name
+
+        steps = []
+        for name, column, converter, missing in self.plan:
+            if column is None:
+                by_pk = getattr(self, f'fetch_{name}')(rows)
+                steps.append((name, pk_name, by_pk.get, (None, empty)))
+                continue
+            if getattr(converter, 'needs_timezone', False):
+                converter = _bind(converter, timezone)
+            elif getattr(converter, 'needs_request', False):
+                converter = _bind(converter, request)
+            steps.append((name, column, converter, missing))
+
+        if any(missing[0] for _, _, _, missing in steps):
+            return [self.to_representation(row, steps) for row in rows]
+        # Caso común: sin relaciones opcionales, un dict por comprensión por fila
+        return [
+            {name: (None if row[column] is None else convert(row[column])) for name, column, convert, _ in steps}
+            for row in rows
+        ]
+
+    def to_representation(self, row, steps):
+        data = {}
+        for name, column, convert, (relation, missing) in steps:
+            if relation and row[relation] is None:
+                if missing is not empty:
+                    data[name] = missing
+                continue
+            value = row[column]
+            data[name] = None if value is None else convert(value)
+        return data
+
+
+def _bind(converter, argument):
+    def convert(value):
+        return converter(value, argument)
+    return convert
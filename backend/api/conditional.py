@@ -0,0 +1,41 @@
+import hashlib
+
+from django.views.decorators.http import condition
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def memoize_on_request(request, name, func):
+    """Calcula func() una sola vez por petición (lo comparten ETag y Last-Modified)."""
+    django_request = getattr(request, '_request', request)
+    attr = f'_conditional_{name}'
+    if not hasattr(django_request, attr):
+        setattr(django_request, attr, func())
+    return getattr(django_request, attr)
+
+
+def safe_methods_only(func):
+    if func is None:
+        return None
+
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return func(request, *args, **kwargs)
+    return wrapper
+
+
+def conditional_get(etag_func=None, last_modified_func=None):
+    """
+    GET condicional para vistas de DRF.
+
+    Se aplica debajo de @api_view para que los validadores vean al usuario
+    autenticado; si If-None-Match coincide se responde 304 sin ejecutar la
+    vista ni los serializadores.
+    """
+    return condition(
+        etag_func=safe_methods_only(etag_func),
+        last_modified_func=safe_methods_only(last_modified_func)
+    )
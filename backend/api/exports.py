@@ -0,0 +1,107 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+DEFAULTS = {
+    # Filas leídas por viaje a la base de datos
+    'CHUNK_SIZE': 2000,
+    # Bytes acumulados antes de entregar un trozo al servidor
+    'BUFFER_BYTES': 64 * 1024,
+}
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+
+
+def get_setting(name):
+    return getattr(settings, 'EXPORTS', {}).get(name, DEFAULTS[name])
+
+
+class Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def clean(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def buffered(pieces):
+    # Agrupa las filas para no entregar al servidor un trozo por fila
+    limit = get_setting('BUFFER_BYTES')
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= limit:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_stream(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([clean(value) for value in row])
+
+
+def jsonl_stream(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, (clean(value) for value in row)))) + '\n'
+
+
+def gzip_stream(chunks):
+    # wbits 31 produce un gzip válido escribiendo a medida que llegan los datos
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, columns, filename, output):
+    """
+    Exporta queryset como CSV o JSONL comprimido sin cargarlo en memoria.
+
+    columns es una secuencia de (encabezado, campo). Las filas se leen como
+    tuplas con values_list().iterator(), se codifican de a una y se
+    entregan por trozos, así la memoria no crece con el tamaño del export.
+    """
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(
+        chunk_size=get_setting('CHUNK_SIZE')
+    )
+    if output == JSONL:
+        response = StreamingHttpResponse(
+            gzip_stream(buffered(jsonl_stream(headers, rows))),
+            content_type='application/gzip'
+        )
+        filename = f'{filename}.jsonl.gz'
+    else:
+        response = StreamingHttpResponse(
+            buffered(csv_stream(headers, rows)),
+            content_type='text/csv; charset=utf-8'
+        )
+        filename = f'{filename}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
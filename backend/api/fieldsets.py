@@ -0,0 +1,72 @@
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def split_names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request, available):
+    """
+    Campos pedidos con ?fields=a,b o ?exclude=c, en el orden de available.
+
+    Devuelve None si no se usó ninguno de los dos parámetros (todos los
+    campos). Un nombre desconocido responde 400.
+    """
+    fields = split_names(request.query_params.get(FIELDS_PARAM))
+    exclude = split_names(request.query_params.get(EXCLUDE_PARAM))
+    if not fields and not exclude:
+        return None
+    unknown = (fields | exclude) - set(available)
+    if unknown:
+        raise ParseError(f'Campos desconocidos: {", ".join(sorted(unknown))}')
+    selected = [name for name in available if (not fields or name in fields) and name not in exclude]
+    if not selected:
+        raise ParseError('Debe quedar al menos un campo')
+    return selected
+
+
+class SparseFieldsMixin:
+    """
+    Serializer que acepta fields=[...] para entregar solo esos campos.
+
+    Pensado para lecturas: ProductSerializer(page, many=True, fields=['id', 'name']).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def prune_queryset(cls, queryset, fields, extra=()):
+        """
+        Limita las columnas leídas a las que usan los campos pedidos.
+
+        Con only() no se leen textos largos ni imágenes que no se van a
+        entregar, y los select_related de campos no pedidos (p. ej.
+        category.name) se quitan para no hacer el join.
+        """
+        if fields is None:
+            return queryset
+        serializer_fields = cls().fields
+        # Los campos del orden se leen siempre; las anotaciones no van en only()
+        lookups = {queryset.model._meta.pk.name}
+        lookups.update(name for name in extra if name not in queryset.query.annotations)
+        relations = set()
+        for name in fields:
+            field = serializer_fields[name]
+            if isinstance(field, serializers.SerializerMethodField):
+                continue
+            lookups.add(LOOKUP_SEP.join(field.source_attrs))
+            if len(field.source_attrs) > 1:
+                relations.add(field.source_attrs[0])
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*lookups)
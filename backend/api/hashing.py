@@ -0,0 +1,202 @@
+import asyncio
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password as django_check_password
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULTS = {
+    # Procesos del pool; None usa la cantidad de CPUs
+    'WORKERS': None,
+    # Con menos contraseñas que esto se calculan en el mismo hilo
+    'MIN_POOL_BATCH': 4,
+    # Contraseñas por tarea en un alta masiva
+    'BULK_CHUNK_SIZE': 8,
+    # Tareas de un alta masiva en cola a la vez; None usa la mitad de los
+    # procesos, así los logins no esperan detrás de todo el lote
+    'BULK_PENDING': None,
+    # Verificaciones en cola o en curso; por sobre esto se responde 503
+    'MAX_PENDING': 64,
+    # Espera máxima por un lugar en la cola antes de rechazar
+    'ACQUIRE_TIMEOUT': 1.0,
+    'RETRY_AFTER': 2,
+    # False verifica en el hilo de la petición (sin pool) en login y cambio de contraseña
+    'POOL_LOGINS': True,
+}
+
+_executor = None
+_pending = None
+_executor_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(name, DEFAULTS[name])
+
+
+class HashingBusy(APIException):
+    """La cola del pool está llena: el cliente debe reintentar más tarde."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Servidor ocupado validando credenciales, reintenta en unos segundos'
+    default_code = 'hashing_busy'
+
+    def __init__(self):
+        super().__init__()
+        retry_after = get_setting('RETRY_AFTER')
+        # DRF envía wait como Retry-After; con jitter para repartir los reintentos
+        self.wait = retry_after + random.randint(0, retry_after)
+
+
+def setup_worker(settings_module):
+    # Cada proceso del pool necesita la configuración de Django para leer PASSWORD_HASHERS
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def get_workers():
+    return get_setting('WORKERS') or os.cpu_count() or 1
+
+
+def get_pool():
+    """El pool y su semáforo de MAX_PENDING; se crean juntos."""
+    global _executor, _pending
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=get_workers(),
+                initializer=setup_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),)
+            )
+            _pending = threading.BoundedSemaphore(get_setting('MAX_PENDING'))
+        return _executor, _pending
+
+
+def get_executor():
+    return get_pool()[0]
+
+
+def warm_up():
+    """Arranca los procesos del pool para que el primer login no pague su creación."""
+    if not get_setting('POOL_LOGINS'):
+        return
+    executor = get_executor()
+    for future in [executor.submit(os.getpid) for _ in range(get_workers())]:
+        future.result()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def submit(fn, *args, block=True):
+    """
+    Encola fn en el pool respetando MAX_PENDING.
+
+    Si la cola está llena se espera a lo más ACQUIRE_TIMEOUT (nada con
+    block=False) y luego se lanza HashingBusy; así una ráfaga de logins
+    recibe 503 con Retry-After en vez de acumular hilos bloqueados.
+    """
+    # Se libera el mismo semáforo que se tomó, aunque shutdown() cree otro pool entremedio
+    executor, pending = get_pool()
+    acquired = pending.acquire(timeout=get_setting('ACQUIRE_TIMEOUT')) if block else pending.acquire(False)
+    if not acquired:
+        raise HashingBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        pending.release()
+        raise
+    future.add_done_callback(lambda _: pending.release())
+    return future
+
+
+def make_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def hash_passwords(passwords):
+    """
+    Hashes de varias contraseñas, en el mismo orden.
+
+    El hasher configurado es deliberadamente lento (PBKDF2), así que los
+    lotes grandes se reparten entre los procesos del pool en vez de
+    ocupar el hilo de la petición con uno tras otro. Las tareas pasan por
+    submit() y a lo más BULK_PENDING quedan en cola a la vez: un alta de
+    mil usuarios no deja a los logins esperando detrás de todos sus hashes.
+    """
+    passwords = list(passwords)
+    if len(passwords) < get_setting('MIN_POOL_BATCH'):
+        return make_passwords(passwords)
+    size = get_setting('BULK_CHUNK_SIZE')
+    in_flight = get_setting('BULK_PENDING') or max(1, get_workers() // 2)
+    hashes = []
+    futures = deque()
+    try:
+        for start in range(0, len(passwords), size):
+            if len(futures) >= in_flight:
+                hashes.extend(futures.popleft().result())
+            futures.append(submit(make_passwords, passwords[start:start + size]))
+        while futures:
+            hashes.extend(futures.popleft().result())
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return hashes
+
+
+def hash_password(password):
+    if not get_setting('POOL_LOGINS'):
+        return make_password(password)
+    return submit(make_password, password).result()
+
+
+def check_password(password, encoded):
+    """Como django.contrib.auth.hashers.check_password, pero en el pool."""
+    if password is None or not is_password_usable(encoded):
+        return False
+    if not get_setting('POOL_LOGINS'):
+        return django_check_password(password, encoded)
+    return submit(django_check_password, password, encoded).result()
+
+
+async def ahash_password(password):
+    """Versión para vistas async (ASGI): espera el hash sin bloquear el event loop."""
+    if not get_setting('POOL_LOGINS'):
+        return make_password(password)
+    # Sin bloquear: el event loop no puede esperar un lugar en la cola
+    return await asyncio.wrap_future(submit(make_password, password, block=False))
+
+
+async def acheck_password(password, encoded):
+    if password is None or not is_password_usable(encoded):
+        return False
+    if not get_setting('POOL_LOGINS'):
+        return django_check_password(password, encoded)
+    return await asyncio.wrap_future(submit(django_check_password, password, encoded, block=False))
+
+
+def verify_user_password(user, password):
+    """
+    Verifica la contraseña de user en el pool.
+
+    Si el hash usa parámetros viejos (p. ej. menos iteraciones) se vuelve a
+    calcular y guardar, como hace User.check_password.
+    """
+    if not check_password(password, user.password):
+        return False
+    preferred = get_hasher('default')
+    if identify_hasher(user.password).algorithm != preferred.algorithm or preferred.must_update(user.password):
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return True
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.retention import archive_logs, get_setting
+
+
+class Command(BaseCommand):
+    help = 'Archiva en archivos comprimidos por empresa y mes los logs de actividad más antiguos que el horizonte'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help=f'Horizonte en días (por defecto {get_setting("DAYS")})')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        rows = archive_logs(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} logs archivados en {time.monotonic() - start:.2f}s '
+            f'(directorio: {get_setting("ARCHIVE_DIR")})'
+        ))
@@ -0,0 +1,87 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api import hashing
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = 'Mide logins por segundo contra /api/token/ según la cantidad de procesos de hashing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default='0,1,2,4',
+            help='Procesos del pool a probar, separados por coma (0 = verificación en el hilo de la petición)'
+        )
+        parser.add_argument('--threads', type=int, default=16, help='Clientes simultáneos')
+        parser.add_argument('--logins', type=int, default=10, help='Logins por cliente')
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(f'benchmark-{run}', 'benchmark@moonbar.cl', password)
+        try:
+            for workers in [int(value) for value in options['workers'].split(',')]:
+                self.measure(user.username, password, workers, options['threads'], options['logins'])
+        finally:
+            hashing.shutdown()
+            user.delete()
+
+    def measure(self, username, password, workers, threads, per_thread):
+        config = {
+            **getattr(settings, 'PASSWORD_HASHING', {}),
+            'WORKERS': workers or None,
+            'POOL_LOGINS': bool(workers),
+        }
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def client():
+            api = APIClient(SERVER_NAME='localhost')
+            local = []
+            local_statuses = {}
+            try:
+                for _ in range(per_thread):
+                    start = time.perf_counter()
+                    response = api.post('/api/token/', {'username': username, 'password': password}, format='json')
+                    local.append(time.perf_counter() - start)
+                    local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+                for code, count in local_statuses.items():
+                    statuses[code] = statuses.get(code, 0) + count
+
+        hashing.shutdown()
+        # Sin el límite por usuario: todos los clientes usan la misma cuenta
+        rate_limit = {**getattr(settings, 'RATE_LIMIT', {}), 'ENABLED': False}
+        with override_settings(PASSWORD_HASHING=config, RATE_LIMIT=rate_limit):
+            hashing.warm_up()
+            workers_threads = [threading.Thread(target=client) for _ in range(threads)]
+            start = time.perf_counter()
+            for worker in workers_threads:
+                worker.start()
+            for worker in workers_threads:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            hashing.shutdown()
+
+        latencies.sort()
+        ok = statuses.get(200, 0)
+        self.stdout.write(
+            f'{"en el hilo" if not workers else f"{workers} procesos"}: '
+            f'{ok / elapsed:.1f} logins/s, '
+            f'p50 {statistics.median(latencies) * 1000:.0f} ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, '
+            f'respuestas {dict(sorted(statuses.items()))}'
+        )
@@ -0,0 +1,111 @@
+import time
+import uuid
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from api.models import User, UserActivityLog
+from api.serializers import (
+    CompiledActivityLogSerializer, CompiledUserSerializer, UserActivityLogSerializer, UserSerializer
+)
+from products.models import Category, Product
+from products.serializers import CompiledProductSerializer, ProductSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compara filas por segundo entre los serializers de DRF y la ruta compilada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Filas de prueba por tabla')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones; se informa la mejor')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        try:
+            # Los datos de prueba se crean y se descartan en una transacción
+            with transaction.atomic():
+                self.create_rows(rows)
+                for label, drf, compiled in self.cases():
+                    self.measure(label, drf, compiled, options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def create_rows(self, rows):
+        run = uuid.uuid4().hex[:8]
+        group, _ = Group.objects.get_or_create(name=f'benchmark-{run}')
+        users = User.objects.bulk_create([
+            User(
+                username=f'benchmark-{run}-{i}', email=f'benchmark-{run}-{i}@moonbar.cl',
+                first_name='Benchmark', last_name=str(i), password='!'
+            )
+            for i in range(rows)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=group.pk) for user in users
+        ])
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=users[i % len(users)], activity_type='login', details='benchmark', ip_address='10.0.0.1')
+            for i in range(rows)
+        ])
+        category = Category.objects.create(name=f'Benchmark {run}')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark {run} {i}', description='x' * 200, price=f'{i}.5',
+                category=category, stock=i, image=f'products/{i}.jpg' if i % 2 else None
+            )
+            for i in range(rows)
+        ])
+
+    def cases(self):
+        users = User.objects.order_by('-date_joined', '-id')
+        logs = UserActivityLog.objects.order_by('-timestamp', '-id')
+        products = Product.objects.order_by('name', 'id')
+        return (
+            (
+                'UserSerializer',
+                lambda: UserSerializer(
+                    users.prefetch_related(Prefetch('groups', queryset=Group.objects.only('name'))), many=True
+                ).data,
+                lambda: CompiledUserSerializer().serialize(CompiledUserSerializer().values(users)),
+            ),
+            (
+                'UserActivityLogSerializer',
+                lambda: UserActivityLogSerializer(logs.select_related('user'), many=True).data,
+                lambda: CompiledActivityLogSerializer().serialize(CompiledActivityLogSerializer().values(logs)),
+            ),
+            (
+                'ProductSerializer',
+                lambda: ProductSerializer(products.select_related('category'), many=True).data,
+                lambda: CompiledProductSerializer().serialize(CompiledProductSerializer().values(products)),
+            ),
+        )
+
+    def measure(self, label, drf, compiled, repeat):
+        renderer = JSONRenderer()
+        results = {}
+        for name, serialize in (('drf', drf), ('compilado', compiled)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = serialize()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = (len(data), best, renderer.render(data))
+
+        (count, drf_time, drf_body), (_, compiled_time, compiled_body) = results['drf'], results['compilado']
+        if drf_body != compiled_body:
+            raise CommandError(f'{label}: la salida compilada no coincide con la de DRF')
+        self.stdout.write(
+            f'{label}: {count} filas, '
+            f'DRF {count / drf_time:,.0f} filas/s, '
+            f'compilado {count / compiled_time:,.0f} filas/s '
+            f'({drf_time / compiled_time:.1f}x), salida idéntica'
+        )
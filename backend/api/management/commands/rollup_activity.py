@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import get_watermark, rebuild_rollups, rollup_pending
+
+
+class Command(BaseCommand):
+    help = 'Suma en los resúmenes diarios los logs de actividad nuevos desde el último watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--rebuild', action='store_true', help='Recalcula todo desde el log crudo')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        if options['rebuild']:
+            rows = rebuild_rollups()
+        else:
+            rows = rollup_pending(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} logs procesados en {time.monotonic() - start:.2f}s '
+            f'(watermark: {get_watermark().last_id})'
+        ))
@@ -0,0 +1,94 @@
+import json
+import math
+
+from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .ratelimit import client_address, get_backend, get_setting, in_flight
+
+# Cuerpos más grandes no se leen para buscar el username
+MAX_BODY_BYTES = 4096
+
+
+def request_username(request):
+    """
+    Usuario al que apunta la petición, sin pasar por la autenticación de DRF.
+
+    En el login viene en el cuerpo; en rutas autenticadas se toma del
+    access token (solo se verifica la firma, no se consulta la base).
+    """
+    if request.content_type == 'application/json':
+        try:
+            if int(request.META.get('CONTENT_LENGTH') or 0) <= MAX_BODY_BYTES:
+                data = json.loads(request.body or b'{}')
+                if isinstance(data, dict) and data.get('username'):
+                    return f'username:{str(data["username"]).lower()}'
+        except (ValueError, UnicodeDecodeError):
+            pass
+    elif request.POST.get('username'):
+        return f'username:{request.POST["username"].lower()}'
+
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) == 2 and header[0] in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            return f'user:{AccessToken(header[1])[jwt_settings.USER_ID_CLAIM]}'
+        except (TokenError, KeyError):
+            pass
+    return None
+
+
+def too_many_requests(retry_after, detail):
+    response = JsonResponse({'detail': detail}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class RateLimitMiddleware:
+    """
+    Limita login y cambio de contraseña antes de autenticar o hashear.
+
+    Cada petición consume una ficha del balde de su IP y otra del balde
+    del usuario al que apunta; si alguno está vacío se responde 429 con
+    Retry-After. Además, si el proceso ya tiene MAX_IN_FLIGHT peticiones en
+    curso, las rutas protegidas se rechazan de inmediato para no sumar
+    trabajo de hashing a un servidor saturado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = in_flight.enter()
+        try:
+            if self.is_limited(request):
+                rejected = self.check(request, current)
+                if rejected is not None:
+                    return rejected
+            return self.get_response(request)
+        finally:
+            in_flight.leave()
+
+    def is_limited(self, request):
+        return (
+            get_setting('ENABLED')
+            and request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and request.path in get_setting('PATHS')
+        )
+
+    def check(self, request, current):
+        if current > get_setting('MAX_IN_FLIGHT'):
+            return too_many_requests(1, 'Servidor ocupado, reintenta en unos segundos')
+
+        backend = get_backend()
+        keys = [(f'ip:{client_address(request)}', get_setting('IP_BUCKET'))]
+        username = request_username(request)
+        if username:
+            keys.append((username, get_setting('USERNAME_BUCKET')))
+
+        for key, (capacity, per_minute) in keys:
+            retry_after = backend.take(key, capacity, per_minute)
+            if retry_after:
+                return too_many_requests(retry_after, 'Demasiados intentos, reintenta más tarde')
+        return None
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['company', 'timestamp'], name='api_log_company_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['user', 'timestamp'], name='api_log_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['activity_type', 'timestamp'], name='api_log_type_ts_idx'),
+        ),
+    ]
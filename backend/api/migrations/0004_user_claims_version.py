@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_activity_log_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Versión de los claims del token; al cambiar invalida los emitidos.'),
+        ),
+    ]
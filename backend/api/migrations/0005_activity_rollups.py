@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('api', '0004_user_claims_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('login', 'Inicio de sesión'), ('logout', 'Cierre de sesión'), ('password_change', 'Cambio de contraseña'), ('password_change_failed', 'Intento fallido de cambio de contraseña'), ('profile_update', 'Actualización de perfil'), ('failed_login', 'Intento fallido de inicio de sesión'), ('user_created', 'Usuario creado'), ('user_updated', 'Usuario actualizado'), ('user_deleted', 'Usuario eliminado'), ('token_validation', 'Token validado'), ('token_validation_failed', 'Token inválido'), ('profile_fetch', 'Obtención de perfil'), ('profile_fetch_failed', 'Error al obtener perfil')], max_length=50)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='companies.company')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen de actividad',
+                'verbose_name_plural': 'Resúmenes de actividad',
+                'indexes': [models.Index(fields=['company', 'day'], name='api_rollup_company_day_idx'), models.Index(fields=['user', 'day'], name='api_rollup_user_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activityrollup',
+            constraint=models.UniqueConstraint(fields=('company', 'activity_type', 'day', 'user'), name='api_rollup_key_uniq'),
+        ),
+    ]
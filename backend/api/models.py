@@ -16,6 +16,11 @@ class User(AbstractUser):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    claims_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Versión de los claims del token; al cambiar invalida los emitidos.'
+    )
 
     class Meta:
         verbose_name = 'Usuario'
@@ -64,8 +69,63 @@ class UserActivityLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['company', 'timestamp'], name='api_log_company_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='api_log_user_ts_idx'),
+            models.Index(fields=['activity_type', 'timestamp'], name='api_log_type_ts_idx'),
+        ]
         verbose_name = 'Registro de actividad'
         verbose_name_plural = 'Registros de actividad'
 
     def __str__(self):
-        return f"{self.user.username} - {self.activity_type} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.user.username} - {self.activity_type} - {self.timestamp}"
+
+class ActivityRollup(models.Model):
+    """
+    Conteo diario de actividades por empresa, tipo y usuario.
+
+    Se alimenta de forma incremental desde UserActivityLog (ver
+    api.rollups) para que los paneles no tengan que recorrer el log crudo.
+    """
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='activity_rollups'
+    )
+    activity_type = models.CharField(max_length=50, choices=UserActivityLog.ACTIVITY_TYPES)
+    day = models.DateField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='activity_rollups'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'activity_type', 'day', 'user'],
+                name='api_rollup_key_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'day'], name='api_rollup_company_day_idx'),
+            models.Index(fields=['user', 'day'], name='api_rollup_user_day_idx'),
+        ]
+        verbose_name = 'Resumen de actividad'
+        verbose_name_plural = 'Resúmenes de actividad'
+
+    def __str__(self):
+        return f"{self.company_id} - {self.activity_type} - {self.day}: {self.count}"
+
+
+class RollupWatermark(models.Model):
+    """Último id de UserActivityLog ya sumado en los resúmenes."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
@@ -0,0 +1,118 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre un orden compuesto y único.
+
+    En lugar de OFFSET, cada página filtra a partir de los valores de la
+    última fila entregada, por lo que el costo de una página depende solo
+    de su tamaño y no de la posición dentro de la tabla.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # El último campo debe ser único (normalmente la PK) para desempatar
+    ordering = ('-id',)
+    # Campos por los que el cliente puede ordenar con ?ordering=campo o -campo
+    ordering_query_param = 'ordering'
+    ordering_fields = ()
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None, values=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            # Filas como dicts; se agregan los campos del orden para armar el cursor
+            queryset = queryset.values(*values, *[field for field in self.get_fields() if field not in values])
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.get_row_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_ordering(self, request):
+        requested = request.query_params.get(self.ordering_query_param)
+        if requested and requested.lstrip('-') in self.ordering_fields:
+            return (requested, '-id' if requested.startswith('-') else 'id')
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_row_position(self, row):
+        values = []
+        for field in self.get_fields():
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def get_position_filter(self, position):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), respetando la dirección de cada campo
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':'), default=str)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class ActivityLogPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
@@ -0,0 +1,53 @@
+import json
+import zlib
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class CompressedJSONParser(JSONParser):
+    """
+    JSON que acepta el cuerpo comprimido (Content-Encoding: gzip o deflate).
+
+    El tamaño descomprimido se limita a max_bytes para que un cuerpo pequeño
+    no pueda expandirse sin control en memoria.
+    """
+    max_bytes = None
+    chunk_size = 64 * 1024
+
+    def get_max_bytes(self):
+        return self.max_bytes or settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        content_encoding = request.META.get('HTTP_CONTENT_ENCODING', '').lower() if request else ''
+        if content_encoding in ('', 'identity'):
+            return super().parse(stream, media_type, parser_context)
+        if content_encoding not in ('gzip', 'deflate'):
+            raise ParseError(f'Content-Encoding no soportado: {content_encoding}')
+
+        # wbits 47 detecta gzip o zlib automáticamente
+        decompressor = zlib.decompressobj(47)
+        max_bytes = self.get_max_bytes()
+        chunks = []
+        size = 0
+        try:
+            while True:
+                data = stream.read(self.chunk_size) if stream else b''
+                if not data:
+                    break
+                chunk = decompressor.decompress(data, max_bytes - size + 1)
+                size += len(chunk)
+                if size > max_bytes or decompressor.unconsumed_tail:
+                    raise ParseError(f'El cuerpo descomprimido supera {max_bytes} bytes')
+                chunks.append(chunk)
+            chunks.append(decompressor.flush())
+        except zlib.error as e:
+            raise ParseError(f'Cuerpo comprimido inválido: {e}')
+
+        try:
+            encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+            return json.loads(b''.join(chunks).decode(encoding))
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ParseError(f'JSON inválido: {e}')
@@ -0,0 +1,172 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from companies.models import CompanyUser
+from .hashing import hash_passwords
+from .models import User
+from .versions import bump_version, bump_version_on_commit
+
+DEFAULTS = {
+    # Máximo de usuarios por petición
+    'MAX_USERS': 1000,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'USER_PROVISIONING', {}).get(name, DEFAULTS[name])
+
+
+class ProvisionError(Exception):
+    """El lote no es válido; no se creó ningún usuario."""
+
+    def __init__(self, errors):
+        # [{'index': posición en el lote, 'errors': {...}}]
+        self.errors = errors
+        super().__init__(f'{len(errors)} usuarios con errores')
+
+
+class ProvisionUserSerializer(serializers.Serializer):
+    """Validación por fila sin consultas; la unicidad se revisa para todo el lote."""
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(max_length=254)
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    password = serializers.CharField(write_only=True)
+    phone = serializers.CharField(max_length=20, required=False, allow_blank=True, allow_null=True)
+    is_staff = serializers.BooleanField(default=False)
+    is_system_admin = serializers.BooleanField(default=False)
+    groups = serializers.ListField(child=serializers.CharField(max_length=150), required=False, default=list)
+    # Solo se usan cuando el lote se asocia a una empresa
+    role = serializers.ChoiceField(choices=CompanyUser.ROLE_CHOICES, default='staff')
+    is_company_admin = serializers.BooleanField(default=False)
+
+
+def validate_batch(rows, allow_privileged):
+    validator = ProvisionUserSerializer()
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            data = validator.run_validation(row)
+        except serializers.ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+            continue
+        row_errors = {}
+        if not allow_privileged and (data['is_staff'] or data['is_system_admin']):
+            row_errors['is_staff'] = 'No tienes permiso para crear usuarios administradores'
+        try:
+            validate_password(data['password'], User(
+                username=data['username'], email=data['email'],
+                first_name=data['first_name'], last_name=data['last_name']
+            ))
+        except DjangoValidationError as e:
+            row_errors['password'] = e.messages
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        valid.append((index, data))
+    return valid, errors
+
+
+def check_uniqueness(valid, errors):
+    usernames = {}
+    emails = {}
+    for index, data in valid:
+        usernames.setdefault(data['username'], []).append(index)
+        emails.setdefault(data['email'].lower(), []).append(index)
+
+    # Una sola consulta para todo el lote
+    taken = User.objects.annotate(email_lower=Lower('email')).filter(
+        Q(username__in=list(usernames)) | Q(email_lower__in=list(emails))
+    ).values_list('username', 'email_lower')
+    taken_usernames = set()
+    taken_emails = set()
+    for username, email in taken:
+        taken_usernames.add(username)
+        taken_emails.add(email)
+
+    by_index = {}
+    for field, values, taken_values, label in (
+        ('username', usernames, taken_usernames, 'nombre'),
+        ('email', emails, taken_emails, 'email'),
+    ):
+        for value, indexes in values.items():
+            if value in taken_values:
+                message = f'Ya existe un usuario con este {label}'
+            elif len(indexes) > 1:
+                message = f'{label.capitalize()} repetido en el lote'
+            else:
+                continue
+            for index in indexes:
+                by_index.setdefault(index, {})[field] = message
+    errors.extend({'index': index, 'errors': row_errors} for index, row_errors in by_index.items())
+
+
+def provision_users(rows, company=None, allow_privileged=False):
+    """
+    Crea un lote de usuarios con pocas consultas, sin importar su tamaño.
+
+    Se valida todo antes de escribir: si alguna fila falla se lanza
+    ProvisionError con los errores de cada una y no se crea nadie. Los
+    hashes se calculan en el pool de procesos y usuarios, grupos y
+    membresías se insertan con bulk_create en una transacción.
+    """
+    valid, errors = validate_batch(rows, allow_privileged)
+    check_uniqueness(valid, errors)
+
+    group_names = {name for _, data in valid for name in data['groups']}
+    groups = dict(Group.objects.filter(name__in=group_names).values_list('name', 'id'))
+    for index, data in valid:
+        missing = [name for name in data['groups'] if name not in groups]
+        if missing:
+            errors.append({'index': index, 'errors': {'groups': f'Grupos inexistentes: {", ".join(missing)}'}})
+
+    if errors:
+        merged = {}
+        for error in errors:
+            merged.setdefault(error['index'], {}).update(error['errors'])
+        raise ProvisionError([{'index': index, 'errors': merged[index]} for index in sorted(merged)])
+
+    hashes = hash_passwords(data['password'] for _, data in valid)
+    users = [
+        User(
+            username=data['username'],
+            email=data['email'],
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            phone=data.get('phone') or None,
+            is_staff=data['is_staff'],
+            is_system_admin=data['is_system_admin'],
+            password=password,
+        )
+        for (_, data), password in zip(valid, hashes)
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        UserGroup = User.groups.through
+        UserGroup.objects.bulk_create([
+            UserGroup(user_id=user.pk, group_id=groups[name])
+            for user, (_, data) in zip(users, valid)
+            for name in set(data['groups'])
+        ])
+        if company is not None:
+            CompanyUser.objects.bulk_create([
+                CompanyUser(
+                    user_id=user.pk, company=company,
+                    role=data['role'], is_company_admin=data['is_company_admin']
+                )
+                for user, (_, data) in zip(users, valid)
+            ])
+        # bulk_create no emite post_save
+        bump_version_on_commit('users', 'company_users')
+    # bulk_create no emite m2m_changed: user_count de los grupos cambió
+    if group_names:
+        bump_version('groups')
+    return users
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'ENABLED': True,
+    # 'local': memoria del proceso; 'cache': caché de Django compartida entre procesos
+    'BACKEND': 'local',
+    'CACHE_ALIAS': 'default',
+    # Rutas protegidas; solo se limitan los métodos que escriben
+    'PATHS': ('/api/token/', '/api/users/change-password/'),
+    # (capacidad, fichas por minuto)
+    'IP_BUCKET': (20, 10),
+    'USERNAME_BUCKET': (5, 5),
+    # Peticiones en curso en el proceso a partir de las cuales se rechazan las rutas protegidas
+    'MAX_IN_FLIGHT': 64,
+    # Máximo de baldes en memoria con el backend local
+    'MAX_KEYS': 100000,
+    # Proxies propios delante de Django (nginx, balanceador); con 0 se usa REMOTE_ADDR
+    'TRUSTED_PROXIES': 0,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'RATE_LIMIT', {}).get(name, DEFAULTS[name])
+
+
+def client_address(request):
+    """
+    IP con la que se identifica al cliente en los baldes.
+
+    X-Forwarded-For lo puede escribir cualquiera, así que solo se lee con
+    TRUSTED_PROXIES configurado: cada proxy agrega a la derecha la IP de
+    quien le habló y la del cliente es la N-ésima desde el final. Lo que
+    esté más a la izquierda lo puso el propio cliente y se ignora.
+    """
+    proxies = get_setting('TRUSTED_PROXIES')
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [part for part in forwarded if part]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def refill(state, capacity, per_second, now):
+    tokens, updated = state if state else (capacity, now)
+    return min(capacity, tokens + (now - updated) * per_second)
+
+
+class LocalBuckets:
+    """Baldes en un dict del proceso; los menos usados se descartan al pasar MAX_KEYS."""
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per_minute):
+        """Consume una ficha; devuelve 0 si se permitió o los segundos hasta la próxima."""
+        per_second = per_minute / 60
+        now = time.monotonic()
+        with self._lock:
+            tokens = refill(self._buckets.pop(key, None), capacity, per_second, now)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > get_setting('MAX_KEYS'):
+                self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / per_second
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """
+    Baldes en la caché de Django, compartidos entre procesos.
+
+    La lectura y escritura no son atómicas: con mucha concurrencia sobre
+    una misma clave puede dejar pasar alguna petición extra, lo que basta
+    para frenar fuerza bruta.
+    """
+
+    def get_cache(self):
+        return caches[get_setting('CACHE_ALIAS')]
+
+    def take(self, key, capacity, per_minute):
+        per_second = per_minute / 60
+        now = time.time()
+        cache_key = f'ratelimit:{key}'
+        tokens = refill(self.get_cache().get(cache_key), capacity, per_second, now)
+        allowed = tokens >= 1
+        # Expira cuando el balde ya estaría lleno de nuevo
+        timeout = int(capacity / per_second) + 1
+        self.get_cache().set(cache_key, (tokens - 1 if allowed else tokens, now), timeout)
+        return 0 if allowed else (1 - tokens) / per_second
+
+    def clear(self):
+        pass
+
+
+BACKENDS = {
+    'local': LocalBuckets,
+    'cache': CacheBuckets,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        name = get_setting('BACKEND')
+        if not isinstance(_backend, BACKENDS[name]):
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+class InFlight:
+    """Contador de peticiones en curso en el proceso."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.count += 1
+            return self.count
+
+    def leave(self):
+        with self._lock:
+            self.count -= 1
+
+
+in_flight = InFlight()
@@ -0,0 +1,193 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .shared_cache import is_process_local
+from .versions import get_setting as get_versions_setting, get_versions
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Respuestas guardadas en la memoria de cada proceso (L1)
+    'L1_MAX_ENTRIES': 1000,
+    # Segundos que una respuesta sigue en L1; acota lo que un proceso puede
+    # servir de más si pierde una invalidación
+    'L1_TTL': 10,
+    # Caché compartida entre procesos (L2); None la desactiva
+    'L2_ALIAS': 'default',
+    'L2_TTL': 300,
+    # Permite versiones y L2 en una caché del proceso (locmem). Solo sirve
+    # con un único proceso, como runserver o las pruebas
+    'ALLOW_LOCAL_CACHE': False,
+}
+
+KEY_PREFIX = 'response_cache:'
+
+
+def get_setting(name):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class LocalLRU:
+    """LRU en memoria del proceso; guarda los datos sin serializar hasta L1_TTL segundos."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + get_setting('L1_TTL'), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > get_setting('L1_MAX_ENTRIES'):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        hits = counts['l1_hits'] + counts['l2_hits']
+        return {
+            **counts,
+            'requests': total,
+            'hit_rate': round(hits / total, 4) if total else None,
+            'l1_entries': len(l1),
+            'enabled': is_enabled(),
+        }
+
+
+l1 = LocalLRU()
+metrics = Metrics()
+
+
+def get_l2():
+    alias = get_setting('L2_ALIAS')
+    return caches[alias] if alias else None
+
+
+def is_enabled():
+    """
+    La caché solo se activa si las versiones y L2 se comparten entre procesos.
+
+    Con locmem cada worker tendría sus propias versiones: una escritura
+    atendida por un proceso no invalidaría lo guardado por los demás.
+    """
+    if not get_setting('ENABLED'):
+        return False
+    if get_setting('ALLOW_LOCAL_CACHE'):
+        return True
+    aliases = [get_versions_setting('CACHE_ALIAS'), get_setting('L2_ALIAS')]
+    return not any(is_process_local(alias) for alias in aliases if alias)
+
+
+def company_scope(request):
+    """Alcance por defecto: la respuesta es igual para todos los miembros."""
+    return 'members'
+
+
+def user_scope(request):
+    """La respuesta depende del usuario (p. ej. listas filtradas por membresía)."""
+    if request.user.is_superuser:
+        return 'superuser'
+    return f'user:{request.user.pk}'
+
+
+def make_key(request, resources, scope):
+    params = sorted(request.query_params.lists())
+    parts = (
+        request.path,
+        request.get_host(),
+        request.headers.get('X-Company-ID'),
+        scope,
+        params,
+        # Las versiones van en la clave: al cambiar un recurso las entradas
+        # viejas dejan de encontrarse, sin tener que borrarlas
+        get_versions(*resources),
+    )
+    return KEY_PREFIX + hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def cache_response(resources, scope=company_scope):
+    """
+    Cachea las respuestas GET 200 de una vista de DRF en dos niveles.
+
+    Se aplica debajo de @api_view (y de @conditional_get) para que la
+    autenticación y los permisos corran siempre. La clave combina ruta,
+    X-Company-ID, el alcance de permisos que devuelve scope(request), los
+    parámetros de la consulta y la versión de cada recurso en resources,
+    que las señales incrementan al guardar o borrar.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not is_enabled():
+                return view(request, *args, **kwargs)
+
+            key = make_key(request, resources, scope(request))
+            entry = l1.get(key)
+            if entry is not None:
+                metrics.add('l1_hits')
+                return Response(entry)
+
+            l2 = get_l2()
+            entry = l2.get(key) if l2 is not None else None
+            if entry is not None:
+                metrics.add('l2_hits')
+                l1.set(key, entry)
+                return Response(entry)
+
+            metrics.add('misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and isinstance(response, Response):
+                l1.set(key, response.data)
+                if l2 is not None:
+                    l2.set(key, response.data, get_setting('L2_TTL'))
+            return response
+        return wrapper
+    return decorator
+
+
+def stats():
+    return metrics.snapshot()
+
+
+def clear():
+    l1.clear()
+    metrics.reset()
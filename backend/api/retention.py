@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserActivityLog
+from .rollups import get_watermark, rollup_pending
+
+DEFAULTS = {
+    # Antigüedad a partir de la cual los logs salen de la tabla
+    'DAYS': 180,
+    'ARCHIVE_DIR': os.path.join(settings.BASE_DIR, 'archives', 'activity_logs'),
+    # Filas archivadas y borradas por transacción
+    'BATCH_SIZE': 5000,
+}
+
+# Empresa usada para los logs sin empresa
+NO_COMPANY = 'none'
+MONTH_RE = re.compile(r'^\d{4}-\d{2}$')
+ARCHIVE_FIELDS = ('id', 'user_id', 'user__username', 'activity_type', 'timestamp', 'details', 'ip_address', 'company_id')
+
+
+def get_setting(name):
+    return getattr(settings, 'ACTIVITY_RETENTION', {}).get(name, DEFAULTS[name])
+
+
+def company_directory(company_id):
+    """Carpeta de una empresa; el id llega del encabezado X-Company-ID y se normaliza antes de armar la ruta."""
+    if not company_id:
+        return Path(get_setting('ARCHIVE_DIR')) / NO_COMPANY
+    try:
+        company_id = int(company_id)
+    except (TypeError, ValueError):
+        raise ValueError('X-Company-ID debe ser un número')
+    return Path(get_setting('ARCHIVE_DIR')) / str(company_id)
+
+
+def archive_path(company_id, month):
+    return company_directory(company_id) / f'{month}.jsonl.gz'
+
+
+def write_archive(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(json.dumps(row) + '\n' for row in rows)
+    # Cada lote es un miembro gzip nuevo al final del archivo; gzip lee la
+    # concatenación como un solo flujo, así no hay que reescribir el mes
+    with open(path, 'ab') as archive:
+        archive.write(gzip.compress(lines.encode()))
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+def archive_batch(horizon, after_id, upper_id, batch_size):
+    """
+    Archiva y borra el siguiente lote de logs anteriores a horizon.
+
+    Los lotes avanzan por id (keyset) y cada borrado es una transacción
+    corta. El archivo se escribe y sincroniza antes de borrar; si el
+    proceso se corta entre ambos pasos el lote se vuelve a archivar y la
+    lectura descarta los ids repetidos. Devuelve (filas, último id).
+    """
+    rows = list(
+        UserActivityLog.objects.filter(
+            id__gt=after_id,
+            id__lte=upper_id,
+            timestamp__lt=horizon
+        ).order_by('id').values(*ARCHIVE_FIELDS)[:batch_size]
+    )
+    if not rows:
+        return 0, None
+
+    partitions = {}
+    for row in rows:
+        row['username'] = row.pop('user__username')
+        month = timezone.localtime(row['timestamp']).strftime('%Y-%m')
+        # Mismo formato que DRF para que el log archivado se lea igual que el vivo
+        row['timestamp'] = row['timestamp'].isoformat().replace('+00:00', 'Z')
+        partitions.setdefault((row['company_id'], month), []).append(row)
+    for (company_id, month), partition in partitions.items():
+        write_archive(archive_path(company_id, month), partition)
+
+    with transaction.atomic():
+        UserActivityLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows), rows[-1]['id']
+
+
+def archive_logs(days=None, batch_size=None):
+    """
+    Mueve a archivos comprimidos los logs más antiguos que el horizonte.
+
+    Antes se ponen al día los resúmenes de actividad y solo se archivan
+    filas ya sumadas en ellos, para que los paneles no pierdan historia.
+    Devuelve la cantidad de filas archivadas.
+    """
+    days = get_setting('DAYS') if days is None else days
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    horizon = timezone.now() - timedelta(days=days)
+
+    rollup_pending()
+    upper_id = get_watermark().last_id
+
+    total = 0
+    after_id = 0
+    while True:
+        archived, after_id = archive_batch(horizon, after_id, upper_id, batch_size)
+        if not archived:
+            return total
+        total += archived
+
+
+def available_months(company_id):
+    directory = company_directory(company_id)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        (path.name[:-len('.jsonl.gz')] for path in directory.glob('*.jsonl.gz')),
+        reverse=True
+    )
+
+
+def read_archive(company_id, month, activity_type=None, user_id=None):
+    """
+    Logs de un mes archivado con el formato de UserActivityLogSerializer.
+
+    Devuelve un iterador que recorre el archivo línea a línea, sin cargarlo
+    completo en memoria, o None si el mes no está archivado.
+    """
+    if not MONTH_RE.match(month or ''):
+        raise ValueError('El mes debe tener el formato AAAA-MM')
+    path = archive_path(company_id, month)
+    if not path.exists():
+        return None
+    return iter_archive(path, activity_type, user_id)
+
+
+def iter_archive(path, activity_type, user_id):
+    seen = set()
+    with gzip.open(path, 'rt') as archive:
+        for line in archive:
+            row = json.loads(line)
+            # Un lote archivado dos veces (corte antes del borrado) deja ids repetidos
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+            if activity_type and row['activity_type'] != activity_type:
+                continue
+            if user_id is not None and row['user_id'] != user_id:
+                continue
+            yield {
+                'id': row['id'],
+                'username': row['username'],
+                'activity_type': row['activity_type'],
+                'timestamp': row['timestamp'],
+                'details': row['details'],
+                'ip_address': row['ip_address'],
+            }
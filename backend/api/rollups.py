@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ActivityRollup, RollupWatermark, UserActivityLog
+
+DEFAULTS = {
+    # Filas del log procesadas por transacción
+    'BATCH_SIZE': 50000,
+    # Rango máximo que puede pedir el panel
+    'MAX_DAYS': 366,
+    # Segundos que se espera antes de contar un log: un id menor puede
+    # confirmarse después de uno mayor y el watermark lo dejaría atrás
+    'WATERMARK_LAG': 5,
+}
+
+WATERMARK = 'activity_log'
+
+
+def get_setting(name):
+    return getattr(settings, 'ACTIVITY_ROLLUPS', {}).get(name, DEFAULTS[name])
+
+
+def get_watermark():
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK)
+    return watermark
+
+
+def rollup_batch(batch_size=None):
+    """
+    Suma en ActivityRollup el siguiente bloque de logs posteriores al watermark.
+
+    El watermark se bloquea y avanza en la misma transacción que los
+    conteos, por lo que dos ejecuciones simultáneas no cuentan dos veces
+    la misma fila. Devuelve la cantidad de logs procesados, o None si no
+    queda nada pendiente.
+
+    Los ids se asignan al insertar pero las filas se ven al confirmar, así
+    que una transacción lenta puede dejar un hueco detrás de ids mayores
+    ya visibles. El bloque termina antes del primer log de los últimos
+    WATERMARK_LAG segundos, para dar tiempo a que esos huecos se llenen.
+    """
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    horizon = timezone.now() - timedelta(seconds=get_setting('WATERMARK_LAG'))
+    get_watermark()
+    with transaction.atomic():
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        # El bloque se define por ids reales para no depender de que sean consecutivos
+        ids = UserActivityLog.objects.filter(id__gt=watermark.last_id).order_by('id').values_list('id', flat=True)
+        recent = ids.filter(timestamp__gt=horizon).aggregate(first=Min('id'))['first']
+        if recent is not None:
+            ids = ids.filter(id__lt=recent)
+        last_id = ids[batch_size - 1:batch_size].first() or ids.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return None
+
+        pending = UserActivityLog.objects.filter(id__gt=watermark.last_id, id__lte=last_id)
+        deltas = {
+            (row['company_id'], row['activity_type'], row['day'], row['user_id']): row['total']
+            for row in pending.annotate(
+                day=TruncDate('timestamp')
+            ).order_by().values(
+                'company_id', 'activity_type', 'day', 'user_id'
+            ).annotate(total=Count('id'))
+        }
+        merge_deltas(deltas)
+
+        watermark.last_id = last_id
+        watermark.save(update_fields=['last_id', 'updated_at'])
+    return sum(deltas.values())
+
+
+def merge_deltas(deltas):
+    days = {key[2] for key in deltas}
+    user_ids = {key[3] for key in deltas}
+    existing = {
+        (rollup.company_id, rollup.activity_type, rollup.day, rollup.user_id): rollup
+        for rollup in ActivityRollup.objects.filter(day__in=days, user_id__in=user_ids)
+    }
+
+    to_update = []
+    to_create = []
+    for key, total in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            company_id, activity_type, day, user_id = key
+            to_create.append(ActivityRollup(
+                company_id=company_id, activity_type=activity_type,
+                day=day, user_id=user_id, count=total
+            ))
+        else:
+            rollup.count += total
+            to_update.append(rollup)
+
+    ActivityRollup.objects.bulk_update(to_update, ['count'], batch_size=1000)
+    ActivityRollup.objects.bulk_create(to_create, batch_size=1000)
+
+
+def rollup_pending(batch_size=None):
+    """Procesa bloques hasta alcanzar el final del log; devuelve el total de filas."""
+    total = 0
+    while True:
+        rows = rollup_batch(batch_size)
+        if rows is None:
+            return total
+        total += rows
+
+
+def rebuild_rollups():
+    """
+    Recalcula todos los resúmenes desde el log crudo (p. ej. tras corregir datos).
+
+    Los logs ya archivados por retention no están en la tabla y dejan de contarse.
+    """
+    with transaction.atomic():
+        ActivityRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK).update(last_id=0)
+    return rollup_pending()
+
+
+def activity_series(days, company_id=None, activity_types=None, user_id=None):
+    """
+    Serie diaria por tipo de actividad a partir de los resúmenes.
+
+    El costo depende de días x tipos x usuarios activos, no del volumen del
+    log. Los días sin actividad se devuelven con 0.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rollups = ActivityRollup.objects.filter(day__gte=start, day__lte=today)
+    if company_id is not None:
+        rollups = rollups.filter(company_id=company_id)
+    if activity_types:
+        rollups = rollups.filter(activity_type__in=activity_types)
+    if user_id is not None:
+        rollups = rollups.filter(user_id=user_id)
+
+    counts = {activity_type: {} for activity_type in activity_types or ()}
+    for row in rollups.order_by().values('activity_type', 'day').annotate(total=Sum('count')):
+        counts.setdefault(row['activity_type'], {})[row['day']] = row['total']
+
+    calendar = [start + timedelta(days=offset) for offset in range(days)]
+    return {
+        activity_type: [{'day': day, 'count': by_day.get(day, 0)} for day in calendar]
+        for activity_type, by_day in sorted(counts.items())
+    }
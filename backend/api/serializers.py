@@ -4,9 +4,11 @@ from .models import User, UserActivityLog
 
 from rest_framework import serializers
 from django.contrib.auth.models import Group
+from .compiled import CompiledSerializer
+from .fieldsets import SparseFieldsMixin
 from .models import User, UserActivityLog
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     groups = serializers.SerializerMethodField()
     
@@ -27,34 +29,15 @@ class UserSerializer(serializers.ModelSerializer):
         return [group.name for group in obj.groups.all()]
 
     def create(self, validated_data):
-    # Eliminar grupos de validated_data si existe
         groups_names = self.initial_data.get('groups', [])
-        print(f"Grupos a asignar: {groups_names}")
-        
-        # Eliminar grupos de validated_data para evitar errores
-        if 'groups' in validated_data:
-            del validated_data['groups']
-        
+        validated_data.pop('groups', None)
         password = validated_data.pop('password', None)
 
-        # Crear usuario
-        user = User.objects.create_user(**validated_data)
-
-        # Establecer contraseña
-        if password:
-            user.set_password(password)
-            user.save()
+        # create_user ya hashea la contraseña: un solo INSERT, sin save() extra
+        user = User.objects.create_user(password=password, **validated_data)
 
-        # Asignar grupos
         if groups_names:
-            groups = Group.objects.filter(name__in=groups_names)
-            print(f"Grupos encontrados en la base de datos: {list(groups.values_list('name', flat=True))}")
-            
-            if groups.exists():
-                user.groups.set(groups)
-                print(f"Grupos asignados finalmente: {list(user.groups.values_list('name', flat=True))}")
-            else:
-                print(f"No se encontraron grupos con nombres: {groups_names}")
+            user.groups.set(Group.objects.filter(name__in=groups_names))
 
         return user
         
@@ -96,6 +79,20 @@ class UserActivityLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'activity_type', 'timestamp', 'details', 'ip_address']
         read_only_fields = ['timestamp', 'ip_address']
 
+class CompiledUserSerializer(CompiledSerializer):
+    serializer_class = UserSerializer
+
+    def fetch_groups(self, rows):
+        # Misma consulta que el prefetch de groups: una para toda la página
+        groups = {row['id']: [] for row in rows}
+        if groups:
+            for user_id, name in Group.objects.filter(user__in=list(groups)).values_list('user', 'name'):
+                groups[user_id].append(name)
+        return groups
+
+class CompiledActivityLogSerializer(CompiledSerializer):
+    serializer_class = UserActivityLogSerializer
+
 class GroupSerializer(serializers.ModelSerializer):
     user_count = serializers.SerializerMethodField()
 
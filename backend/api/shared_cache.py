@@ -0,0 +1,13 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_process_local(alias):
+    """
+    True si la caché no se comparte entre procesos (locmem) o no guarda nada (dummy).
+
+    Con varios workers, un valor invalidado en un proceso seguiría vigente en
+    los demás, así que lo que dependa de invalidar no debe confiar en ella.
+    """
+    return isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from companies.models import Company, CompanyUser
+from .authentication import bump_claims_version
+from .versions import bump_version_on_commit
+from .models import User
+
+
+def bump_user_instance(user):
+    bump_claims_version(user.pk)
+    # Evita que un save() posterior de la misma instancia escriba una versión vieja
+    user.refresh_from_db(fields=['claims_version'])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_claims(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_user_instance(instance)
+
+
+@receiver([post_save, post_delete], sender=CompanyUser)
+def invalidate_company_user_claims(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_claims_version(instance.user_id)
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_claims(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_claims_version(*instance.company_users.values_list('user_id', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_claims(sender, instance, **kwargs):
+    bump_claims_version(*instance.user_set.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def bump_groups_version(sender, instance, **kwargs):
+    bump_version_on_commit('groups')
+
+
+@receiver(post_delete, sender=User)
+def bump_groups_version_on_user_delete(sender, instance, **kwargs):
+    # El borrado en cascada de User.groups no emite m2m_changed y cambia user_count
+    bump_version_on_commit('groups')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_groups_claims(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version_on_commit('groups')
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_user_instance(instance)
+    elif action in ('post_add', 'post_remove'):
+        bump_claims_version(*pk_set)
+    elif action == 'pre_clear':
+        bump_claims_version(*instance.user_set.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_users_version(sender, instance, raw=False, **kwargs):
+    # Los listados de usuarios de empresa incluyen los datos del usuario
+    if not raw:
+        bump_version_on_commit('users')
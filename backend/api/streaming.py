@@ -0,0 +1,80 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+DEFAULTS = {
+    # Filas leídas por viaje a la base de datos y serializadas juntas
+    'CHUNK_SIZE': 1000,
+    # Bytes acumulados antes de entregar un trozo al servidor
+    'BUFFER_BYTES': 64 * 1024,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'STREAMING_JSON', {}).get(name, DEFAULTS[name])
+
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+    def dumps(value):
+        # Mismo formato que el JSONRenderer de DRF: compacto y UTF-8
+        return _encoder.encode(value).encode()
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_stream(rows, serializer):
+    """
+    Codifica {"next": null, "results": [...]} elemento por elemento.
+
+    Las filas de values() se serializan de a CHUNK_SIZE y los bytes se
+    entregan en trozos de BUFFER_BYTES, así que la memoria no depende de
+    la cantidad de filas y el primer trozo sale antes de leer la última.
+    """
+    limit = get_setting('BUFFER_BYTES')
+    buffer = bytearray(b'{"next":null,"results":[')
+    first = True
+    for chunk in chunks(rows, get_setting('CHUNK_SIZE')):
+        for item in serializer.serialize(chunk):
+            if not first:
+                buffer += b','
+            buffer += dumps(item)
+            first = False
+            if len(buffer) >= limit:
+                yield bytes(buffer)
+                buffer.clear()
+    buffer += b']}'
+    yield bytes(buffer)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """Lista completa de un queryset, sin paginar y sin armarla en memoria."""
+
+    def __init__(self, queryset, serializer, ordering=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        rows = serializer.values(queryset).iterator(chunk_size=get_setting('CHUNK_SIZE'))
+        super().__init__(render_stream(rows, serializer), **kwargs)
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
@@ -1,3 +1,917 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from companies.models import Company, CompanyUser
+from products.models import Category, Product, StockMovement
+from products.stock import apply_movement
+from . import activity_log, authentication, hashing, ratelimit, response_cache, streaming
+from .models import ActivityRollup, User, UserActivityLog
+from .retention import archive_logs, available_months
+from .rollups import rebuild_rollups, rollup_pending
+
+
+def create_company(name='Moon Bar', rut='76.000.000-1'):
+    return Company.objects.create(
+        name=name, business_name=name, rut=rut,
+        email='contacto@moonbar.cl', phone='1234', address='Santiago'
+    )
+
+
+class UserListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        cls.company = create_company()
+        group = Group.objects.create(name='Garzón')
+        for i in range(12):
+            user = User.objects.create_user(f'garzon{i}', f'garzon{i}@moonbar.cl', 'clave123')
+            user.groups.add(group)
+            CompanyUser.objects.create(user=user, company=cls.company)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # Una consulta para los usuarios de la página y otra para sus grupos
+    def test_user_list_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/?page_size=5')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_user_pages_cover_all_users(self):
+        ids = []
+        url = '/api/users/?page_size=5'
+        while url:
+            response = self.client.get(url)
+            ids.extend(user['id'] for user in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(ids), sorted(User.objects.values_list('id', flat=True)))
+
+    def test_manage_users_filters_by_company(self):
+        response = self.client.get('/api/users/manage/?page_size=50', HTTP_X_COMPANY_ID=str(self.company.id))
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertEqual(response.data['results'][0]['groups'], ['Garzón'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/users/?cursor=zzz').status_code, 404)
+
+
+# El hilo de fondo no corre en las pruebas: los lotes se escriben con flush()
+@mock.patch.object(activity_log.buffer, '_ensure_worker')
+class ActivityLogBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+
+    def tearDown(self):
+        activity_log.flush()
+
+    def test_sync_mode_writes_immediately(self, ensure_worker):
+        with override_settings(ACTIVITY_LOG={'MODE': 'sync'}):
+            activity_log.record_activity(self.user, 'login', 'web')
+        self.assertEqual(UserActivityLog.objects.count(), 1)
+
+    def test_buffered_mode_writes_on_flush(self, ensure_worker):
+        with override_settings(ACTIVITY_LOG={'MODE': 'buffered'}):
+            activity_log.record_activity(self.user, 'login', 'web', company_id='abc')
+            self.assertEqual(UserActivityLog.objects.count(), 0)
+            self.assertEqual(activity_log.flush(), 1)
+        log = UserActivityLog.objects.get()
+        self.assertIsNone(log.company_id)
+
+    def test_full_buffer_is_written_not_dropped(self, ensure_worker):
+        with override_settings(ACTIVITY_LOG={'MODE': 'buffered', 'MAX_PENDING': 3}):
+            for i in range(7):
+                activity_log.record_activity(self.user, 'failed_login', str(i))
+            # Dos escrituras de 3 al llenarse la cola; el último queda pendiente
+            self.assertEqual(UserActivityLog.objects.count(), 6)
+            self.assertEqual(activity_log.buffer.pending(), 1)
+            activity_log.flush()
+        self.assertEqual(
+            sorted(UserActivityLog.objects.values_list('details', flat=True)),
+            [str(i) for i in range(7)]
+        )
+
+    def test_failed_password_change_is_logged(self, ensure_worker):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/users/change-password/',
+            {'currentPassword': 'mala', 'newPassword': 'Otra-clave-123'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        activity_log.flush()
+        self.assertTrue(UserActivityLog.objects.filter(activity_type='password_change_failed').exists())
+
+
+class ActivityLogQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        cls.other = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        for i in range(7):
+            activity_log.record_activity(cls.admin if i % 2 else cls.other, 'login', str(i))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # Una consulta para el username y otra para la página, filtrando por user_id sin join
+    def test_username_filter_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/activity-logs/?page_size=3&username=garzon')
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_unknown_username_returns_no_logs(self):
+        response = self.client.get('/api/users/activity-logs/?username=nadie')
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalid_days(self):
+        self.assertEqual(self.client.get('/api/users/activity-logs/?days=x').status_code, 400)
+
+    def test_company_member_only_sees_own_logs(self):
+        company = create_company()
+        CompanyUser.objects.create(user=self.other, company=company)
+        for user in (self.admin, self.other):
+            activity_log.record_activity(user, 'login', 'pos', company_id=company.id)
+        client = APIClient()
+        client.force_authenticate(self.other)
+        response = client.get('/api/users/activity-logs/?username=root', HTTP_X_COMPANY_ID=str(company.id))
+        self.assertEqual({log['username'] for log in response.data['results']}, {'garzon'})
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.get_backend().clear()
+        self.client = APIClient()
+        response = self.client.post('/api/token/', {'username': 'admin', 'password': 'clave123'}, format='json')
+        self.tokens = response.data
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}',
+            HTTP_X_COMPANY_ID=str(self.company.id)
+        )
+
+    # Con caché local solo se lee claims_version: sin SELECT del usuario ni de membresías
+    def test_claims_skip_user_and_membership_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/users/me/').data['username'], 'admin')
+
+    def test_shared_cache_skips_version_query(self):
+        with mock.patch.object(authentication, 'is_process_local', return_value=False):
+            self.client.get('/api/users/')
+            with self.assertNumQueries(2):
+                self.client.get('/api/users/')
+            # La revocación borra la versión guardada
+            membership = CompanyUser.objects.get(user=self.admin)
+            membership.is_company_admin = False
+            membership.save()
+            self.assertEqual(self.client.get('/api/users/').status_code, 403)
+
+    def test_revoked_admin_loses_access_immediately(self):
+        self.assertEqual(self.client.get('/api/users/').status_code, 200)
+        # update() no emite señales: se simula otro worker que ya invalidó la versión
+        CompanyUser.objects.filter(user=self.admin).update(is_company_admin=False)
+        authentication.bump_claims_version(self.admin.pk)
+        self.assertEqual(self.client.get('/api/users/').status_code, 403)
+
+    def test_refresh_issues_current_claims(self):
+        self.admin.first_name = 'Nuevo'
+        self.admin.save()
+        response = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        claims = AccessToken(response.data['access'])[authentication.CLAIMS_KEY]
+        self.assertEqual(claims['v'], User.objects.get(pk=self.admin.pk).claims_version)
+
+    def test_invalid_refresh_token(self):
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': 'x'}, format='json').status_code, 401)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_on_profile_and_groups(self):
+        for url in ('/api/users/me/', '/api/groups/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+    def test_group_changes_invalidate_etag(self):
+        etag = self.client.get('/api/groups/')['ETag']
+        group = Group.objects.create(name='Cajero')
+        self.assertEqual(self.client.get('/api/groups/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get('/api/groups/')['ETag']
+        self.user.groups.add(group)
+        self.assertEqual(self.client.get('/api/groups/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(ACTIVITY_ROLLUPS={'WATERMARK_LAG': 0})
+class ActivityRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        logs = UserActivityLog.objects.bulk_create([
+            UserActivityLog(
+                user=cls.user if i % 2 else cls.admin,
+                activity_type='login' if i % 3 else 'failed_login',
+                details='', company=cls.company
+            )
+            for i in range(40)
+        ] + [UserActivityLog(user=cls.user, activity_type='login', details='')])
+        UserActivityLog.objects.filter(id__in=[log.id for log in logs[:10]]).update(
+            timestamp=timezone.now() - timedelta(days=2)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+
+    def total(self):
+        return sum(ActivityRollup.objects.values_list('count', flat=True))
+
+    def test_batches_count_each_log_once(self):
+        self.assertEqual(rollup_pending(batch_size=7), 41)
+        self.assertEqual(rollup_pending(), 0)
+        UserActivityLog.objects.create(user=self.user, activity_type='login', details='', company=self.company)
+        self.assertEqual(rollup_pending(), 1)
+        self.assertEqual(self.total(), 42)
+        self.assertEqual(rebuild_rollups(), 42)
+        self.assertEqual(self.total(), 42)
+
+    # Los logs recientes esperan: un id menor aún sin confirmar no queda detrás del watermark
+    def test_recent_logs_wait_for_lag(self):
+        rollup_pending()
+        late = UserActivityLog.objects.create(user=self.user, activity_type='login', details='')
+        with override_settings(ACTIVITY_ROLLUPS={'WATERMARK_LAG': 60}):
+            self.assertEqual(rollup_pending(), 0)
+            UserActivityLog.objects.filter(pk=late.pk).update(timestamp=timezone.now() - timedelta(minutes=2))
+            self.assertEqual(rollup_pending(), 1)
+
+    def test_analytics_read_rollups(self):
+        rollup_pending()
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/activity-analytics/?days=3&activity_type=login,failed_login,logout')
+        series = response.data['series']
+        self.assertEqual(set(series), {'login', 'failed_login', 'logout'})
+        self.assertEqual(sum(point['count'] for points in series.values() for point in points), 40)
+        self.assertEqual(len(series['login']), 3)
+        self.assertEqual(series['logout'][0]['count'], 0)
+
+    def test_member_analytics_are_own_only(self):
+        rollup_pending()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+        series = client.get('/api/users/activity-analytics/?username=admin').data['series']
+        self.assertEqual(sum(point['count'] for points in series.values() for point in points), 20)
+
+    def test_invalid_range(self):
+        self.assertEqual(self.client.get('/api/users/activity-analytics/?days=999').status_code, 400)
+
+
+@override_settings(ACTIVITY_ROLLUPS={'WATERMARK_LAG': 0})
+class ActivityRetentionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        logs = UserActivityLog.objects.bulk_create([
+            UserActivityLog(
+                user=cls.user if i % 2 else cls.admin, activity_type='login', details=f'd{i}',
+                company=cls.company if i < 25 else None
+            )
+            for i in range(30)
+        ])
+        cls.old = timezone.now() - timedelta(days=400)
+        old_ids = [log.id for log in logs[:20] + logs[25:28]]
+        UserActivityLog.objects.filter(id__in=old_ids).update(timestamp=cls.old)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(ACTIVITY_RETENTION={'ARCHIVE_DIR': directory.name})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.month = timezone.localtime(self.old).strftime('%Y-%m')
+        self.client = self.company_client(self.admin)
+
+    def company_client(self, user, company_id=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        client.credentials(HTTP_X_COMPANY_ID=str(company_id or self.company.id))
+        return client
+
+    def read(self, client, query):
+        response = client.get(f'/api/users/activity-logs/?{query}')
+        return json.loads(b''.join(response.streaming_content))['results']
+
+    # Solo se archivan logs ya sumados en los resúmenes
+    def test_archive_keeps_rollups(self):
+        self.assertEqual(archive_logs(batch_size=7), 23)
+        self.assertEqual(UserActivityLog.objects.count(), 7)
+        self.assertEqual(sum(ActivityRollup.objects.values_list('count', flat=True)), 30)
+        self.assertEqual(available_months(self.company.id), [self.month])
+        self.assertEqual(archive_logs(), 0)
+
+    def test_archived_month_reads_like_live_logs(self):
+        archive_logs()
+        self.assertEqual(self.client.get('/api/users/activity-logs/archives/').data, {'months': [self.month]})
+        archived = self.read(self.client, f'archive={self.month}')
+        self.assertEqual(len(archived), 10)
+        live = self.client.get('/api/users/activity-logs/?days=1').data['results']
+        self.assertEqual(set(live[0]), set(archived[0]))
+
+    def test_member_reads_only_own_archived_logs(self):
+        archive_logs()
+        archived = self.read(self.company_client(self.user), f'archive={self.month}&username=admin')
+        self.assertEqual({row['username'] for row in archived}, {'garzon'})
+
+    def test_invalid_month(self):
+        self.assertEqual(self.client.get('/api/users/activity-logs/?archive=2020-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/activity-logs/?archive=2001-01').status_code, 404)
+
+    # El encabezado se usa para armar la ruta: solo se aceptan ids numéricos
+    def test_company_header_must_be_numeric(self):
+        root = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        client = self.company_client(root, company_id='../../etc')
+        self.assertEqual(client.get('/api/users/activity-logs/archives/').status_code, 400)
+        self.assertEqual(client.get(f'/api/users/activity-logs/?archive={self.month}').status_code, 400)
+
+    def test_archive_months_require_membership(self):
+        archive_logs()
+        outsider = User.objects.create_user('otro', 'otro@moonbar.cl', 'clave123')
+        self.assertEqual(self.company_client(outsider).get('/api/users/activity-logs/archives/').status_code, 403)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(
+                user=cls.user if i % 2 else cls.admin, activity_type='login',
+                details=f'd,"{i}"', company=cls.company
+            )
+            for i in range(50)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+
+    def csv_rows(self, response):
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    # Con CHUNK_SIZE chico se leen varios bloques sin cargar todo el log
+    @override_settings(EXPORTS={'CHUNK_SIZE': 10})
+    def test_log_csv_escapes_and_filters(self):
+        rows = self.csv_rows(self.client.get('/api/users/activity-logs/export/?username=garzon'))
+        self.assertEqual(rows[0][:2], ['id', 'username'])
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][4], 'd,"1"')
+
+    def test_log_jsonl_is_gzipped(self):
+        response = self.client.get('/api/users/activity-logs/export/?output=jsonl')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="logs_actividad.jsonl.gz"')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        # Sin username se exportan los logs propios, como en get_user_logs
+        self.assertEqual(len(lines), 25)
+        self.assertEqual({json.loads(line)['username'] for line in lines}, {'admin'})
+
+    # Sin X-Company-ID no hay compañía de la que ser admin: un usuario común solo ve lo propio
+    def test_other_user_logs_need_company_header(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        rows = self.csv_rows(client.get('/api/users/activity-logs/export/?username=admin'))
+        self.assertEqual({row[1] for row in rows[1:]}, {'garzon'})
+        logs = client.get('/api/users/activity-logs/?username=admin&page_size=100').data['results']
+        self.assertEqual({log['username'] for log in logs}, {'garzon'})
+
+    def test_user_export_follows_visibility(self):
+        self.assertEqual(len(self.csv_rows(self.client.get('/api/users/export/'))), 3)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(len(self.csv_rows(client.get('/api/users/export/'))), 1)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/users/activity-logs/export/?output=xml').status_code, 400)
+
+
+class BulkProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+        Group.objects.create(name='Caja')
+        Group.objects.create(name='Bodega')
+        cls.rows = [
+            {
+                'username': f'emp{i}', 'email': f'emp{i}@moonbar.cl', 'first_name': 'Empleado',
+                'last_name': str(i), 'password': f'Clave-segura-{i}',
+                'groups': ['Caja'] if i % 2 else ['Caja', 'Bodega'],
+            }
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+
+    def provision(self, rows, client=None):
+        return (client or self.client).post('/api/users/bulk-create/', {'users': rows}, format='json')
+
+    # Usuarios, grupos y membresías con inserciones en lote
+    def test_bulk_create_query_budget(self):
+        with self.assertNumQueries(9):
+            response = self.provision(self.rows)
+        self.assertEqual(response.data['created'], 20)
+        user = User.objects.get(username='emp3')
+        self.assertTrue(user.check_password('Clave-segura-3'))
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Caja'])
+        self.assertEqual(CompanyUser.objects.filter(company=self.company).count(), 21)
+
+    # Un error en cualquier fila rechaza el lote completo
+    def test_invalid_rows_create_nothing(self):
+        rows = self.rows[:3] + [
+            {'username': 'admin', 'email': 'ADMIN@moonbar.cl', 'first_name': 'x', 'last_name': 'y', 'password': '123'},
+            dict(self.rows[0], email='otro@moonbar.cl'),
+            {'username': 'incompleto'},
+            dict(self.rows[5], username='q', email='q@moonbar.cl', groups=['Nope'], is_staff=True),
+        ]
+        response = self.provision(rows)
+        self.assertEqual(response.status_code, 400)
+        # La fila 4 repite el username de la 0: se marcan ambas
+        self.assertEqual({error['index'] for error in response.data['errors']}, {0, 3, 4, 5, 6})
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_only_company_admins_provision(self):
+        self.provision(self.rows[:1])
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='emp0'))
+        client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+        self.assertEqual(self.provision(self.rows[1:], client).status_code, 403)
+
+    # Un X-Company-ID no numérico es un error del cliente, también para el superusuario
+    def test_invalid_company_header(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123'))
+        client.credentials(HTTP_X_COMPANY_ID='zz')
+        self.assertEqual(self.provision(self.rows[:1], client).status_code, 400)
+        self.assertEqual(client.get('/api/users/export/').status_code, 400)
+
+    def test_single_create_assigns_groups(self):
+        response = self.client.post('/api/users/create/', {
+            'username': 'solo', 'email': 'solo@moonbar.cl', 'first_name': 'S', 'last_name': 'S',
+            'password': 'Clave-segura-1', 'groups': ['Caja'],
+        }, format='json')
+        self.assertEqual(response.data['groups'], ['Caja'])
+        self.assertTrue(User.objects.get(username='solo').check_password('Clave-segura-1'))
+
+
+class PasswordHashingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'Clave-123x')
+
+    def setUp(self):
+        # Los baldes del limitador viven en el proceso: cada prueba parte con ellos llenos
+        ratelimit.get_backend().clear()
+        self.client = APIClient()
+
+    def login(self, password, username='garzon'):
+        return self.client.post('/api/token/', {'username': username, 'password': password}, format='json')
+
+    def test_login(self):
+        self.assertEqual(self.login('Clave-123x').status_code, 200)
+        self.assertEqual(self.login('mala').status_code, 401)
+        self.assertEqual(self.login('mala', username='nadie').status_code, 401)
+
+    def test_busy_pool_answers_503(self):
+        with mock.patch.object(hashing, 'submit', side_effect=hashing.HashingBusy()):
+            response = self.login('Clave-123x')
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response['Retry-After'])
+
+    # Con un token real request.user es un ClaimsUser: la contraseña debe llegar a la base de datos
+    def test_change_password_with_token(self):
+        access = self.login('Clave-123x').data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.post(
+            '/api/users/change-password/',
+            {'currentPassword': 'Clave-123x', 'newPassword': 'Otra-456y'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials()
+        self.assertEqual(self.login('Otra-456y').status_code, 200)
+        self.assertEqual(self.login('Clave-123x').status_code, 401)
+
+    # El alta masiva pasa por la cola de MAX_PENDING sin ocupar más de BULK_PENDING lugares
+    def test_bulk_hashes_share_the_login_queue(self):
+        hashing.shutdown()
+        self.addCleanup(hashing.shutdown)
+        config = {'WORKERS': 2, 'MAX_PENDING': 2, 'BULK_CHUNK_SIZE': 3, 'BULK_PENDING': 1}
+        with self.settings(PASSWORD_HASHING=config), mock.patch.object(hashing, 'submit', wraps=hashing.submit) as submit:
+            hashes = hashing.hash_passwords(f'Clave-{i}' for i in range(7))
+            self.assertEqual(submit.call_count, 3)
+            # Queda un lugar libre para un login mientras corre el lote
+            self.assertTrue(hashing.check_password('Clave-6', hashes[6]))
+        self.assertEqual(len(hashes), 7)
+
+    # El callback libera el semáforo que se tomó, no el del pool creado después de shutdown()
+    def test_release_after_pool_replaced(self):
+        future = Future()
+        taken = threading.BoundedSemaphore(1)
+        executor = mock.Mock(submit=mock.Mock(return_value=future))
+        with mock.patch.object(hashing, 'get_pool', return_value=(executor, taken)):
+            hashing.submit(make_password, 'x')
+        with mock.patch.object(hashing, '_pending', threading.BoundedSemaphore(1)) as replaced:
+            future.set_result('hash')
+            self.assertTrue(taken.acquire(False))
+            self.assertTrue(replaced.acquire(False))
+
+    # Un hash con un algoritmo anterior se actualiza al iniciar sesión
+    def test_login_upgrades_old_hash(self):
+        self.user.password = make_password('Vieja-1', salt='s' * 22, hasher='pbkdf2_sha1')
+        self.user.save()
+        self.assertEqual(self.login('Vieja-1').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'Clave-123x')
+
+    def setUp(self):
+        ratelimit.get_backend().clear()
+        self.addCleanup(ratelimit.get_backend().clear)
+        self.client = APIClient()
+
+    def login(self, username, password='mala', **extra):
+        return self.client.post('/api/token/', {'username': username, 'password': password}, format='json', **extra)
+
+    # El balde del usuario no distingue mayúsculas y frena incluso la contraseña correcta
+    def test_username_bucket(self):
+        codes = [self.login('GARZON').status_code for _ in range(7)]
+        self.assertEqual(codes, [401] * 5 + [429] * 2)
+        response = self.login('garzon', 'Clave-123x')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(self.login('otro').status_code, 401)
+
+    @override_settings(RATE_LIMIT={'IP_BUCKET': (2, 1)})
+    def test_ip_bucket(self):
+        codes = [self.login(f'x{i}', REMOTE_ADDR='9.9.9.9').status_code for i in range(3)]
+        self.assertEqual(codes, [401, 401, 429])
+        self.assertEqual(self.login('x9', REMOTE_ADDR='8.8.8.8').status_code, 401)
+
+    # Sin proxies de confianza un X-Forwarded-For inventado no entrega un balde nuevo
+    @override_settings(RATE_LIMIT={'IP_BUCKET': (2, 1)})
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        codes = [
+            self.login(f'x{i}', REMOTE_ADDR='9.9.9.9', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [401, 401, 429])
+
+    # Detrás de un proxy vale la IP que agregó el proxy, no lo que escribió el cliente a la izquierda
+    @override_settings(RATE_LIMIT={'IP_BUCKET': (2, 1), 'TRUSTED_PROXIES': 1})
+    def test_trusted_proxy_address(self):
+        codes = [
+            self.login(f'x{i}', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'1.1.1.{i}, 9.9.9.9').status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [401, 401, 429])
+        response = self.login('x9', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='8.8.8.8')
+        self.assertEqual(response.status_code, 401)
+
+    def test_change_password_is_limited(self):
+        access = self.login('garzon', 'Clave-123x').data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        codes = [
+            self.client.post(
+                '/api/users/change-password/', {'currentPassword': 'mala', 'newPassword': 'x'}, format='json'
+            ).status_code
+            for _ in range(6)
+        ]
+        self.assertEqual(codes, [400] * 5 + [429])
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+    # Con el proceso saturado se rechazan las rutas protegidas, no las lecturas
+    def test_load_shedding(self):
+        access = self.login('garzon', 'Clave-123x').data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with mock.patch.object(ratelimit.in_flight, 'count', 100):
+            self.assertEqual(self.login('garzon', 'x').status_code, 429)
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+    @override_settings(RATE_LIMIT={'BACKEND': 'cache', 'USERNAME_BUCKET': (1, 1)})
+    def test_cache_backend(self):
+        cache.clear()
+        self.assertEqual([self.login('zz').status_code for _ in range(2)], [401, 429])
+
+
+@override_settings(RESPONSE_CACHE={'ALLOW_LOCAL_CACHE': True})
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.other = create_company('Sun Bar', '76.000.000-2')
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        cls.root = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        cls.category = Category.objects.create(name='Bebidas')
+        cls.product = Product.objects.create(name='Jugo', price=1000, category=cls.category)
+
+    def setUp(self):
+        # Las versiones y L2 viven en la caché local: se vacían junto con L1
+        cache.clear()
+        response_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+
+    # Un acierto solo paga la consulta del ETag del catálogo
+    def test_hit_skips_view_queries(self):
+        first = self.client.get('/api/products/')
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/products/')
+        self.assertEqual(first.data, second.data)
+
+    def test_writes_invalidate(self):
+        self.client.get('/api/products/')
+        apply_movement(self.product.pk, 5, StockMovement.RESTOCK)
+        self.assertEqual(self.client.get('/api/products/').data['results'][0]['stock'], 5)
+        self.client.get('/api/categories/')
+        self.category.name = 'Nueva'
+        self.category.save()
+        self.assertEqual(self.client.get('/api/categories/').data['results'][0]['name'], 'Nueva')
+
+    def test_user_scope_separates_permissions(self):
+        self.assertEqual(len(self.client.get('/api/companies/').data), 1)
+        client = APIClient()
+        client.force_authenticate(self.root)
+        self.assertEqual(len(client.get('/api/companies/').data), 2)
+        self.assertEqual(self.client.get(f'/api/companies/{self.other.id}/users/').status_code, 404)
+
+    # Vencido L1 la respuesta sale de L2, sin volver a la vista
+    @override_settings(RESPONSE_CACHE={'ALLOW_LOCAL_CACHE': True, 'L1_TTL': 0})
+    def test_l1_entries_expire(self):
+        self.client.get('/api/groups/')
+        self.client.get('/api/groups/')
+        counts = response_cache.stats()
+        self.assertEqual((counts['l1_hits'], counts['l2_hits'], counts['misses']), (0, 1, 1))
+
+    # Con versiones en locmem y varios workers las invalidaciones no llegarían a los demás procesos
+    @override_settings(RESPONSE_CACHE={})
+    def test_disabled_with_process_local_cache(self):
+        self.client.get('/api/groups/')
+        self.client.get('/api/groups/')
+        counts = response_cache.stats()
+        self.assertEqual((counts['enabled'], counts['misses'], counts['l1_hits']), (False, 0, 0))
+
+    def test_stats_are_for_admins(self):
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+        client = APIClient()
+        client.force_authenticate(self.root)
+        self.assertTrue(client.get('/api/cache/stats/').data['enabled'])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CompiledSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        category = Category.objects.create(name='Bebidas')
+        for i in range(7):
+            Product.objects.create(
+                name=f'Producto {i}', price=f'{i}.5', category=category,
+                image=f'products/{i}.jpg' if i % 2 else None, sku=f's{i}' if i % 3 else None
+            )
+        waiters = Group.objects.create(name='Garzón')
+        cashiers = Group.objects.create(name='Caja')
+        for i in range(6):
+            user = User.objects.create_user(f'garzon{i}', f'garzon{i}@moonbar.cl', 'clave123', phone='1' if i % 2 else None)
+            user.groups.add(waiters, *([cashiers] if i % 2 else []))
+            UserActivityLog.objects.create(
+                user=user, activity_type='login', details='pos', ip_address='1.1.1.1' if i % 2 else None
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # La ruta compilada debe entregar exactamente los mismos bytes que los serializers de DRF
+    def test_same_bytes_as_drf_serializers(self):
+        urls = (
+            '/api/products/?page_size=3', '/api/products/?ordering=-price', '/api/products/?search=producto',
+            '/api/users/manage/?page_size=4', '/api/users/activity-logs/?page_size=2',
+        )
+        for url in urls:
+            compiled = self.client.get(url)
+            with self.settings(COMPILED_SERIALIZERS={'ENABLED': False}):
+                plain = self.client.get(url)
+                plain_next = self.client.get(plain.data['next']).content if plain.data['next'] else None
+            self.assertEqual(compiled.content, plain.content, url)
+            if compiled.data['next']:
+                self.assertEqual(self.client.get(compiled.data['next']).content, plain_next, url)
+
+    def test_manage_users_query_budget(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/users/manage/')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False}, STREAMING_JSON={'CHUNK_SIZE': 3, 'BUFFER_BYTES': 100})
+class StreamingJSONTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        category = Category.objects.create(name='Bebidas')
+        for i in range(10):
+            Product.objects.create(name=f'Ñandú {i}', price=f'{i}.5', category=category)
+        UserActivityLog.objects.create(user=cls.admin, activity_type='login', details='pos')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # Varios trozos y el mismo contenido que la lista paginada
+    def test_stream_matches_paginated_list(self):
+        chunks = list(self.client.get('/api/products/?stream=1&ordering=-price').streaming_content)
+        self.assertGreater(len(chunks), 2)
+        paginated = json.loads(self.client.get('/api/products/?ordering=-price&page_size=100').content)
+        self.assertEqual(json.loads(b''.join(chunks))['results'], paginated['results'])
+
+    def test_stream_activity_logs(self):
+        response = self.client.get('/api/users/activity-logs/?stream=1')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))['results']), 1)
+
+    def test_empty_stream(self):
+        response = self.client.get('/api/products/?stream=1&search=zzz')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'next': None, 'results': []})
+
+    # orjson y el respaldo con json producen el mismo JSON compacto que DRF
+    def test_dumps_matches_compact_json(self):
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        value = {'nombre': 'ñandú', 'sku': None}
+        self.assertEqual(streaming.dumps(value), encoder.encode(value).encode())
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+        Group.objects.create(name='Caja').user_set.add(cls.admin)
+        category = Category.objects.create(name='Bebidas')
+        for i in range(5):
+            Product.objects.create(name=f'Producto {i}', price=f'{i}.5', category=category, description='d' * 50)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # Los campos no pedidos no se leen: sin description ni el join a categoría
+    def test_fields_prune_columns(self):
+        for enabled in (True, False):
+            with self.subTest(compiled=enabled), self.settings(COMPILED_SERIALIZERS={'ENABLED': enabled}):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get('/api/products/?fields=id,name,price,stock&page_size=2')
+                self.assertEqual(list(response.data['results'][0]), ['id', 'name', 'price', 'stock'])
+                sql = queries.captured_queries[-1]['sql']
+                self.assertNotIn('description', sql)
+                self.assertNotIn('JOIN', sql)
+                self.assertEqual(len(self.client.get(response.data['next']).data['results']), 2)
+
+    def test_exclude_with_search(self):
+        for enabled in (True, False):
+            with self.subTest(compiled=enabled), self.settings(COMPILED_SERIALIZERS={'ENABLED': enabled}):
+                product = self.client.get('/api/products/?exclude=description,image&search=producto').data['results'][0]
+                self.assertNotIn('image', product)
+                self.assertIn('category_name', product)
+                full = self.client.get('/api/products/?ordering=price').data['results'][0]
+                self.assertEqual(len(full), 11)
+
+    def test_user_fields(self):
+        for enabled in (True, False):
+            with self.subTest(compiled=enabled), self.settings(COMPILED_SERIALIZERS={'ENABLED': enabled}):
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/users/manage/?fields=id,username')
+                self.assertEqual(response.data['results'][0], {'id': self.admin.id, 'username': 'root'})
+                response = self.client.get('/api/users/manage/?fields=groups')
+                self.assertEqual(response.data['results'][0], {'groups': ['Caja']})
+
+    def test_fields_in_stream(self):
+        response = self.client.get('/api/products/?fields=id,price&stream=1&ordering=-price')
+        first = json.loads(b''.join(response.streaming_content))['results'][0]
+        self.assertEqual(first, {'id': Product.objects.order_by('-price')[0].id, 'price': '4.50'})
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get('/api/products/?fields=nope').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/?exclude=id,name,price').status_code, 200)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        category = Category.objects.create(name='Bebidas')
+        Product.objects.create(name='Jugo ñ', price='1.5', category=category)
+        cls.user = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        Group.objects.create(name='Caja').user_set.add(cls.user)
+        CompanyUser.objects.create(user=cls.user, company=cls.company, is_company_admin=True)
+
+    def setUp(self):
+        ratelimit.get_backend().clear()
+        token = self.client.post(
+            '/api/token/', {'username': 'admin', 'password': 'clave123'}, content_type='application/json'
+        ).json()['access']
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_X_COMPANY_ID=str(self.company.id))
+
+    def batch(self, items, **extra):
+        return self.api.post('/api/batch/', {'requests': items}, format='json', **extra)
+
+    # Cada sub-respuesta es idéntica a la que daría la petición directa
+    def test_bodies_match_direct_requests(self):
+        paths = [
+            '/api/users/me/', '/api/groups/', '/api/categories/', '/api/products/?fields=id,name',
+            f'/api/users/{self.user.id}/companies/',
+        ]
+        direct = [json.loads(self.api.get(path).content) for path in paths]
+        response = self.batch([{'path': path} for path in paths])
+        self.assertEqual(response.status_code, 200)
+        items = response.json()['responses']
+        self.assertEqual([item['status'] for item in items], [200] * 5)
+        self.assertEqual([item['body'] for item in items], direct)
+        self.assertEqual(items[3]['body']['results'][0]['name'], 'Jugo ñ')
+
+    def test_item_conditional_headers(self):
+        etag = self.batch([{'path': '/api/users/me/'}]).json()['responses'][0]['headers']['ETag']
+        response = self.batch([{'path': '/api/users/me/', 'headers': {'If-None-Match': etag}}])
+        self.assertEqual(response.json()['responses'][0]['status'], 304)
+        # El If-None-Match del lote no llega a las sub-peticiones
+        response = self.batch([{'path': '/api/users/me/'}], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['responses'][0]['status'], 200)
+
+    def test_item_errors(self):
+        response = self.batch([
+            {'path': '/api/nope/'}, {'path': '/api/batch/'}, {'path': '/api/products/?stream=1'},
+            {'path': '/api/users/manage/'}, {'path': '/admin/'}, {'path': '/api/groups/'},
+        ])
+        self.assertEqual([item['status'] for item in response.json()['responses']], [404, 400, 400, 200, 400, 200])
+
+    def test_invalid_batch(self):
+        self.assertEqual(self.batch([{'path': '/api/users/', 'method': 'POST'}]).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+        response = APIClient().post('/api/batch/', {'requests': [{'path': '/api/groups/'}]}, format='json')
+        self.assertEqual(response.status_code, 401)
@@ -4,19 +4,30 @@ from .views import *
 urlpatterns = [
     # Log de usuarios
     path('api/users/activity-logs/', get_user_logs, name='user-activity-logs'),
+    path('api/users/activity-logs/archives/', get_log_archives, name='user-activity-log-archives'),
+    path('api/users/activity-logs/export/', export_user_logs, name='user-activity-logs-export'),
+    path('api/users/activity-analytics/', get_activity_analytics, name='user-activity-analytics'),
     
     # Grupos de usuarios 
     path('api/groups/create/', create_group, name='create-group'),
     path('api/groups/<int:id>/update/', update_group, name='update-group'),
     path('api/groups/<int:id>/delete/', delete_group, name='delete-group'),
     path('api/groups/', get_groups, name='get-groups'),
+
+    # Lote de peticiones GET en un solo viaje
+    path('api/batch/', batch_requests, name='batch-requests'),
+
+    # Caché de respuestas
+    path('api/cache/stats/', get_response_cache_stats, name='response-cache-stats'),
     
     # Users
     path('api/users/', user_list, name='user-list'),  # Agregado el nombre
     path('api/users/me/', current_user, name='current-user'),
     path('api/users/change-password/', change_password, name='change-password'),
     path('api/users/manage/', manage_users, name='manage-users'),
+    path('api/users/export/', export_users, name='users-export'),
     path('api/users/create/', create_user, name='create-user'),
+    path('api/users/bulk-create/', bulk_create_users, name='bulk-create-users'),
     path('api/users/<int:id>/update/', update_user, name='update-user'),
     path('api/users/<int:id>/get-user/', get_user, name='get-user'),
     path('api/users/<int:id>/delete/', delete_user, name='delete-user'),
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'resource_version:{}'
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'RESOURCE_VERSIONS', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def initial_version():
+    # Basado en el reloj para que un reinicio de la caché no repita versiones ya entregadas
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """Contador de versión de una colección, incrementado por señales al cambiar."""
+    key = VERSION_KEY.format(name)
+    version = get_cache().get(key)
+    if version is None:
+        get_cache().add(key, initial_version(), None)
+        version = get_cache().get(key)
+    return version
+
+
+def get_versions(*names):
+    """Versiones de varias colecciones con una sola lectura de la caché."""
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    found = get_cache().get_many(list(keys.values()))
+    return tuple(
+        found[keys[name]] if keys[name] in found else get_version(name)
+        for name in names
+    )
+
+
+def bump_version(*names):
+    for name in names:
+        key = VERSION_KEY.format(name)
+        try:
+            get_cache().incr(key)
+        except ValueError:
+            get_cache().set(key, initial_version(), None)
+
+
+def bump_version_on_commit(*names):
+    """
+    Incrementa las versiones ahora y otra vez al confirmar la transacción.
+
+    Con un solo incremento antes del commit, una lectura concurrente
+    podría guardar en caché los datos viejos con la versión nueva; el
+    segundo incremento deja esa entrada inalcanzable.
+    """
+    bump_version(*names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_version(*names))
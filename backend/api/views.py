@@ -1,25 +1,45 @@
+import json
 from django.contrib.auth.models import Group
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from django.contrib.auth.hashers import check_password
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Count
+from django.db.models import Count, Prefetch
 from companies.serializers import CompanyUserSerializer
-from companies.models import CompanyUser
+from companies.models import Company, CompanyUser
+from companies.membership import is_company_admin, is_company_member, admin_company_ids, normalize_company_id
 from .models import User, UserActivityLog
-from .serializers import UserSerializer, GroupSerializer, UserActivityLogSerializer
+from .serializers import (
+    UserSerializer, GroupSerializer, UserActivityLogSerializer,
+    CompiledUserSerializer, CompiledActivityLogSerializer
+)
+from .pagination import UserPagination, ActivityLogPagination
+from .activity_log import record_activity
+from .conditional import conditional_get, make_etag
+from .versions import get_version
+from .rollups import activity_series, get_setting as get_rollup_setting, get_watermark
+from .retention import available_months, read_archive
+from . import compiled, exports, hashing, response_cache
+from .response_cache import cache_response
+from .streaming import StreamingJSONResponse, wants_stream
+from .fieldsets import requested_fields
+from .batch import BatchError, parse_batch, run_batch
+from .provisioning import ProvisionError, get_setting as get_provisioning_setting, provision_users
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def change_password(request):
     user = request.user
+    # Con JWT request.user es un ClaimsUser: el cambio se guarda en el usuario de la base de datos
+    db_user = getattr(user, 'get_db_user', lambda: user)()
     current_password = request.data.get('currentPassword')
     new_password = request.data.get('newPassword')
     
-    if not check_password(current_password, user.password):
+    # La verificación y el nuevo hash corren en el pool de hashing
+    if not hashing.check_password(current_password, db_user.password):
         log_user_activity(
             user=user,
             activity_type='password_change_failed',
@@ -32,8 +52,8 @@ def change_password(request):
         )
     
     try:
-        user.set_password(new_password)
-        user.save()
+        db_user.password = hashing.hash_password(new_password)
+        db_user.save(update_fields=['password'])
         
         log_user_activity(
             user=user,
@@ -63,19 +83,20 @@ def user_list(request):
     if request.user.is_superuser or request.user.is_system_admin:
         users = User.objects.all()
     else:
-        company_user = request.user.company_users.filter(
-            company_id=company_id, 
-            is_company_admin=True
-        ).first()
-        if not company_user:
+        if not is_company_admin(request, company_id):
             return Response(
                 {"detail": "No tienes permiso para ver los usuarios"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-        users = User.objects.filter(company_users__company_id=company_id)
-    
+        users = User.objects.filter(id__in=company_member_ids(company_id))
+
+    # Los grupos se cargan con una sola consulta para toda la página
+    users = users.prefetch_related(Prefetch('groups', queryset=Group.objects.only('name')))
+    paginator = UserPagination()
+    page = paginator.paginate_queryset(users, request)
+
     user_data = []
-    for user in users:
+    for user in page:
         user_data.append({
             'id': user.id,
             'username': user.username,
@@ -88,7 +109,46 @@ def user_list(request):
             'date_joined': user.date_joined,
             'groups': [group.name for group in user.groups.all()],
         })
-    return Response(user_data)
+    return paginator.get_paginated_response(user_data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_users(request):
+    output = request.query_params.get('output', exports.CSV)
+    if output not in exports.FORMATS:
+        return invalid_export_format()
+
+    # Mismo alcance que manage_users
+    company_id = request.headers.get('X-Company-ID')
+    if company_id and normalize_company_id(company_id) is None:
+        return invalid_company_header()
+    users = User.objects.order_by('id')
+    if company_id:
+        users = users.filter(id__in=company_member_ids(company_id))
+    if not (request.user.is_superuser or request.user.is_system_admin):
+        users = users.filter(id__in=company_member_ids(admin_company_ids(request)))
+    return exports.export_response(users, USER_EXPORT_COLUMNS, 'usuarios', output)
+
+USER_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('username', 'username'),
+    ('email', 'email'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('is_active', 'is_active'),
+    ('is_system_admin', 'is_system_admin'),
+    ('phone', 'phone'),
+    ('date_joined', 'date_joined'),
+)
+
+def invalid_export_format():
+    return Response(
+        {"detail": f"El parámetro output debe ser uno de: {', '.join(exports.FORMATS)}"},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+def invalid_company_header():
+    return Response({"detail": "X-Company-ID debe ser un número"}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -96,8 +156,16 @@ def get_groups(request):
     groups = Group.objects.all()
     return Response([{'id': group.id, 'name': group.name} for group in groups])
 
+def current_user_etag(request):
+    # claims_version cambia con cualquier save del usuario o de sus grupos y empresas
+    return make_etag(
+        'me', request.user.pk, request.user.claims_version,
+        get_version('groups'), request.META.get('HTTP_ACCEPT')
+    )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(etag_func=current_user_etag)
 def current_user(request):
     serializer = UserSerializer(request.user)
     return Response(serializer.data)
@@ -106,54 +174,88 @@ def current_user(request):
 @permission_classes([IsAuthenticated])
 def manage_users(request):
     company_id = request.headers.get('X-Company-ID')
-    users = User.objects.all().order_by('-date_joined')
+    users = User.objects.all()
     
+    # Se filtra con subconsultas sobre CompanyUser en vez de joins para no duplicar filas
     if company_id:
-        users = users.filter(company_users__company_id=company_id)
+        users = users.filter(id__in=company_member_ids(company_id))
     
     if not (request.user.is_superuser or request.user.is_system_admin):
-        user_companies = request.user.company_users.filter(
-            is_company_admin=True
-        ).values_list('company_id', flat=True)
-        users = users.filter(company_users__company_id__in=user_companies)
+        users = users.filter(id__in=company_member_ids(admin_company_ids(request)))
     
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    # ?fields=id,username: solo se leen las columnas pedidas
+    fields = requested_fields(request, CompiledUserSerializer.field_names())
+    paginator = UserPagination()
+    if compiled.get_setting('ENABLED'):
+        return CompiledUserSerializer(fields=fields).paginate(paginator, users, request)
+
+    extra = [field.lstrip('-') for field in paginator.get_ordering(request)]
+    users = UserSerializer.prune_queryset(users, fields, extra=extra)
+    if fields is None or 'groups' in fields:
+        users = users.prefetch_related(Prefetch('groups', queryset=Group.objects.only('name')))
+    page = paginator.paginate_queryset(users, request)
+    serializer = UserSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_user(request):
-    print("Datos recibidos COMPLETOS:", request.data)
-    
-    # Verifica los grupos
-    groups = request.data.get('groups', [])
-    print("Grupos recibidos en la vista:", groups)
-    
-    # Verificar grupos existentes
-    existing_groups = Group.objects.filter(name__in=groups)
-    print("Grupos existentes:", list(existing_groups.values_list('name', flat=True)))
-
+    # Para altas de varios usuarios usar bulk_create_users
     serializer = UserSerializer(data=request.data)
     
     if serializer.is_valid():
         try:
-            user = serializer.save()
-            
-            # Verificar grupos después de guardar
-            print("Grupos finales del usuario:", list(user.groups.values_list('name', flat=True)))
-            
-            # Resto del código...
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            print("Error al crear usuario:", str(e))
             return Response(
                 {"detail": f"Error al crear el usuario: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
     else:
-        print("Errores de validación:", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_users(request):
+    company_id = request.headers.get('X-Company-ID')
+    if company_id and normalize_company_id(company_id) is None:
+        return invalid_company_header()
+    is_admin = request.user.is_superuser or request.user.is_system_admin
+    if not (is_admin or (company_id and is_company_admin(request, company_id))):
+        return Response(
+            {"detail": "No tienes permiso para crear usuarios"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    company = None
+    if company_id:
+        company = Company.objects.filter(pk=company_id, is_active=True).first()
+        if company is None:
+            return Response({"detail": "Empresa no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+
+    rows = request.data.get('users') if isinstance(request.data, dict) else None
+    max_users = get_provisioning_setting('MAX_USERS')
+    if not isinstance(rows, list) or not rows:
+        return Response({"detail": "Se espera una lista users"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > max_users:
+        return Response(
+            {"detail": f"Máximo {max_users} usuarios por petición"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        users = provision_users(rows, company=company, allow_privileged=is_admin)
+    except ProvisionError as e:
+        return Response({"detail": str(e), "errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        {
+            'created': len(users),
+            'users': [{'id': user.pk, 'username': user.username} for user in users],
+        },
+        status=status.HTTP_201_CREATED
+    )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user(request, id):
@@ -275,42 +377,36 @@ def get_user_logs(request):
         activity_type = request.query_params.get('activity_type', None)
         username = request.query_params.get('username', None)
         
-        since = timezone.now() - timedelta(days=int(days))
-        logs = UserActivityLog.objects.filter(timestamp__gte=since)
-        
-        # Si es superusuario o admin del sistema, puede ver todos los logs
-        if not (request.user.is_superuser or request.user.is_system_admin):
-            # Si se especifica un username y es diferente al usuario actual
-            if username and username != request.user.username:
-                # Solo permitir ver logs de otros usuarios si es admin de la compañía
-                if company_id:
-                    is_company_admin = request.user.company_users.filter(
-                        company_id=company_id,
-                        is_company_admin=True
-                    ).exists()
-                    if not is_company_admin:
-                        # Si no es admin de la compañía, solo ver sus propios logs
-                        username = request.user.username
-            else:
-                # Si no se especifica username o es el mismo usuario
-                username = request.user.username
-                logs = logs.filter(user__username=username)
-        
-        if company_id:
-            logs = logs.filter(company_id=company_id)
-        # elif not (request.user.is_superuser or request.user.is_system_admin):
-        #     user_companies = request.user.company_users.filter(
-        #         is_company_admin=True
-        #     ).values_list('company_id', flat=True)
-        #     logs = logs.filter(company_id__in=user_companies)
-        
-        if activity_type:
-            logs = logs.filter(activity_type=activity_type)
-        if username:
-            logs = logs.filter(user__username=username)
+        try:
+            since = timezone.now() - timedelta(days=int(days))
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "El parámetro days debe ser un número"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        username, user_id = visible_log_user(request, company_id, username)
+
+        month = request.query_params.get('archive')
+        if month:
+            return archived_logs_response(company_id, month, activity_type, username, user_id)
+
+        logs = filter_logs(
+            UserActivityLog.objects.filter(timestamp__gte=since),
+            company_id, activity_type, username, user_id
+        )
         
-        serializer = UserActivityLogSerializer(logs, many=True)
-        return Response(serializer.data)
+        if wants_stream(request):
+            # Todos los logs del rango en una sola respuesta, sin cargarlos en memoria
+            ordering = ActivityLogPagination().get_ordering(request)
+            return StreamingJSONResponse(logs, CompiledActivityLogSerializer(), ordering=ordering)
+
+        if compiled.get_setting('ENABLED'):
+            return CompiledActivityLogSerializer().paginate(ActivityLogPagination(), logs, request)
+
+        paginator = ActivityLogPagination()
+        page = paginator.paginate_queryset(logs.select_related('user'), request)
+        serializer = UserActivityLogSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     elif request.method == 'POST':
         try:
@@ -330,12 +426,162 @@ def get_user_logs(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+def visible_log_user(request, company_id, username):
+    """Usuario cuyos logs se pueden ver: (username, user_id), ambos None para todos."""
+    # Si es superusuario o admin del sistema, puede ver todos los logs
+    if not (request.user.is_superuser or request.user.is_system_admin):
+        # Los logs de otro usuario solo los ve un admin de la compañía indicada
+        # en X-Company-ID; sin cabecera o sin username, solo los propios
+        if not (username and company_id and is_company_admin(request, company_id)):
+            username = request.user.username
+
+    user_id = None
+    if username:
+        # El username se resuelve una sola vez para filtrar por user_id sin join
+        if username == request.user.username:
+            user_id = request.user.pk
+        else:
+            user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+    return username, user_id
+
+def filter_logs(logs, company_id, activity_type, username, user_id):
+    if company_id:
+        logs = logs.filter(company_id=company_id)
+    # elif not (request.user.is_superuser or request.user.is_system_admin):
+    #     user_companies = request.user.company_users.filter(
+    #         is_company_admin=True
+    #     ).values_list('company_id', flat=True)
+    #     logs = logs.filter(company_id__in=user_companies)
+    if activity_type:
+        logs = logs.filter(activity_type=activity_type)
+    if username:
+        logs = logs.filter(user_id=user_id) if user_id else logs.none()
+    return logs
+
+def archived_logs_response(company_id, month, activity_type, username, user_id):
+    """Transmite un mes archivado sin cargarlo completo en memoria."""
+    if username and not user_id:
+        rows = iter(())
+    else:
+        try:
+            rows = read_archive(company_id or None, month, activity_type, user_id)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if rows is None:
+            return Response({"detail": "No hay logs archivados para ese mes"}, status=status.HTTP_404_NOT_FOUND)
+
+    def stream():
+        yield '{"archive": %s, "results": [' % json.dumps(month)
+        for position, row in enumerate(rows):
+            yield (',' if position else '') + json.dumps(row)
+        yield ']}'
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_user_logs(request):
+    output = request.query_params.get('output', exports.CSV)
+    if output not in exports.FORMATS:
+        return invalid_export_format()
+
+    company_id = request.headers.get('X-Company-ID')
+    logs = UserActivityLog.objects.order_by('id')
+    # Sin days se exporta todo el log vivo
+    days = request.query_params.get('days')
+    if days:
+        try:
+            logs = logs.filter(timestamp__gte=timezone.now() - timedelta(days=int(days)))
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "El parámetro days debe ser un número"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    username, user_id = visible_log_user(request, company_id, request.query_params.get('username'))
+    logs = filter_logs(logs, company_id, request.query_params.get('activity_type'), username, user_id)
+    return exports.export_response(logs, LOG_EXPORT_COLUMNS, 'logs_actividad', output)
+
+LOG_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('username', 'user__username'),
+    ('activity_type', 'activity_type'),
+    ('timestamp', 'timestamp'),
+    ('details', 'details'),
+    ('ip_address', 'ip_address'),
+    ('company_id', 'company_id'),
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_log_archives(request):
+    company_id = request.headers.get('X-Company-ID')
+    # Los meses archivados de una empresa solo los ven sus miembros y los admins del sistema
+    is_admin = request.user.is_superuser or request.user.is_system_admin
+    if company_id and not (is_admin or is_company_member(request, company_id)):
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    try:
+        months = available_months(company_id or None)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'months': months})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_activity_analytics(request):
+    company_id = request.headers.get('X-Company-ID')
+    max_days = get_rollup_setting('MAX_DAYS')
+    try:
+        days = int(request.query_params.get('days', 30))
+    except (TypeError, ValueError):
+        days = 0
+    if not 1 <= days <= max_days:
+        return Response(
+            {"detail": f"El parámetro days debe estar entre 1 y {max_days}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    activity_types = [t for t in request.query_params.get('activity_type', '').split(',') if t]
+    username = request.query_params.get('username')
+
+    # Como en get_user_logs: sin ser admin solo se ve la actividad propia
+    is_admin = request.user.is_superuser or request.user.is_system_admin
+    if not (is_admin or (company_id and is_company_admin(request, company_id))):
+        username = request.user.username
+
+    user_id = None
+    if username:
+        if username == request.user.username:
+            user_id = request.user.pk
+        else:
+            user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+            if user_id is None:
+                return Response({"detail": "Usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+
+    series = activity_series(
+        days,
+        company_id=company_id or None,
+        activity_types=activity_types,
+        user_id=user_id
+    )
+    watermark = get_watermark()
+    return Response({
+        'days': days,
+        'series': series,
+        # Hasta qué log están sumados los resúmenes
+        'last_log_id': watermark.last_id,
+        'updated_at': watermark.updated_at,
+    })
+
 def log_user_activity(user, activity_type, details, request):
     try:
         django_request = request._request if hasattr(request, '_request') else request
         company_id = request.headers.get('X-Company-ID') if hasattr(request, 'headers') else None
 
-        UserActivityLog.objects.create(
+        # Se encola; la escritura ocurre en lote fuera de la petición
+        record_activity(
             user=user,
             activity_type=activity_type,
             details=details,
@@ -345,6 +591,11 @@ def log_user_activity(user, activity_type, details, request):
     except Exception as e:
         print(f"Error al registrar actividad: {str(e)}")
 
+def company_member_ids(company):
+    """Subconsulta con los ids de usuarios de una o varias empresas."""
+    lookup = 'company_id__in' if isinstance(company, (list, tuple)) else 'company_id'
+    return CompanyUser.objects.filter(**{lookup: company}).values('user_id')
+
 def get_client_ip(request):
     try:
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -460,8 +711,13 @@ def delete_group(request, id):
             status=status.HTTP_404_NOT_FOUND
         )
         
+def groups_etag(request):
+    return make_etag('groups', get_version('groups'), request.META.get('HTTP_ACCEPT'))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(etag_func=groups_etag)
+@cache_response(('groups',))
 def get_groups(request):
     groups = Group.objects.annotate(user_count=Count('user'))
     return Response([{
@@ -471,6 +727,16 @@ def get_groups(request):
     } for group in groups])
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_response_cache_stats(request):
+    if not (request.user.is_superuser or request.user.is_system_admin):
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return Response(response_cache.stats())
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_companies(request, user_id):
@@ -483,4 +749,15 @@ def get_user_companies(request, user_id):
         serializer = CompanyUserSerializer(user_companies, many=True)
         return Response(serializer.data)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_requests(request):
+    # Varias lecturas en un solo viaje (p. ej. el arranque del POS): una sola
+    # autenticación y un solo tenant para todas
+    try:
+        items = parse_batch(request.data)
+    except BatchError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"responses": run_batch(request, items, batch_requests)})
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Los procesos de hashing se crean antes de aceptar conexiones; las vistas
+# async pueden usar api.hashing.acheck_password / ahash_password
+from api import hashing  # noqa: E402
+
+hashing.warm_up()
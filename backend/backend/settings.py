@@ -11,8 +11,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,10 +47,13 @@ INSTALLED_APPS = [
     'corsheaders',
     'products',
     'companies',
+    'orders',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # Antes que todo lo demás para rechazar ráfagas sin autenticar ni hashear
+    'api.middleware.RateLimitMiddleware',
     'companies.middleware.CompanyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,6 +66,7 @@ MIDDLEWARE = [
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Solo para desarrollo
+CORS_ALLOW_HEADERS = (*default_headers, 'x-company-id', 'idempotency-key')
 # Para producción, especifica los orígenes permitidos:
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:5173",
@@ -141,7 +148,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -178,4 +185,168 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
-AUTH_USER_MODEL = 'api.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'api.User'
+
+TESTING = 'test' in sys.argv
+
+# Registro de actividad: en pruebas se escribe de forma síncrona
+ACTIVITY_LOG = {
+    'MODE': 'sync' if TESTING else 'buffered',
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_PENDING': 10000,
+}
+
+# Caché de membresías de empresa entre peticiones (TTL en segundos, 0 la desactiva).
+# Con varios procesos conviene un backend de caché compartido para que la
+# invalidación por señales llegue a todos.
+COMPANY_MEMBERSHIP_CACHE = {
+    'ALIAS': 'default',
+    'TTL': 0,
+}
+
+# Claims de autorización en el access token. La versión vigente de cada
+# usuario se cachea solo si CACHE_ALIAS es compartida (Redis, Memcached, base
+# de datos); con locmem se consulta en cada petición para no demorar revocaciones.
+JWT_CLAIMS = {
+    'CACHE_ALIAS': 'default',
+    'VERSION_TTL': 300,
+}
+
+# Búsqueda de productos: BACKEND None elige FTS5 en SQLite o tsvector en PostgreSQL
+PRODUCT_SEARCH = {
+    'BACKEND': None,
+    'MAX_RESULTS': 500,
+}
+
+# Autocompletado en memoria de productos y categorías (por proceso)
+PRODUCT_AUTOCOMPLETE = {
+    'MAX_ENTRIES': 500000,
+    'CHECK_INTERVAL': 30,
+    'MAX_LIMIT': 50,
+}
+
+# Contadores de versión de colecciones (ETag). Con varios procesos conviene
+# una caché compartida para que los incrementos lleguen a todos.
+RESOURCE_VERSIONS = {
+    'CACHE_ALIAS': 'default',
+}
+
+# Sincronización incremental del catálogo para terminales POS
+CATALOG_SYNC = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    'WATERMARK_LAG': 2,
+    'TOMBSTONE_RETENTION_DAYS': 30,
+}
+
+# Libro de movimientos de stock
+STOCK_LEDGER = {
+    'COMPACT_AFTER_DAYS': 30,
+    'MAX_BATCH': 500,
+}
+
+# Checkout de órdenes
+ORDERS = {
+    'MAX_LINES': 100,
+}
+
+# Subida en lote de operaciones encoladas offline por los terminales POS
+POS_INGEST = {
+    'MAX_OPERATIONS': 5000,
+    'CHUNK_SIZE': 500,
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'MAX_CONCURRENT': 2,
+    'ACQUIRE_TIMEOUT': 2.0,
+    'RETRY_AFTER': 5,
+    'PRICE_TOLERANCE': 0.25,
+}
+
+# Resúmenes diarios de actividad; se actualizan con `manage.py rollup_activity`
+# (programarlo cada pocos minutos)
+ACTIVITY_ROLLUPS = {
+    'BATCH_SIZE': 50000,
+    'MAX_DAYS': 366,
+    'WATERMARK_LAG': 5,
+}
+
+# Retención del log de actividad: lo más antiguo pasa a archivos comprimidos
+ACTIVITY_RETENTION = {
+    'DAYS': 180,
+    'ARCHIVE_DIR': os.path.join(BASE_DIR, 'archives', 'activity_logs'),
+    'BATCH_SIZE': 5000,
+}
+
+# Importación masiva de productos (CSV/XLSX)
+PRODUCT_IMPORT = {
+    'CHUNK_SIZE': 1000,
+    'MAX_ROWS': 200000,
+    'MAX_ERRORS': 1000,
+}
+
+# Alta masiva de usuarios; los hashes se calculan en un pool de procesos
+USER_PROVISIONING = {
+    'MAX_USERS': 1000,
+}
+
+PASSWORD_HASHING = {
+    'WORKERS': None,
+    'MIN_POOL_BATCH': 4,
+    'BULK_CHUNK_SIZE': 8,
+    'BULK_PENDING': None,
+    'MAX_PENDING': 64,
+    'ACQUIRE_TIMEOUT': 1.0,
+    'RETRY_AFTER': 2,
+    'POOL_LOGINS': True,
+}
+
+# Login y cambio de contraseña verifican en el pool de hashing (api.hashing)
+AUTHENTICATION_BACKENDS = [
+    'api.backends.PooledModelBackend',
+]
+
+# Límite por IP y por usuario en login y cambio de contraseña
+RATE_LIMIT = {
+    'ENABLED': True,
+    'BACKEND': 'local',
+    'IP_BUCKET': (20, 10),
+    'USERNAME_BUCKET': (5, 5),
+    'MAX_IN_FLIGHT': 64,
+    # Cantidad de proxies propios que agregan X-Forwarded-For; 0 usa REMOTE_ADDR
+    'TRUSTED_PROXIES': 0,
+}
+
+# Caché de respuestas de lectura: L1 en memoria del proceso, L2 en la caché compartida.
+# Con varios workers RESOURCE_VERSIONS y L2_ALIAS deben apuntar a una caché
+# compartida (Redis, Memcached); si son locmem la caché queda apagada, salvo
+# con ALLOW_LOCAL_CACHE (runserver atiende con un solo proceso)
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'L1_MAX_ENTRIES': 1000,
+    'L1_TTL': 10,
+    'L2_ALIAS': 'default',
+    'L2_TTL': 300,
+    'ALLOW_LOCAL_CACHE': DEBUG,
+}
+
+# Exportaciones CSV/JSONL en streaming
+EXPORTS = {
+    'CHUNK_SIZE': 2000,
+    'BUFFER_BYTES': 64 * 1024,
+}
+
+# Listas de usuarios, logs y productos leídas con values() y conversores precompilados
+COMPILED_SERIALIZERS = {
+    'ENABLED': True,
+}
+
+# Listas completas con ?stream=1: se leen y codifican por trozos (orjson si está instalado)
+STREAMING_JSON = {
+    'CHUNK_SIZE': 1000,
+    'BUFFER_BYTES': 64 * 1024,
+}
+
+# POST api/batch/: varias lecturas GET en una petición, con la autenticación compartida
+BATCH_REQUESTS = {
+    'MAX_REQUESTS': 20,
+}
@@ -20,13 +20,12 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
-    TokenRefreshView,
     TokenVerifyView
 )
 
 from backend import settings
 from django.conf.urls.static import static
-from companies.views import CompanyTokenObtainPairView
+from companies.views import CompanyTokenObtainPairView, CompanyTokenRefreshView
 
 
 @api_view(['GET'])
@@ -44,12 +43,14 @@ urlpatterns = [
     path('api/test/', test_endpoint),
     path('', include('api.urls')),
     path('api/token/', CompanyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', CompanyTokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     #products
     path('api/', include('products.urls')),
     #companies
     path('api/', include('companies.urls')),
+    #orders
+    path('api/', include('orders.urls')),
     
 ]
 
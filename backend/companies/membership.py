@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import CompanyUser
+
+CACHE_KEY = 'company_memberships:{}'
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    # 0 desactiva la caché entre peticiones; solo se memoiza por petición
+    'TTL': 0,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'COMPANY_MEMBERSHIP_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('ALIAS')]
+
+
+def load_memberships(user_id):
+    """
+    Devuelve {company_id: CompanyUser} con las membresías activas del usuario
+    en empresas activas, cargadas en una sola consulta.
+    """
+    ttl = get_setting('TTL')
+    if ttl:
+        memberships = get_cache().get(CACHE_KEY.format(user_id))
+        if memberships is not None:
+            return memberships
+
+    memberships = {
+        cu.company_id: cu
+        for cu in CompanyUser.objects.filter(
+            user_id=user_id,
+            is_active=True,
+            company__is_active=True
+        ).select_related('company')
+    }
+    if ttl:
+        get_cache().set(CACHE_KEY.format(user_id), memberships, ttl)
+    return memberships
+
+
+def invalidate_memberships(*user_ids):
+    if get_setting('TTL') and user_ids:
+        get_cache().delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+
+
+def get_memberships(request):
+    """Membresías del usuario de la petición, memoizadas en la propia petición."""
+    user = request.user
+    if not user.is_authenticated:
+        return {}
+
+    # DRF envuelve la HttpRequest; la memoria se guarda en la original para
+    # compartirla entre el middleware, los permisos y la vista
+    django_request = getattr(request, '_request', request)
+    cached = getattr(django_request, '_company_memberships', None)
+    if cached is None or cached[0] != user.pk:
+        cached = (user.pk, load_memberships(user.pk))
+        django_request._company_memberships = cached
+    return cached[1]
+
+
+def normalize_company_id(company_id):
+    try:
+        return int(company_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_membership(request, company_id):
+    return get_memberships(request).get(normalize_company_id(company_id))
+
+
+def get_claimed_roles(request):
+    # Un ClaimsUser trae {company_id: (role, is_company_admin)} desde el token
+    return getattr(request.user, 'company_roles', None)
+
+
+def is_company_member(request, company_id):
+    roles = get_claimed_roles(request)
+    if roles is not None:
+        return normalize_company_id(company_id) in roles
+    return get_membership(request, company_id) is not None
+
+
+def is_company_admin(request, company_id):
+    roles = get_claimed_roles(request)
+    if roles is not None:
+        role = roles.get(normalize_company_id(company_id))
+        return bool(role and role[1])
+    membership = get_membership(request, company_id)
+    return bool(membership and membership.is_company_admin)
+
+
+def admin_company_ids(request):
+    roles = get_claimed_roles(request)
+    if roles is not None:
+        return [company_id for company_id, (role, is_admin) in roles.items() if is_admin]
+    return [
+        company_id for company_id, membership in get_memberships(request).items()
+        if membership.is_company_admin
+    ]
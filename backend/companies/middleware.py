@@ -1,27 +1,21 @@
 from django.utils.functional import SimpleLazyObject
 from .models import CompanyUser
+from .membership import get_membership
 
 def get_company(request):
     company_id = request.headers.get('X-Company-ID')
     if not company_id or not request.user.is_authenticated:
         return None
         
-    try:
-        if request.user.is_superuser or request.user.is_system_admin:
-            company_user = CompanyUser.objects.select_related('company').filter(
-                company_id=company_id,
-                company__is_active=True
-            ).first()
-        else:
-            company_user = CompanyUser.objects.select_related('company').get(
-                user=request.user,
-                company_id=company_id,
-                company__is_active=True,
-                is_active=True
-            )
-        return company_user.company if company_user else None
-    except CompanyUser.DoesNotExist:
-        return None
+    if request.user.is_superuser or request.user.is_system_admin:
+        company_user = CompanyUser.objects.select_related('company').filter(
+            company_id=company_id,
+            company__is_active=True
+        ).first()
+    else:
+        # Usa las membresías memoizadas en la petición (compartidas con permisos y vistas)
+        company_user = get_membership(request, company_id)
+    return company_user.company if company_user else None
 
 class CompanyMiddleware:
     def __init__(self, get_response):
@@ -29,4 +23,4 @@ class CompanyMiddleware:
 
     def __call__(self, request):
         request.company = SimpleLazyObject(lambda: get_company(request))
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
@@ -1,5 +1,6 @@
 from rest_framework import permissions
-from .models import CompanyUser
+from .models import Company
+from .membership import is_company_admin, is_company_member
 
 class IsCompanyAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -13,30 +14,20 @@ class IsCompanyAdmin(permissions.BasePermission):
         if not company_id:
             return False
 
-        return CompanyUser.objects.filter(
-            user=request.user,
-            company_id=company_id,
-            is_company_admin=True,
-            is_active=True
-        ).exists()
+        return is_company_admin(request, company_id)
 
     def has_object_permission(self, request, view, obj):
         if request.user.is_superuser or request.user.is_system_admin:
             return True
 
-        if hasattr(obj, 'company'):
-            company = obj.company
+        if hasattr(obj, 'company_id'):
+            company_id = obj.company_id
         elif isinstance(obj, Company):
-            company = obj
+            company_id = obj.pk
         else:
             return False
 
-        return CompanyUser.objects.filter(
-            user=request.user,
-            company=company,
-            is_company_admin=True,
-            is_active=True
-        ).exists()
+        return is_company_admin(request, company_id)
 
 class IsCompanyMember(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -50,8 +41,4 @@ class IsCompanyMember(permissions.BasePermission):
         if not company_id:
             return False
 
-        return CompanyUser.objects.filter(
-            user=request.user,
-            company_id=company_id,
-            is_active=True
-        ).exists()
\ No newline at end of file
+        return is_company_member(request, company_id)
@@ -1,8 +1,12 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.settings import api_settings
 from .models import Company, CompanyUser
 from api.models import User
 from api.serializers import UserSerializer
+from api.authentication import CLAIMS_KEY, build_user_claims
 
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,6 +34,13 @@ class CompanyUserSerializer(serializers.ModelSerializer):
         return f"{obj.user.first_name} {obj.user.last_name}".strip()
 
 class CompanyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Los claims se copian del refresh al access token
+        token[CLAIMS_KEY] = build_user_claims(user)
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         
@@ -76,4 +87,18 @@ class CompanyTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['user'] = user_data
         data['companies'] = companies_data
         
-        return data
\ No newline at end of file
+        return data
+
+class CompanyTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        # El access nuevo lleva claims actualizados, no los copiados del refresh
+        access = AccessToken(data['access'])
+        try:
+            user = User.objects.get(pk=access[api_settings.USER_ID_CLAIM], is_active=True)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+        access[CLAIMS_KEY] = build_user_claims(user)
+        data['access'] = str(access)
+        return data
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.versions import bump_version_on_commit
+from .membership import get_setting, invalidate_memberships
+from .models import Company, CompanyUser
+
+
+@receiver([post_save, post_delete], sender=CompanyUser)
+def invalidate_company_user(sender, instance, **kwargs):
+    invalidate_memberships(instance.user_id)
+    bump_version_on_commit('company_users')
+
+
+@receiver([post_save, post_delete], sender=Company)
+def invalidate_company(sender, instance, **kwargs):
+    bump_version_on_commit('companies')
+    if not get_setting('TTL'):
+        return
+    user_ids = CompanyUser.objects.filter(company_id=instance.pk).values_list('user_id', flat=True)
+    invalidate_memberships(*user_ids)
@@ -1,3 +1,51 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from api.models import User
+from .membership import load_memberships
+from .models import Company, CompanyUser
+
+
+def create_company(name='Moon Bar', rut='76.000.000-1'):
+    return Company.objects.create(
+        name=name, business_name=name, rut=rut,
+        email='contacto@moonbar.cl', phone='1234', address='Santiago'
+    )
+
+
+class MembershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.admin = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.admin, company=cls.company, is_company_admin=True)
+
+    def setUp(self):
+        # Los ids se reutilizan entre pruebas: sin entradas de otras
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # Las membresías se cargan una vez y las comparten middleware, permisos y vista
+    def test_memberships_loaded_once_per_request(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/', HTTP_X_COMPANY_ID=str(self.company.id))
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_invalid_company_header_is_forbidden(self):
+        self.assertEqual(self.client.get('/api/users/', HTTP_X_COMPANY_ID='zz').status_code, 403)
+
+    def test_cross_request_cache(self):
+        user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        with override_settings(COMPANY_MEMBERSHIP_CACHE={'TTL': 60}):
+            self.assertEqual(load_memberships(user.pk), {})
+            # Crear la membresía invalida la entrada guardada
+            CompanyUser.objects.create(user=user, company=self.company)
+            with self.assertNumQueries(1):
+                self.assertIn(self.company.id, load_memberships(user.pk))
+            with self.assertNumQueries(0):
+                load_memberships(user.pk)
+            self.company.is_active = False
+            self.company.save()
+            self.assertEqual(load_memberships(user.pk), {})
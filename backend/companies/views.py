@@ -2,9 +2,14 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Company, CompanyUser
-from .serializers import CompanySerializer, CompanyUserSerializer, CompanyTokenObtainPairSerializer
+from .serializers import (
+    CompanySerializer, CompanyUserSerializer, CompanyTokenObtainPairSerializer,
+    CompanyTokenRefreshSerializer
+)
 from .permissions import IsCompanyAdmin
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.utils.decorators import method_decorator
+from api.response_cache import cache_response, user_scope
 
 
 class CompanyViewSet(viewsets.ModelViewSet):
@@ -14,7 +19,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
         if self.request.user.is_superuser:
             return Company.objects.all()
         return Company.objects.filter(
-            company_users__user=self.request.user,
+            company_users__user_id=self.request.user.pk,
             company_users__is_active=True
         )
 
@@ -25,8 +30,14 @@ class CompanyViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    # Cada usuario ve solo sus empresas: el alcance de la caché es por usuario
+    @method_decorator(cache_response(('companies', 'company_users'), scope=user_scope))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     # Añadir este método para obtener usuarios de una empresa
     @action(detail=True, methods=['GET'], url_path='users')
+    @method_decorator(cache_response(('companies', 'company_users', 'users', 'groups'), scope=user_scope))
     def get_company_users(self, request, pk=None):
         company = self.get_object()
         
@@ -45,4 +56,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
 
 class CompanyTokenObtainPairView(TokenObtainPairView):
     serializer_class = CompanyTokenObtainPairSerializer
-    
+
+
+class CompanyTokenRefreshView(TokenRefreshView):
+    serializer_class = CompanyTokenRefreshSerializer
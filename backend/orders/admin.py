@@ -0,0 +1,32 @@
+from django.contrib import admin
+from .models import IngestReceipt, Order, OrderItem
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ('product', 'product_name', 'quantity', 'unit_price', 'subtotal')
+    readonly_fields = fields
+    can_delete = False
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'company', 'status', 'total', 'item_count', 'created_by', 'created_at')
+    list_filter = ('status', 'company', 'created_at')
+    search_fields = ('reference', 'idempotency_key')
+    list_select_related = ('company', 'created_by')
+    inlines = [OrderItemInline]
+    # Las órdenes se crean desde el checkout para que el stock quede consistente
+    readonly_fields = (
+        'company', 'created_by', 'reference', 'total', 'item_count',
+        'idempotency_key', 'request_hash', 'created_at'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(IngestReceipt)
+class IngestReceiptAdmin(admin.ModelAdmin):
+    list_display = ('client_id', 'company', 'kind', 'created_at')
+    list_filter = ('kind', 'company')
+    search_fields = ('client_id',)
+    readonly_fields = ('company', 'client_id', 'kind', 'result', 'created_at')
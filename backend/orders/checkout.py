@@ -0,0 +1,146 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from products.models import Product, StockMovement
+from products.stock import InsufficientStock, apply_movements
+
+from .models import Order, OrderItem
+
+DEFAULTS = {
+    # Máximo de líneas por orden
+    'MAX_LINES': 100,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'ORDERS', {}).get(name, DEFAULTS[name])
+
+
+class CheckoutError(Exception):
+    """La orden no es válida; errors detalla el problema de cada línea."""
+
+    def __init__(self, detail, errors):
+        self.errors = errors
+        super().__init__(detail)
+
+
+class IdempotencyConflict(Exception):
+    pass
+
+
+def request_fingerprint(lines, reference):
+    payload = {
+        'reference': reference,
+        'lines': [
+            [line['product'], line['quantity'], str(line.get('unit_price', ''))]
+            for line in lines
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def find_replay(company, idempotency_key, fingerprint):
+    """Orden ya creada con la misma clave, o None; la clave no puede reutilizarse con otro contenido."""
+    order = Order.objects.filter(
+        company=company,
+        idempotency_key=idempotency_key
+    ).prefetch_related('items').first()
+    if order is not None and order.request_hash != fingerprint:
+        raise IdempotencyConflict('La clave de idempotencia ya se usó con otra orden')
+    return order
+
+
+def checkout(company, lines, user=None, reference='', idempotency_key=None):
+    """
+    Registra una venta y descuenta el stock de todas sus líneas.
+
+    Los productos se validan con una sola consulta, el stock se descuenta con
+    un único UPDATE condicional (ver products.stock.apply_movements) y las
+    líneas se insertan con bulk_create. Devuelve (orden, creada); con una
+    clave de idempotencia ya usada se devuelve la orden original sin tocar
+    el stock.
+    """
+    fingerprint = request_fingerprint(lines, reference)
+    if idempotency_key:
+        order = find_replay(company, idempotency_key, fingerprint)
+        if order is not None:
+            return order, False
+
+    quantities = defaultdict(int)
+    for line in lines:
+        quantities[line['product']] += line['quantity']
+    products = Product.objects.only('id', 'name', 'price', 'is_available', 'stock').in_bulk(list(quantities))
+
+    errors = []
+    for position, line in enumerate(lines):
+        product = products.get(line['product'])
+        if product is None:
+            errors.append({'line': position, 'detail': 'El producto no existe'})
+        elif not product.is_available:
+            errors.append({'line': position, 'detail': 'El producto no está disponible'})
+        elif line.get('unit_price') is not None and line['unit_price'] != product.price:
+            # El terminal cobró con un precio desactualizado
+            errors.append({'line': position, 'detail': 'El precio cambió', 'price': str(product.price)})
+    if errors:
+        raise CheckoutError('La orden tiene líneas inválidas', errors)
+
+    # Aviso temprano sin escribir; la garantía real es el UPDATE condicional
+    shortages = {
+        pk: (quantity, products[pk].stock)
+        for pk, quantity in quantities.items()
+        if products[pk].stock < quantity
+    }
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    items = [
+        OrderItem(
+            product_id=line['product'],
+            product_name=products[line['product']].name,
+            quantity=line['quantity'],
+            unit_price=products[line['product']].price,
+            subtotal=products[line['product']].price * line['quantity']
+        )
+        for line in lines
+    ]
+
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                company=company,
+                created_by_id=getattr(user, 'pk', None),
+                reference=reference,
+                total=sum(item.subtotal for item in items),
+                item_count=sum(item.quantity for item in items),
+                idempotency_key=idempotency_key or None,
+                request_hash=fingerprint
+            )
+            apply_movements(
+                [
+                    {
+                        'product_id': pk,
+                        'quantity': -quantity,
+                        'reason': StockMovement.SALE,
+                        'reference': f'Orden {order.pk}',
+                    }
+                    for pk, quantity in quantities.items()
+                ],
+                user=user
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+    except IntegrityError:
+        # Dos reintentos simultáneos con la misma clave: gana el primero
+        order = find_replay(company, idempotency_key, fingerprint) if idempotency_key else None
+        if order is None:
+            raise
+        return order, False
+
+    # Las líneas ya están en memoria; se evita volver a consultarlas al serializar
+    order._prefetched_objects_cache = {'items': items}
+    return order, True
@@ -0,0 +1,282 @@
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from api.models import UserActivityLog
+from api.parsers import CompressedJSONParser
+from products.models import Product, StockMovement
+from products.stock import InsufficientStock, apply_movements
+
+from .checkout import request_fingerprint
+from .models import IngestReceipt, Order, OrderItem
+from .serializers import CheckoutLineSerializer
+
+DEFAULTS = {
+    'MAX_OPERATIONS': 5000,
+    # Operaciones aplicadas por transacción
+    'CHUNK_SIZE': 500,
+    # Tamaño máximo del cuerpo ya descomprimido
+    'MAX_BYTES': 20 * 1024 * 1024,
+    # Ingestas simultáneas por proceso; el resto recibe 503 con Retry-After
+    'MAX_CONCURRENT': 2,
+    'ACQUIRE_TIMEOUT': 2.0,
+    'RETRY_AFTER': 5,
+    # Diferencia máxima, como fracción del precio de catálogo, entre el precio
+    # cobrado offline y el actual; más allá la venta se rechaza
+    'PRICE_TOLERANCE': 0.25,
+}
+
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+INVALID = 'invalid'
+
+
+def get_setting(name):
+    return getattr(settings, 'POS_INGEST', {}).get(name, DEFAULTS[name])
+
+
+ingest_slots = threading.BoundedSemaphore(get_setting('MAX_CONCURRENT'))
+
+
+class IngestParser(CompressedJSONParser):
+    def get_max_bytes(self):
+        return get_setting('MAX_BYTES')
+
+
+class OperationSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=IngestReceipt.KIND_CHOICES)
+    # Momento real de la operación en el terminal
+    occurred_at = serializers.DateTimeField(required=False)
+    items = CheckoutLineSerializer(many=True, required=False, allow_empty=False)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    activity_type = serializers.ChoiceField(choices=UserActivityLog.ACTIVITY_TYPES, required=False)
+    details = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if data['type'] == IngestReceipt.SALE and not data.get('items'):
+            raise serializers.ValidationError({'items': 'Una venta requiere líneas'})
+        if data['type'] == IngestReceipt.ACTIVITY and not data.get('activity_type'):
+            raise serializers.ValidationError({'activity_type': 'Este campo es requerido'})
+        return data
+
+
+def ingest(company, user, operations, ip_address=None):
+    """
+    Aplica operaciones encoladas offline y devuelve un resultado por operación.
+
+    Cada operación trae un id generado por el terminal; las ya aplicadas
+    (según IngestReceipt) se informan como duplicadas sin volver a
+    aplicarse. Las demás se aplican por bloques de CHUNK_SIZE, cada bloque
+    en una transacción con inserciones en lote.
+    """
+    results = [None] * len(operations)
+    validator = OperationSerializer()
+    pending = []
+    seen = set()
+    for position, operation in enumerate(operations):
+        client_id = operation.get('id') if isinstance(operation, dict) else None
+        try:
+            data = validator.run_validation(operation)
+        except serializers.ValidationError as e:
+            results[position] = {'id': client_id, 'status': INVALID, 'errors': e.detail}
+            continue
+        if data['id'] in seen:
+            results[position] = {'id': data['id'], 'status': DUPLICATE}
+            continue
+        seen.add(data['id'])
+        pending.append((position, data))
+
+    chunk_size = get_setting('CHUNK_SIZE')
+    for start in range(0, len(pending), chunk_size):
+        ingest_chunk(company, user, pending[start:start + chunk_size], results, ip_address)
+    return results
+
+
+def ingest_chunk(company, user, chunk, results, ip_address):
+    applied = dict(
+        IngestReceipt.objects.filter(
+            company=company,
+            client_id__in=[data['id'] for _, data in chunk]
+        ).values_list('client_id', 'result')
+    )
+    fresh = []
+    for position, data in chunk:
+        if data['id'] in applied:
+            results[position] = {**applied[data['id']], 'status': DUPLICATE}
+        else:
+            fresh.append((position, data))
+    if not fresh:
+        return
+
+    product_ids = {line['product'] for _, data in fresh for line in data.get('items', ())}
+    products = Product.objects.only('id', 'name', 'price', 'is_available').in_bulk(list(product_ids))
+
+    try:
+        with transaction.atomic():
+            apply_operations(company, user, fresh, products, results, ip_address)
+    except (InsufficientStock, Product.DoesNotExist, IntegrityError):
+        # Algún producto sin stock o borrado después de cargarlo, o una subida
+        # simultánea del mismo id: se repite el bloque operación por operación
+        # para aislar las que fallan
+        for operation in fresh:
+            try:
+                with transaction.atomic():
+                    apply_operations(company, user, [operation], products, results, ip_address)
+            except (InsufficientStock, Product.DoesNotExist) as e:
+                # Sin recibo, como en la validación previa: el terminal puede reintentar
+                position, data = operation
+                results[position] = {'id': data['id'], 'status': REJECTED, 'detail': str(e)}
+            except IntegrityError:
+                position, data = operation
+                receipt = IngestReceipt.objects.filter(company=company, client_id=data['id']).first()
+                results[position] = {**(receipt.result if receipt else {'id': data['id']}), 'status': DUPLICATE}
+
+
+def apply_operations(company, user, operations, products, results, ip_address):
+    receipts = []
+    sales = []
+    activities = []
+    for position, data in operations:
+        if data['type'] == IngestReceipt.SALE:
+            missing = [line['product'] for line in data['items'] if line['product'] not in products]
+            if missing:
+                # No se guarda recibo: el terminal puede reintentar cuando el producto exista
+                results[position] = {
+                    'id': data['id'], 'status': REJECTED, 'detail': f'Productos inexistentes: {missing}'
+                }
+                continue
+            errors = line_errors(data['items'], products)
+            if errors:
+                results[position] = {
+                    'id': data['id'], 'status': REJECTED, 'detail': 'La venta tiene líneas inválidas', 'errors': errors
+                }
+                continue
+            sales.append((position, data))
+        else:
+            activities.append((position, data))
+
+    orders = create_sales(company, user, sales, products)
+    for (position, data), order in zip(sales, orders):
+        results[position] = {'id': data['id'], 'status': CREATED, 'order': order.pk}
+        receipts.append(IngestReceipt(
+            company=company, client_id=data['id'], kind=IngestReceipt.SALE,
+            result={'id': data['id'], 'order': order.pk}
+        ))
+
+    create_activities(company, user, activities, ip_address)
+    for position, data in activities:
+        results[position] = {'id': data['id'], 'status': CREATED}
+        receipts.append(IngestReceipt(
+            company=company, client_id=data['id'], kind=IngestReceipt.ACTIVITY,
+            result={'id': data['id']}
+        ))
+
+    IngestReceipt.objects.bulk_create(receipts)
+
+
+def line_errors(lines, products):
+    """
+    Líneas que no se pueden aceptar aunque vengan de una venta offline.
+
+    Se respeta el precio cobrado en el terminal, pero solo dentro de
+    PRICE_TOLERANCE del precio de catálogo: un precio fuera de rango o un
+    producto no disponible se informa como error, igual que en checkout.
+    """
+    tolerance = Decimal(str(get_setting('PRICE_TOLERANCE')))
+    errors = []
+    for position, line in enumerate(lines):
+        product = products[line['product']]
+        if not product.is_available:
+            errors.append({'line': position, 'detail': 'El producto no está disponible'})
+        elif line.get('unit_price') is not None and abs(line['unit_price'] - product.price) > product.price * tolerance:
+            errors.append({'line': position, 'detail': 'El precio cobrado difiere del catálogo', 'price': str(product.price)})
+    return errors
+
+
+def create_sales(company, user, sales, products):
+    if not sales:
+        return []
+
+    orders = []
+    items_by_order = []
+    for _, data in sales:
+        items = []
+        for line in data['items']:
+            product = products[line['product']]
+            # Offline se respeta el precio que el terminal efectivamente cobró
+            unit_price = line.get('unit_price', product.price)
+            items.append(OrderItem(
+                product_id=product.pk,
+                product_name=product.name,
+                quantity=line['quantity'],
+                unit_price=unit_price,
+                subtotal=unit_price * line['quantity']
+            ))
+        items_by_order.append(items)
+        orders.append(Order(
+            company=company,
+            created_by_id=getattr(user, 'pk', None),
+            reference=data['reference'],
+            total=sum(item.subtotal for item in items),
+            item_count=sum(item.quantity for item in items),
+            # Con la misma clave un reintento online de esta venta también se reconoce
+            idempotency_key=data['id'],
+            request_hash=request_fingerprint(data['items'], data['reference'])
+        ))
+
+    Order.objects.bulk_create(orders)
+    backdate(Order, orders, [data for _, data in sales], 'created_at')
+
+    movements = []
+    all_items = []
+    for order, items in zip(orders, items_by_order):
+        quantities = defaultdict(int)
+        for item in items:
+            item.order = order
+            quantities[item.product_id] += item.quantity
+        all_items.extend(items)
+        movements.extend(
+            {
+                'product_id': pk,
+                'quantity': -quantity,
+                'reason': StockMovement.SALE,
+                'reference': f'Orden {order.pk}',
+            }
+            for pk, quantity in quantities.items()
+        )
+    apply_movements(movements, user=user)
+    OrderItem.objects.bulk_create(all_items)
+    return orders
+
+
+def create_activities(company, user, activities, ip_address):
+    if not activities:
+        return
+    logs = UserActivityLog.objects.bulk_create([
+        UserActivityLog(
+            user_id=user.pk,
+            activity_type=data['activity_type'],
+            details=data['details'],
+            ip_address=ip_address,
+            company=company
+        )
+        for _, data in activities
+    ])
+    backdate(UserActivityLog, logs, [data for _, data in activities], 'timestamp')
+
+
+def backdate(model, objects, operations, field):
+    # auto_now_add pisa la fecha en el INSERT; bulk_update no aplica auto_now_add
+    dated = []
+    for obj, data in zip(objects, operations):
+        if data.get('occurred_at'):
+            setattr(obj, field, data['occurred_at'])
+            dated.append(obj)
+    if dated:
+        model.objects.bulk_update(dated, [field])
@@ -0,0 +1,132 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from rest_framework.test import APIClient
+
+from api.models import User
+from companies.models import Company, CompanyUser
+from companies.serializers import CompanyTokenObtainPairSerializer
+from orders.models import Order
+from products.models import CatalogTombstone, Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga del checkout: órdenes concurrentes a través de la API completa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Terminales simultáneos')
+        parser.add_argument('--orders', type=int, default=50, help='Órdenes por terminal')
+        parser.add_argument('--lines', type=int, default=3, help='Líneas por orden')
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument(
+            '--retry-rate', type=float, default=0.1,
+            help='Fracción de órdenes reenviadas con la misma clave de idempotencia'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        per_thread = options['orders']
+        lines = options['lines']
+        run = uuid.uuid4().hex[:8]
+
+        company = Company.objects.create(
+            name=f'Benchmark {run}', business_name='Benchmark', rut=f'bench-{run}',
+            email='benchmark@moonbar.cl', phone='0', address='-'
+        )
+        user = User.objects.create_user(f'benchmark-{run}', 'benchmark@moonbar.cl', uuid.uuid4().hex)
+        CompanyUser.objects.create(user=user, company=company)
+        category = Category.objects.create(name=f'Benchmark {run}', is_active=False)
+        initial = threads * per_thread * lines
+        products = [
+            Product.objects.create(
+                name=f'Benchmark {run} {i}', price=1000 + i, category=category, stock=initial
+            )
+            for i in range(options['products'])
+        ]
+        access = str(CompanyTokenObtainPairSerializer.get_token(user).access_token)
+
+        latencies = []
+        statuses = {}
+        replays = {'sent': 0, 'replayed': 0}
+        lock = threading.Lock()
+
+        def terminal(offset):
+            client = APIClient(SERVER_NAME='localhost')
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}', HTTP_X_COMPANY_ID=str(company.pk))
+            local = []
+            local_statuses = {}
+            local_replays = {'sent': 0, 'replayed': 0}
+            try:
+                for n in range(per_thread):
+                    key = f'{run}-{offset}-{n}'
+                    body = {'items': [
+                        {'product': products[(offset + n + i) % len(products)].pk, 'quantity': 1}
+                        for i in range(lines)
+                    ]}
+                    start = time.perf_counter()
+                    response = client.post('/api/orders/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+                    local.append(time.perf_counter() - start)
+                    local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+
+                    if (n * threads + offset) % 100 < options['retry_rate'] * 100:
+                        local_replays['sent'] += 1
+                        retry = client.post('/api/orders/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+                        if retry.get('Idempotent-Replayed') == 'true':
+                            local_replays['replayed'] += 1
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+                for code, count in local_statuses.items():
+                    statuses[code] = statuses.get(code, 0) + count
+                for k, value in local_replays.items():
+                    replays[k] += value
+
+        workers = [threading.Thread(target=terminal, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        try:
+            created = Order.objects.filter(company=company).count()
+            sold = sum(initial - stock for stock in Product.objects.filter(
+                pk__in=[p.pk for p in products]
+            ).values_list('stock', flat=True))
+            latencies.sort()
+            self.stdout.write(
+                f'{threads} terminales x {per_thread} órdenes de {lines} líneas en {elapsed:.2f}s '
+                f'({len(latencies) / elapsed * 60:.0f} órdenes/min)\n'
+                f'latencia p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms\n'
+                f'respuestas {dict(sorted(statuses.items()))}, '
+                f'reintentos {replays["sent"]} (reconocidos {replays["replayed"]})'
+            )
+            if sold == created * lines and replays['sent'] == replays['replayed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{created} órdenes, {sold} unidades descontadas: sin ventas duplicadas'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'{created} órdenes pero {sold} unidades descontadas'
+                ))
+        finally:
+            Order.objects.filter(company=company).delete()
+            product_ids = [p.pk for p in products]
+            Product.objects.filter(pk__in=product_ids).delete()
+            category_id = category.pk
+            category.delete()
+            company.delete()
+            user.delete()
+            # Los objetos del benchmark no deben llegar a la sincronización de los terminales
+            CatalogTombstone.objects.filter(
+                Q(model=CatalogTombstone.PRODUCT, object_id__in=product_ids) |
+                Q(model=CatalogTombstone.CATEGORY, object_id=category_id)
+            ).delete()
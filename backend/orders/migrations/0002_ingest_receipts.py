@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('sale', 'Venta'), ('activity', 'Actividad')], max_length=20)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_receipts', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Recibo de ingesta',
+                'verbose_name_plural': 'Recibos de ingesta',
+                'indexes': [models.Index(fields=['created_at'], name='orders_receipt_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingestreceipt',
+            constraint=models.UniqueConstraint(fields=('company', 'client_id'), name='orders_receipt_client_uniq'),
+        ),
+    ]
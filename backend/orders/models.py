@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import models
+
+from companies.models import Company
+from products.models import Product
+
+class Order(models.Model):
+    PAID = 'paid'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (PAID, 'Pagada'),
+        (CANCELLED, 'Anulada'),
+    ]
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.PROTECT,
+        related_name='orders'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PAID)
+    # Mesa, comanda o cualquier referencia del terminal
+    reference = models.CharField(max_length=100, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    item_count = models.PositiveIntegerField(default=0)
+    # Clave enviada por el terminal para que los reintentos no dupliquen la venta
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    request_hash = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Orden'
+        verbose_name_plural = 'Órdenes'
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'idempotency_key'],
+                name='orders_order_idempotency_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['company', '-id'], name='orders_order_company_idx'),
+        ]
+
+    def __str__(self):
+        return f"Orden {self.pk} - {self.company_id} ({self.total})"
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.PROTECT,
+        related_name='order_items'
+    )
+    # Nombre y precio al momento de la venta; el catálogo puede cambiar después
+    product_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        verbose_name = 'Ítem de orden'
+        verbose_name_plural = 'Ítems de orden'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+class IngestReceipt(models.Model):
+    """
+    Operación offline ya aplicada, identificada por el id que generó el terminal.
+
+    Si el terminal vuelve a subir la misma operación se devuelve el resultado
+    guardado en lugar de aplicarla otra vez.
+    """
+    SALE = 'sale'
+    ACTIVITY = 'activity'
+    KIND_CHOICES = [
+        (SALE, 'Venta'),
+        (ACTIVITY, 'Actividad'),
+    ]
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='ingest_receipts'
+    )
+    client_id = models.CharField(max_length=64)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Recibo de ingesta'
+        verbose_name_plural = 'Recibos de ingesta'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'client_id'],
+                name='orders_receipt_client_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='orders_receipt_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.client_id} ({self.company_id})"
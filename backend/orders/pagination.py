@@ -0,0 +1,5 @@
+from api.pagination import KeysetPagination
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-id',)
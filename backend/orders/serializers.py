@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+from .models import Order, OrderItem
+from .checkout import get_setting
+
+class CheckoutLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    # Precio que mostró el terminal; si no coincide con el catálogo se rechaza la línea
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutLineSerializer(many=True, allow_empty=False)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate_items(self, items):
+        if len(items) > get_setting('MAX_LINES'):
+            raise serializers.ValidationError(f"Máximo {get_setting('MAX_LINES')} líneas por orden")
+        return items
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'subtotal']
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id',
+            'company',
+            'status',
+            'reference',
+            'total',
+            'item_count',
+            'items',
+            'created_by',
+            'created_at'
+        ]
@@ -0,0 +1,223 @@
+import gzip
+import json
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import User, UserActivityLog
+from companies.models import Company, CompanyUser
+from products.models import Category, Product, StockMovement
+from . import ingest
+from .models import IngestReceipt, Order
+
+
+def create_company(name='Moon Bar', rut='76.000.000-1'):
+    return Company.objects.create(
+        name=name, business_name=name, rut=rut,
+        email='contacto@moonbar.cl', phone='1234', address='Santiago'
+    )
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        category = Category.objects.create(name='Bebidas')
+        cls.juice = Product.objects.create(name='Jugo', price=1000, category=category, stock=5)
+        cls.beer = Product.objects.create(name='Cerveza', price=2500, category=category, stock=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+        self.body = {
+            'items': [
+                {'product': self.juice.id, 'quantity': 2, 'unit_price': '1000.00'},
+                {'product': self.beer.id, 'quantity': 1},
+            ],
+            'reference': 'Mesa 4',
+        }
+
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock
+
+    def test_checkout_query_budget(self):
+        with self.assertNumQueries(11):
+            response = self.client.post('/api/orders/', self.body, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '4500.00')
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual((self.stock(self.juice), self.stock(self.beer)), (3, 0))
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.SALE).count(), 2)
+
+    # El reintento del terminal devuelve la misma orden sin volver a descontar stock
+    def test_idempotent_replay(self):
+        first = self.client.post('/api/orders/', self.body, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        replay = self.client.post('/api/orders/', self.body, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(self.juice), 3)
+
+    def test_idempotency_key_reused_with_other_body(self):
+        self.client.post('/api/orders/', self.body, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        response = self.client.post(
+            '/api/orders/', {'items': [{'product': self.juice.id, 'quantity': 1}]},
+            format='json', HTTP_IDEMPOTENCY_KEY='k1'
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_stock_shortage(self):
+        response = self.client.post('/api/orders/', {'items': [{'product': self.beer.id, 'quantity': 2}]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['shortages'], [{'product': self.beer.id, 'requested': 2, 'available': 1}])
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_lines(self):
+        response = self.client.post('/api/orders/', {'items': [
+            {'product': self.juice.id, 'quantity': 1, 'unit_price': '900'},
+            {'product': 999, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 2)
+        self.assertEqual(self.client.post('/api/orders/', {'items': []}, format='json').status_code, 400)
+
+    def test_list_and_detail(self):
+        order_id = self.client.post('/api/orders/', self.body, format='json').data['id']
+        self.assertEqual([o['id'] for o in self.client.get('/api/orders/').data['results']], [order_id])
+        self.assertEqual(self.client.get(f'/api/orders/{order_id}/').status_code, 200)
+
+    def test_non_member_is_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('otro', 'otro@moonbar.cl', 'clave123'))
+        client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+        self.assertEqual(client.get('/api/orders/').status_code, 403)
+
+
+class CompanyRequiredTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@moonbar.cl', 'clave123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    # El superusuario pasa los permisos: la vista debe detectar que no hay empresa
+    def test_missing_company(self):
+        for method, url in (('get', '/api/orders/'), ('get', '/api/orders/1/'), ('post', '/api/pos/batch/')):
+            response = getattr(self.client, method)(url, format='json')
+            self.assertEqual(response.status_code, 400, url)
+
+    def test_unknown_company(self):
+        for method, url in (('get', '/api/orders/'), ('get', '/api/orders/1/'), ('post', '/api/pos/batch/')):
+            response = getattr(self.client, method)(url, format='json', HTTP_X_COMPANY_ID='9999')
+            self.assertEqual(response.status_code, 400, url)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class PosBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        CompanyUser.objects.create(user=cls.user, company=cls.company)
+        category = Category.objects.create(name='Bebidas')
+        cls.juice = Product.objects.create(name='Jugo', price=1000, category=category, stock=100)
+        cls.beer = Product.objects.create(name='Cerveza', price=2500, category=category, stock=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.id))
+
+    def upload(self, operations):
+        return self.client.post('/api/pos/batch/', {'operations': operations}, format='json')
+
+    def sale(self, client_id, product, quantity=1, **line):
+        return {'id': client_id, 'type': 'sale', 'items': [{'product': product.id, 'quantity': quantity, **line}]}
+
+    # 80 operaciones en un puñado de consultas, con las fechas del terminal
+    def test_compressed_upload_query_budget(self):
+        operations = [
+            {**self.sale(f's{i}', self.juice, unit_price='900'), 'occurred_at': '2026-10-01T22:00:00Z'}
+            for i in range(50)
+        ]
+        operations += [
+            {'id': f'a{i}', 'type': 'activity', 'activity_type': 'login', 'details': 'offline',
+             'occurred_at': '2026-10-01T21:00:00Z'}
+            for i in range(30)
+        ]
+        operations += [self.sale('s0', self.juice), {'id': 'x', 'type': 'nope'}]
+        body = gzip.compress(json.dumps({'operations': operations}).encode())
+        with self.assertNumQueries(15):
+            response = self.client.generic(
+                'POST', '/api/pos/batch/', body, content_type='application/json', HTTP_CONTENT_ENCODING='gzip'
+            )
+        self.assertEqual(response.data['summary'], {'created': 80, 'duplicate': 1, 'invalid': 1})
+        self.assertEqual(Product.objects.get(pk=self.juice.pk).stock, 50)
+        order = Order.objects.first()
+        self.assertEqual((order.created_at.day, str(order.total)), (1, '900.00'))
+        self.assertEqual(UserActivityLog.objects.filter(details='offline', timestamp__day=1).count(), 30)
+
+    def test_reupload_and_shortage(self):
+        self.upload([self.sale('s0', self.juice)])
+        response = self.upload([
+            self.sale('s0', self.juice),
+            self.sale('big', self.beer, 5),
+            self.sale('ok', self.beer),
+            {'id': 'm', 'type': 'sale', 'items': [{'product': 999, 'quantity': 1}]},
+        ])
+        self.assertEqual(response.data['summary'], {'duplicate': 1, 'rejected': 2, 'created': 1})
+        self.assertEqual(response.data['results'][0]['order'], Order.objects.get(idempotency_key='s0').pk)
+        self.assertEqual(Product.objects.get(pk=self.beer.pk).stock, 0)
+
+    # El precio offline se respeta solo dentro de PRICE_TOLERANCE del catálogo
+    @override_settings(POS_INGEST={'PRICE_TOLERANCE': 0.25})
+    def test_price_and_availability_are_validated(self):
+        Product.objects.filter(pk=self.beer.pk).update(is_available=False)
+        response = self.upload([
+            self.sale('barato', self.juice, unit_price='1'),
+            self.sale('negativo', self.juice, unit_price='-1000'),
+            self.sale('vendido', self.beer),
+            self.sale('ok', self.juice, unit_price='1200'),
+        ])
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['rejected', 'invalid', 'rejected', 'created'])
+        self.assertEqual(response.data['results'][0]['errors'][0]['price'], '1000.00')
+        self.assertEqual(str(Order.objects.get().total), '1200.00')
+        self.assertEqual(Product.objects.get(pk=self.juice.pk).stock, 99)
+
+    # Un producto borrado entre la carga y el UPDATE de stock rechaza solo su venta
+    def test_product_deleted_during_upload(self):
+        gone = Product.objects.create(name='Pisco', price=3000, category=self.juice.category, stock=10)
+        in_bulk = QuerySet.in_bulk
+
+        def in_bulk_then_delete(queryset, *args, **kwargs):
+            found = in_bulk(queryset, *args, **kwargs)
+            Product.objects.filter(pk=gone.pk).delete()
+            return found
+
+        with mock.patch.object(QuerySet, 'in_bulk', in_bulk_then_delete):
+            response = self.upload([self.sale('ok', self.juice), self.sale('gone', gone)])
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'rejected'])
+        self.assertEqual(list(IngestReceipt.objects.values_list('client_id', flat=True)), ['ok'])
+        self.assertEqual(Product.objects.get(pk=self.juice.pk).stock, 99)
+
+    def test_invalid_body(self):
+        response = self.client.generic(
+            'POST', '/api/pos/batch/', b'basura', content_type='application/json', HTTP_CONTENT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_busy_server_asks_to_retry(self):
+        with mock.patch.object(ingest.ingest_slots, 'acquire', return_value=False):
+            response = self.upload([])
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
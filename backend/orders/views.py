@@ -0,0 +1,135 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from companies.permissions import IsCompanyMember
+from products.stock import InsufficientStock
+from .models import Order
+from .serializers import CheckoutSerializer, OrderSerializer
+from .pagination import OrderPagination
+from .checkout import CheckoutError, IdempotencyConflict, checkout
+from .ingest import IngestParser, get_setting as get_ingest_setting, ingest, ingest_slots
+from api.views import get_client_ip
+import random
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+def get_request_company(request):
+    # request.company es un SimpleLazyObject: nunca es None, pero su valor sí puede serlo
+    return request.company or None
+
+def company_required_response():
+    return Response(
+        {"detail": "Se requiere el encabezado X-Company-ID de una empresa activa"},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated, IsCompanyMember])
+def order_list(request):
+    company = get_request_company(request)
+    if company is None:
+        return company_required_response()
+
+    if request.method == 'GET':
+        orders = Order.objects.filter(company=company).prefetch_related('items')
+        paginator = OrderPagination()
+        page = paginator.paginate_queryset(orders, request)
+        serializer = OrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    elif request.method == 'POST':
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key and len(idempotency_key) > 64:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} admite hasta 64 caracteres"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = CheckoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            order, created = checkout(
+                company,
+                serializer.validated_data['items'],
+                user=request.user,
+                reference=serializer.validated_data['reference'],
+                idempotency_key=idempotency_key
+            )
+        except CheckoutError as e:
+            return Response({"detail": str(e), "errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except IdempotencyConflict as e:
+            return Response({"detail": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except InsufficientStock as e:
+            return Response(
+                {
+                    "detail": str(e),
+                    "shortages": [
+                        {"product": pk, "requested": requested, "available": available}
+                        for pk, (requested, available) in sorted(e.shortages.items())
+                    ]
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+
+        response = Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        if not created:
+            # Reintento del terminal: misma respuesta, sin volver a cobrar ni descontar stock
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCompanyMember])
+def order_detail(request, pk):
+    company = get_request_company(request)
+    if company is None:
+        return company_required_response()
+    try:
+        order = Order.objects.prefetch_related('items').get(pk=pk, company=company)
+    except Order.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    return Response(OrderSerializer(order).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCompanyMember])
+@parser_classes([IngestParser])
+def pos_batch(request):
+    company = get_request_company(request)
+    if company is None:
+        return company_required_response()
+
+    # Tras un corte de red todos los terminales suben a la vez: se limita la
+    # cantidad de ingestas simultáneas y el resto reintenta más tarde
+    if not ingest_slots.acquire(timeout=get_ingest_setting('ACQUIRE_TIMEOUT')):
+        retry_after = get_ingest_setting('RETRY_AFTER')
+        response = Response(
+            {"detail": "Servidor ocupado procesando otras subidas, reintenta más tarde"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        # Con jitter para que los reintentos no lleguen todos juntos
+        response['Retry-After'] = str(retry_after + random.randint(0, retry_after))
+        return response
+
+    try:
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list):
+            return Response(
+                {"detail": "Se requiere una lista de operaciones"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(operations) > get_ingest_setting('MAX_OPERATIONS'):
+            return Response(
+                {"detail": f"Máximo {get_ingest_setting('MAX_OPERATIONS')} operaciones por subida"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = ingest(company, request.user, operations, ip_address=get_client_ip(request._request))
+    finally:
+        ingest_slots.release()
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return Response({'results': results, 'summary': summary})
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product
+from django import forms
+from .models import Category, Product, StockMovement
+from .stock import apply_movement
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -47,13 +49,14 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'is_available', 'stock', 'created_at', 'updated_at')
+    list_display = ('name', 'sku', 'category', 'price', 'is_available', 'stock', 'created_at', 'updated_at')
     list_filter = ('category', 'is_available', 'created_at')
-    search_fields = ('name', 'description')
-    list_editable = ('is_available', 'stock')
+    search_fields = ('name', 'sku', 'description')
+    # El stock no se edita en la lista: se modifica registrando movimientos
+    list_editable = ('is_available',)
     
     # Campos de solo lectura
-    readonly_fields = ('created_at', 'updated_at', 'image_preview')
+    readonly_fields = ('stock', 'created_at', 'updated_at', 'image_preview')
     
     def image_preview(self, obj):
         if obj.image:
@@ -64,7 +67,7 @@ class ProductAdmin(admin.ModelAdmin):
     # Configuración de campos en el formulario de edición
     fieldsets = (
         (None, {
-            'fields': ('name', 'description', 'category', 'price')
+            'fields': ('name', 'sku', 'description', 'category', 'price')
         }),
         ('Inventory', {
             'fields': ('is_available', 'stock', 'image', 'image_preview')
@@ -76,4 +79,42 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
     # Excluir los campos de timestamp de la edición
-    exclude = ('created_at', 'updated_at')
\ No newline at end of file
+    exclude = ('created_at', 'updated_at')
+
+class StockMovementForm(forms.ModelForm):
+    class Meta:
+        model = StockMovement
+        fields = ('product', 'quantity', 'reason', 'reference')
+
+    def clean(self):
+        data = super().clean()
+        product = data.get('product')
+        quantity = data.get('quantity')
+        # Aviso temprano; la garantía real es el UPDATE condicional de apply_movement
+        if product and quantity is not None and product.stock + quantity < 0:
+            raise forms.ValidationError(f'Stock insuficiente: disponible {product.stock}')
+        return data
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    form = StockMovementForm
+    list_display = ('product', 'quantity', 'reason', 'reference', 'created_by', 'created_at')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('product__name', 'reference')
+    list_select_related = ('product', 'created_by')
+    raw_id_fields = ('product',)
+
+    # El libro es append-only: los movimientos no se editan ni se borran
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        movement = apply_movement(
+            obj.product_id, obj.quantity, obj.reason,
+            reference=obj.reference, user=request.user
+        )
+        obj.pk = movement.pk
+        obj.created_at = movement.created_at
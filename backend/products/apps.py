@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import ensure_search_index
+
+    connection = connections[using]
+    if ('products', '0002_product_search') in MigrationRecorder(connection).applied_migrations():
+        ensure_search_index(connection)
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Algunas migraciones en SQLite recrean la tabla y se llevan los triggers del índice
+        post_migrate.connect(ensure_search_index, sender=self)
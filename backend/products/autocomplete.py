@@ -0,0 +1,191 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .conditional import catalog_signature
+from .models import Category, Product
+
+DEFAULTS = {
+    # Máximo de términos indexados por proceso
+    'MAX_ENTRIES': 500000,
+    # Cada cuántos segundos se compara el índice con la base de datos para
+    # recoger cambios hechos por otros procesos (0 lo desactiva)
+    'CHECK_INTERVAL': 30,
+    'MAX_LIMIT': 50,
+}
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+
+# Costo aproximado en bytes de cada término en la lista ordenada
+ENTRY_OVERHEAD = 120
+
+
+def get_setting(name):
+    return getattr(settings, 'PRODUCT_AUTOCOMPLETE', {}).get(name, DEFAULTS[name])
+
+
+def normalize(text):
+    """Minúsculas y sin tildes: 'Limón' -> 'limon'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def get_terms(label):
+    normalized = normalize(label)
+    words = normalized.split()
+    # El nombre completo permite prefijos de varias palabras ('cerveza ku')
+    return sorted(set(words) | {normalized}) if normalized else []
+
+
+class PrefixIndex:
+    """
+    Índice de prefijos en memoria sobre nombres de productos y categorías.
+
+    Los términos se guardan en una lista ordenada de tuplas (término, tipo, id),
+    de modo que una búsqueda es un bisect más un recorrido corto.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+        self._lock = threading.RLock()
+        self.built = False
+        self.truncated = False
+        self.signature = None
+        self.checked_at = 0
+        self.build_seconds = None
+        self.built_at = None
+
+    def build(self):
+        start = time.monotonic()
+        signature = catalog_signature()
+        rows = [
+            (PRODUCT, pk, name)
+            for pk, name in Product.objects.filter(is_available=True).values_list('id', 'name')
+        ] + [
+            (CATEGORY, pk, name)
+            for pk, name in Category.objects.filter(is_active=True).values_list('id', 'name')
+        ]
+
+        keys = []
+        items = {}
+        truncated = False
+        max_entries = get_setting('MAX_ENTRIES')
+        for kind, pk, name in rows:
+            terms = get_terms(name)
+            if len(keys) + len(terms) > max_entries:
+                truncated = True
+                break
+            items[(kind, pk)] = (name, normalize(name), terms)
+            keys.extend((term, kind, pk) for term in terms)
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._items = items
+            self.truncated = truncated
+            self.signature = signature
+            self.checked_at = time.monotonic()
+            self.built = True
+            self.build_seconds = time.monotonic() - start
+            self.built_at = time.time()
+
+    def invalidate(self):
+        with self._lock:
+            self.built = False
+
+    def ensure_fresh(self):
+        if not self.built:
+            self.build()
+            return
+        interval = get_setting('CHECK_INTERVAL')
+        if interval and time.monotonic() - self.checked_at > interval:
+            self.checked_at = time.monotonic()
+            if catalog_signature() != self.signature:
+                self.build()
+
+    def put(self, kind, pk, name):
+        if not self.built:
+            return
+        with self._lock:
+            self._discard(kind, pk)
+            terms = get_terms(name)
+            if len(self._keys) + len(terms) > get_setting('MAX_ENTRIES'):
+                self.truncated = True
+                return
+            self._items[(kind, pk)] = (name, normalize(name), terms)
+            for term in terms:
+                insort(self._keys, (term, kind, pk))
+
+    def remove(self, kind, pk):
+        if not self.built:
+            return
+        with self._lock:
+            self._discard(kind, pk)
+
+    def _discard(self, kind, pk):
+        item = self._items.pop((kind, pk), None)
+        if item is None:
+            return
+        for term in item[2]:
+            key = (term, kind, pk)
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def search(self, text, limit=10, kind=None):
+        query = normalize(text)
+        if not query:
+            return []
+        words = query.split()
+
+        with self._lock:
+            keys = self._keys
+            position = bisect_left(keys, (words[0],))
+            matches = {}
+            # Se recorre una ventana acotada para no degradar con prefijos muy cortos
+            scan_limit = limit * 20
+            while position < len(keys) and len(matches) < scan_limit:
+                term, item_kind, pk = keys[position]
+                if not term.startswith(words[0]):
+                    break
+                position += 1
+                if kind and item_kind != kind:
+                    continue
+                name, normalized, terms = self._items[(item_kind, pk)]
+                if len(words) > 1 and not all(any(t.startswith(w) for t in terms) for w in words[1:]):
+                    continue
+                # Primero los que empiezan por la consulta completa, luego alfabético
+                rank = (0 if normalized.startswith(query) else 1, normalized)
+                matches[(item_kind, pk)] = (rank, name)
+
+        ordered = sorted(matches.items(), key=lambda item: item[1][0])[:limit]
+        return [
+            {'type': item_kind, 'id': pk, 'name': name}
+            for (item_kind, pk), (rank, name) in ordered
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'built': self.built,
+                'items': len(self._items),
+                'entries': len(self._keys),
+                'max_entries': get_setting('MAX_ENTRIES'),
+                'truncated': self.truncated,
+                'approx_bytes': sum(len(key[0]) for key in self._keys) + len(self._keys) * ENTRY_OVERHEAD,
+                'build_seconds': self.build_seconds,
+                'built_at': self.built_at,
+            }
+
+
+index = PrefixIndex()
+
+
+def autocomplete(text, limit=10, kind=None):
+    index.ensure_fresh()
+    return index.search(text, limit=limit, kind=kind)
@@ -0,0 +1,42 @@
+from django.db.models import Count, Max, Subquery
+
+from api.conditional import make_etag, memoize_on_request
+from .models import CatalogTombstone, Category
+
+
+def catalog_signature():
+    """
+    Estado barato del catálogo: cantidad y última modificación de cada tabla.
+
+    Un borrado no deja updated_at, así que también se incluye la fecha del
+    último CatalogTombstone: sin ella Last-Modified no avanzaría y un
+    If-Modified-Since respondería 304 con el producto ya eliminado.
+    """
+    # Una sola consulta: todo producto tiene categoría, así que el LEFT JOIN los cubre a todos
+    last_deleted = CatalogTombstone.objects.order_by('-deleted_at').values('deleted_at')[:1]
+    state = Category.objects.aggregate(
+        products_total=Count('products'),
+        products_updated=Max('products__updated_at'),
+        categories_total=Count('id', distinct=True),
+        categories_updated=Max('updated_at'),
+        deleted=Max(Subquery(last_deleted)),
+    )
+    return (
+        state['products_total'], state['products_updated'],
+        state['categories_total'], state['categories_updated'],
+        state['deleted'],
+    )
+
+
+def catalog_state(request):
+    return memoize_on_request(request, 'catalog', catalog_signature)
+
+
+def catalog_etag(request, *args, **kwargs):
+    return make_etag('catalog', request.META.get('HTTP_ACCEPT'), catalog_state(request))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, products_updated, _, categories_updated, deleted = catalog_state(request)
+    updated = [value for value in (products_updated, categories_updated, deleted) if value is not None]
+    return max(updated) if updated else None
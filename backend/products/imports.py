@@ -0,0 +1,322 @@
+import csv
+import time
+import zipfile
+from collections import ChainMap
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from xml.etree.ElementTree import ParseError
+
+from django.conf import settings
+from django.db import transaction
+
+from api.versions import bump_version
+from . import autocomplete
+from .models import Category, Product, StockMovement
+from .stock import InsufficientStock, apply_movements
+
+DEFAULTS = {
+    # Filas validadas y escritas por transacción
+    'CHUNK_SIZE': 1000,
+    'MAX_ROWS': 200000,
+    # Errores devueltos en el reporte; el resto solo se cuenta
+    'MAX_ERRORS': 1000,
+}
+
+REQUIRED_COLUMNS = ('sku', 'name', 'price', 'category')
+OPTIONAL_COLUMNS = ('description', 'is_available', 'stock')
+# Columnas que una importación actualiza en productos existentes (si vienen en el archivo)
+UPDATABLE_COLUMNS = ('name', 'price', 'category', 'description', 'is_available')
+
+TRUE_VALUES = {'1', 'true', 'si', 'sí', 'yes', 'x'}
+FALSE_VALUES = {'0', 'false', 'no', ''}
+
+MAX_PRICE = Decimal('99999999.99')
+
+
+def get_setting(name):
+    return getattr(settings, 'PRODUCT_IMPORT', {}).get(name, DEFAULTS[name])
+
+
+class ImportFormatError(Exception):
+    """El archivo no se puede leer o le faltan columnas obligatorias."""
+
+
+def decode_lines(file):
+    """
+    Líneas del archivo como texto, en UTF-8 o en cp1252.
+
+    Excel en español guarda los CSV en cp1252: se prueba UTF-8 línea por
+    línea y, si falla, cp1252 (latin-1 como último recurso, decodifica
+    cualquier byte), así un archivo mixto no corta la importación a medias.
+    """
+    for number, raw in enumerate(file, start=1):
+        try:
+            yield raw.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            try:
+                yield raw.decode('cp1252')
+            except UnicodeDecodeError:
+                yield raw.decode('latin-1')
+
+
+def read_csv(file):
+    lines = decode_lines(file)
+    # Excel en español guarda los CSV con punto y coma
+    sample = next(lines, '')
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(lines, dialect)
+    try:
+        yield next(csv.reader([sample], dialect), [])
+        yield from reader
+    except csv.Error as e:
+        raise ImportFormatError(f'Línea {reader.line_num + 1}: archivo CSV inválido ({e})')
+
+
+def read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFormatError('Para importar XLSX se requiere el paquete openpyxl')
+    invalid = (InvalidFileException, zipfile.BadZipFile, ParseError, KeyError, OSError)
+    # read_only recorre la hoja por filas sin cargar el libro completo
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except invalid:
+        raise ImportFormatError('El archivo XLSX está dañado o no es un libro de Excel')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    except invalid:
+        raise ImportFormatError('El archivo XLSX está dañado o no es un libro de Excel')
+    finally:
+        workbook.close()
+
+
+READERS = {
+    'csv': read_csv,
+    'xlsx': read_xlsx,
+}
+
+
+def parse_row(values, line):
+    """Valida una fila ya convertida a dict; devuelve (datos, errores)."""
+    errors = {}
+    data = {'line': line}
+
+    for column, max_length in (('sku', 64), ('name', 200), ('category', 100)):
+        value = str(values.get(column, '')).strip()
+        if not value:
+            errors[column] = 'Este campo es requerido'
+        elif len(value) > max_length:
+            errors[column] = f'Máximo {max_length} caracteres'
+        data[column] = value
+
+    raw_price = str(values.get('price', '')).strip().replace(',', '.')
+    try:
+        price = Decimal(raw_price).quantize(Decimal('0.01'))
+        if not 0 <= price <= MAX_PRICE:
+            raise InvalidOperation
+        data['price'] = price
+    except (InvalidOperation, ValueError):
+        errors['price'] = 'Precio inválido'
+
+    if 'description' in values:
+        data['description'] = str(values['description']).strip() or None
+
+    if 'is_available' in values:
+        raw = str(values['is_available']).strip().lower()
+        if raw in TRUE_VALUES:
+            data['is_available'] = True
+        elif raw in FALSE_VALUES:
+            data['is_available'] = False
+        else:
+            errors['is_available'] = 'Debe ser sí o no'
+
+    if 'stock' in values and str(values['stock']).strip() != '':
+        try:
+            stock = int(Decimal(str(values['stock']).strip()))
+            if stock < 0:
+                raise ValueError
+            data['stock'] = stock
+        except (InvalidOperation, ValueError):
+            errors['stock'] = 'Debe ser un entero mayor o igual a 0'
+
+    return data, errors
+
+
+class ProductImport:
+    """
+    Importa productos desde una fuente de filas, por bloques.
+
+    Cada bloque se valida sin serializers, resuelve categorías contra un
+    mapa cargado una sola vez y hace upsert por sku con un único
+    bulk_create(update_conflicts=True). Si el archivo trae stock, la
+    diferencia con el stock actual se registra como movimiento de ajuste
+    para que el libro de stock siga cuadrando.
+    """
+
+    def __init__(self, rows, user=None):
+        self.rows = rows
+        self.user = user
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.categories_created = 0
+        self.error_count = 0
+        self.errors = []
+        self.seen_skus = set()
+        self.categories = None
+        self.truncated = False
+
+    def run(self):
+        start = time.monotonic()
+        header = [str(column).strip().lower() for column in next(self.rows, [])]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ImportFormatError(f'Faltan columnas obligatorias: {", ".join(missing)}')
+        self.columns = [column if column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS else None for column in header]
+        self.update_fields = [column for column in UPDATABLE_COLUMNS if column in header] + ['updated_at']
+        self.with_stock = 'stock' in header
+        self.load_categories()
+
+        max_rows = get_setting('MAX_ROWS')
+        chunk_size = get_setting('CHUNK_SIZE')
+        # La fila 1 es el encabezado
+        numbered = enumerate(self.rows, start=2)
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            if self.processed + len(chunk) > max_rows:
+                # Los bloques anteriores ya quedaron guardados; se informa dónde se cortó
+                self.truncated = True
+                self.add_error(chunk[0][0], {'file': f'El archivo supera el máximo de {max_rows} filas'})
+                break
+            self.import_chunk(chunk)
+
+        # bulk_create no dispara señales: el índice se reconstruye en la próxima búsqueda
+        autocomplete.index.invalidate()
+        bump_version('catalog')
+        seconds = time.monotonic() - start
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'categories_created': self.categories_created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'truncated': self.truncated,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.processed / seconds) if seconds else self.processed,
+        }
+
+    def load_categories(self):
+        # Los nombres se comparan normalizados; con duplicados gana la categoría más antigua
+        self.categories = {}
+        for pk, name in Category.objects.order_by('-id').values_list('id', 'name'):
+            self.categories[autocomplete.normalize(name)] = pk
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < get_setting('MAX_ERRORS'):
+            self.errors.append({'row': line, 'errors': errors})
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line, values in chunk:
+            if not any(str(value).strip() for value in values):
+                continue
+            self.processed += 1
+            row = {column: value for column, value in zip(self.columns, values) if column}
+            data, errors = parse_row(row, line)
+            if not errors and data['sku'] in self.seen_skus:
+                errors['sku'] = 'SKU repetido en el archivo'
+            if errors:
+                self.add_error(line, errors)
+                continue
+            self.seen_skus.add(data['sku'])
+            valid.append(data)
+        if not valid:
+            return
+
+        try:
+            with transaction.atomic():
+                new_categories = self.write(valid)
+        except InsufficientStock as e:
+            # Una venta concurrente dejó el stock por debajo del ajuste calculado
+            for data in valid:
+                self.add_error(data['line'], {'stock': str(e)})
+            return
+        # Solo tras el commit: si el bloque se revierte, esas categorías no existen
+        self.categories.update(new_categories)
+        self.categories_created += len(new_categories)
+
+    def write(self, rows):
+        """Escribe un bloque; devuelve las categorías creadas {nombre normalizado: pk}."""
+        new_categories = self.resolve_categories(rows)
+        categories = ChainMap(new_categories, self.categories)
+        skus = [data['sku'] for data in rows]
+        existing = set(Product.objects.filter(sku__in=skus).values_list('sku', flat=True))
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    sku=data['sku'],
+                    name=data['name'],
+                    price=data['price'],
+                    category_id=categories[autocomplete.normalize(data['category'])],
+                    description=data.get('description'),
+                    is_available=data.get('is_available', True),
+                )
+                for data in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=self.update_fields,
+        )
+
+        if self.with_stock:
+            self.adjust_stock(rows)
+        self.created += len(rows) - len(existing)
+        self.updated += len(existing)
+        return new_categories
+
+    def resolve_categories(self, rows):
+        names = {}
+        for data in rows:
+            key = autocomplete.normalize(data['category'])
+            if key not in self.categories:
+                names.setdefault(key, data['category'])
+        if not names:
+            return {}
+        created = Category.objects.bulk_create([Category(name=name) for name in names.values()])
+        return {key: category.pk for key, category in zip(names, created)}
+
+    def adjust_stock(self, rows):
+        targets = {data['sku']: data['stock'] for data in rows if 'stock' in data}
+        current = Product.objects.filter(sku__in=list(targets)).values_list('sku', 'id', 'stock')
+        apply_movements(
+            [
+                {
+                    'product_id': pk,
+                    'quantity': targets[sku] - stock,
+                    'reason': StockMovement.ADJUSTMENT,
+                    'reference': 'Importación',
+                }
+                for sku, pk, stock in current
+                if targets[sku] != stock
+            ],
+            user=self.user
+        )
+
+
+def import_products(file, file_format, user=None):
+    """Importa un archivo CSV o XLSX; devuelve el reporte de ProductImport.run."""
+    reader = READERS.get(file_format)
+    if reader is None:
+        raise ImportFormatError(f'Formato no soportado: {file_format}')
+    return ProductImport(reader(file), user=user).run()
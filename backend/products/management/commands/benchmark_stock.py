@@ -0,0 +1,97 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Q
+
+from products.models import CatalogTombstone, Category, Product, StockMovement
+from products.stock import InsufficientStock, apply_movement
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de ventas concurrentes sobre un mismo producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--sales', type=int, default=200, help='Ventas por hilo')
+        parser.add_argument('--quantity', type=int, default=1, help='Unidades por venta')
+        parser.add_argument(
+            '--stock', type=int, default=None,
+            help='Stock inicial; menor que la demanda total para probar que no se sobrevende'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        sales = options['sales']
+        quantity = options['quantity']
+        initial = options['stock'] if options['stock'] is not None else threads * sales * quantity
+
+        category = Category.objects.create(name='Benchmark stock', is_active=False)
+        product = Product.objects.create(
+            name='Benchmark stock', price=0, category=category, is_available=False, stock=initial
+        )
+        latencies = []
+        counts = {'ok': 0, 'insufficient': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def sell():
+            local = []
+            local_counts = {'ok': 0, 'insufficient': 0, 'errors': 0}
+            try:
+                for _ in range(sales):
+                    start = time.perf_counter()
+                    try:
+                        apply_movement(product.pk, -quantity, StockMovement.SALE, reference='benchmark')
+                        local_counts['ok'] += 1
+                    except InsufficientStock:
+                        local_counts['insufficient'] += 1
+                    except OperationalError:
+                        local_counts['errors'] += 1
+                    local.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+                for key, value in local_counts.items():
+                    counts[key] += value
+
+        workers = [threading.Thread(target=sell) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db(fields=['stock'])
+        ledger = StockMovement.objects.filter(product=product, reason=StockMovement.SALE).count()
+        expected = initial - counts['ok'] * quantity
+
+        try:
+            latencies.sort()
+            self.stdout.write(
+                f"{threads} hilos x {sales} ventas en {elapsed:.2f}s "
+                f"({len(latencies) / elapsed:.0f} ventas/s)\n"
+                f"latencia p50 {statistics.median(latencies) * 1000:.2f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms\n"
+                f"aplicadas {counts['ok']}, sin stock {counts['insufficient']}, errores {counts['errors']}"
+            )
+            if product.stock == expected and ledger == counts['ok'] and product.stock >= 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Stock final {product.stock}: sin actualizaciones perdidas ni sobreventa'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'Stock final {product.stock}, esperado {expected}, movimientos {ledger}'
+                ))
+        finally:
+            product_id, category_id = product.pk, category.pk
+            product.delete()
+            category.delete()
+            # Los objetos del benchmark no deben llegar a la sincronización de los terminales
+            CatalogTombstone.objects.filter(
+                Q(model=CatalogTombstone.PRODUCT, object_id=product_id) |
+                Q(model=CatalogTombstone.CATEGORY, object_id=category_id)
+            ).delete()
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.stock import compact_ledger, get_setting, ledger_drift
+
+
+class Command(BaseCommand):
+    help = 'Compacta los movimientos de stock antiguos en el saldo de cada producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Compacta movimientos con más de N días (por defecto STOCK_LEDGER["COMPACT_AFTER_DAYS"])'
+        )
+        parser.add_argument('--check', action='store_true', help='Verifica que el libro cuadre con el stock')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_setting('COMPACT_AFTER_DAYS')
+        movements, products = compact_ledger(before=timezone.now() - timedelta(days=days))
+        self.stdout.write(self.style.SUCCESS(
+            f'{movements} movimientos compactados en {products} productos'
+        ))
+
+        if options['check']:
+            drift = ledger_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS('El libro cuadra con el stock de todos los productos'))
+            for pk, (stock, expected) in sorted(drift.items()):
+                self.stdout.write(self.style.WARNING(
+                    f'Producto {pk}: stock {stock}, según el libro {expected}'
+                ))
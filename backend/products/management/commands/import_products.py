@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.imports import ImportFormatError, import_products
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos por SKU desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'xlsx'), default=None, help='Por defecto, según la extensión')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        try:
+            with open(path, 'rb') as file:
+                report = import_products(file, file_format)
+        except (ImportFormatError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f'Fila {error["row"]}: {error["errors"]}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["processed"]} filas en {report["seconds"]:.2f}s ({report["rows_per_second"]} filas/s): '
+            f'{report["created"]} creados, {report["updated"]} actualizados, '
+            f'{report["categories_created"]} categorías nuevas, {report["error_count"]} con errores'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.sync import get_setting, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Elimina los tombstones de catálogo más antiguos que la retención configurada'
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} tombstones eliminados '
+            f'(retención: {get_setting("TOMBSTONE_RETENTION_DAYS")} días)'
+        ))
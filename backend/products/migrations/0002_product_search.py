@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from products.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    backend.install(schema_editor.connection)
+    backend.rebuild(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from products.search import get_backend
+
+    get_backend(schema_editor.connection).uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
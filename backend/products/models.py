@@ -13,16 +13,24 @@ class Category(models.Model):
         verbose_name = 'Categoría'
         verbose_name_plural = 'Categorias'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='products_category_sync_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     @property
     def product_count(self):
+        # Los listados anotan num_products para no contar categoría por categoría
+        if 'num_products' in self.__dict__:
+            return self.num_products
         return self.products.count()
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    # Código del comercio; es la clave con la que las importaciones actualizan productos
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(
         max_digits=10, 
@@ -48,6 +56,110 @@ class Product(models.Model):
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='products_product_sync_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class CatalogTombstone(models.Model):
+    """
+    Registro de productos y categorías eliminados.
+
+    Permite que la sincronización incremental de los terminales propague
+    los borrados, que de otro modo no dejarían rastro en la tabla.
+    """
+    PRODUCT = 'product'
+    CATEGORY = 'category'
+    MODEL_CHOICES = [
+        (PRODUCT, 'Producto'),
+        (CATEGORY, 'Categoría'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Eliminación de catálogo'
+        verbose_name_plural = 'Eliminaciones de catálogo'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='products_tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} - {self.deleted_at}"
+
+class StockMovement(models.Model):
+    """
+    Movimiento de inventario (libro append-only).
+
+    quantity es el delta con signo que se aplicó sobre Product.stock: las
+    ventas y mermas son negativas, las reposiciones positivas.
+    """
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    WASTE = 'waste'
+    RETURN = 'return'
+    REASON_CHOICES = [
+        (SALE, 'Venta'),
+        (RESTOCK, 'Reposición'),
+        (ADJUSTMENT, 'Ajuste'),
+        (WASTE, 'Merma'),
+        (RETURN, 'Devolución'),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements'
+    )
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(
+        'api.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Movimiento de stock'
+        verbose_name_plural = 'Movimientos de stock'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['product', 'id'], name='products_stock_product_idx'),
+            models.Index(fields=['created_at'], name='products_stock_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.quantity:+d} ({self.reason})"
+
+class StockSnapshot(models.Model):
+    """
+    Saldo compactado del libro de movimientos de un producto.
+
+    Se cumple stock = quantity + suma de los movimientos con id mayor a
+    last_movement_id.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshot'
+    )
+    quantity = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Saldo de stock'
+        verbose_name_plural = 'Saldos de stock'
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity}"
@@ -0,0 +1,15 @@
+from api.pagination import KeysetPagination
+
+
+class ProductPagination(KeysetPagination):
+    ordering = ('name', 'id')
+    ordering_fields = ('name', 'price', 'stock', 'created_at', 'updated_at')
+
+
+class CategoryPagination(KeysetPagination):
+    ordering = ('name', 'id')
+    ordering_fields = ('name', 'created_at', 'updated_at')
+
+
+class StockMovementPagination(KeysetPagination):
+    ordering = ('-id',)
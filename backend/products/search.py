@@ -0,0 +1,234 @@
+import re
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    # None elige el backend según el motor de base de datos
+    'BACKEND': None,
+    # Máximo de resultados rankeados que devuelve una búsqueda
+    'MAX_RESULTS': 500,
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_setting(name):
+    return getattr(settings, 'PRODUCT_SEARCH', {}).get(name, DEFAULTS[name])
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text or '')
+
+
+class BasicSearchBackend:
+    """Búsqueda sin índice (LIKE); se usa solo si el motor no tiene otra opción."""
+
+    def install(self, connection):
+        pass
+
+    def uninstall(self, connection):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def is_installed(self, connection):
+        return True
+
+    def search_ids(self, text, limit, candidates):
+        condition = Q()
+        for token in tokenize(text):
+            condition &= Q(name__icontains=token) | Q(description__icontains=token)
+        return list(candidates.filter(condition).order_by('name').values_list('id', flat=True)[:limit])
+
+
+class SQLiteSearchBackend:
+    """
+    Índice FTS5 de contenido externo sobre products_product.
+
+    Los triggers mantienen el índice sincronizado con cualquier escritura,
+    incluidas bulk_create y update(). El tokenizer unicode61 con
+    remove_diacritics ignora tildes ("limon" encuentra "Limón").
+    """
+    table = 'products_product_fts'
+    triggers = ('products_product_fts_ai', 'products_product_fts_ad', 'products_product_fts_au')
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "name, description, content='products_product', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS products_product_fts_ai AFTER INSERT ON products_product BEGIN "
+                f"INSERT INTO {self.table}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+                "END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS products_product_fts_ad AFTER DELETE ON products_product BEGIN "
+                f"INSERT INTO {self.table}({self.table}, rowid, name, description) "
+                "VALUES ('delete', old.id, old.name, old.description); "
+                "END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS products_product_fts_au AFTER UPDATE OF name, description "
+                f"ON products_product BEGIN "
+                f"INSERT INTO {self.table}({self.table}, rowid, name, description) "
+                "VALUES ('delete', old.id, old.name, old.description); "
+                f"INSERT INTO {self.table}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+                "END"
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            for trigger in self.triggers:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def rebuild(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def is_installed(self, connection):
+        # Django recrea la tabla en algunos ALTER de SQLite y con ella se pierden los triggers
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                self.triggers
+            )
+            return cursor.fetchone()[0] == len(self.triggers)
+
+    def build_query(self, text):
+        # Cada término como prefijo entre comillas: 'cer kun' -> "cer"* "kun"*
+        return ' '.join(f'"{token}"*' for token in tokenize(text))
+
+    def search_ids(self, text, limit, candidates):
+        query = self.build_query(text)
+        if not query:
+            return []
+        subquery, params = candidate_ids_sql(candidates)
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s AND rowid IN ({subquery}) "
+                f"ORDER BY bm25({self.table}, 10.0, 1.0) LIMIT %s",
+                [query, *params, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    """
+    Índice GIN sobre un tsvector sin tildes de nombre y descripción.
+
+    unaccent no es IMMUTABLE, por lo que se envuelve en una función que sí lo
+    es para poder indexar la expresión.
+    """
+    document = (
+        "to_tsvector('simple', products_unaccent("
+        "coalesce(name, '') || ' ' || coalesce(description, '')))"
+    )
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            cursor.execute(
+                "CREATE OR REPLACE FUNCTION products_unaccent(text) RETURNS text AS "
+                "$$ SELECT public.unaccent('public.unaccent', $1) $$ "
+                "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS products_product_search_idx "
+                f"ON products_product USING GIN ({self.document})"
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX IF EXISTS products_product_search_idx")
+            cursor.execute("DROP FUNCTION IF EXISTS products_unaccent(text)")
+
+    def rebuild(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX products_product_search_idx")
+
+    def is_installed(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('products_product_search_idx') IS NOT NULL")
+            return cursor.fetchone()[0]
+
+    def build_query(self, text):
+        return ' & '.join(f'{token}:*' for token in tokenize(text))
+
+    def search_ids(self, text, limit, candidates):
+        query = self.build_query(text)
+        if not query:
+            return []
+        subquery, params = candidate_ids_sql(candidates)
+        with default_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM products_product "
+                f"WHERE {self.document} @@ to_tsquery('simple', products_unaccent(%s)) AND id IN ({subquery}) "
+                f"ORDER BY ts_rank({self.document}, to_tsquery('simple', products_unaccent(%s))) DESC, name "
+                "LIMIT %s",
+                [query, *params, query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def candidate_ids_sql(candidates):
+    # Los filtros de la vista van dentro de la búsqueda: MAX_RESULTS se aplica después de filtrar
+    return candidates.order_by().values('id').query.sql_with_params()
+
+
+_fts5_support = {}
+
+
+def sqlite_has_fts5(connection):
+    if connection.alias not in _fts5_support:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            _fts5_support[connection.alias] = bool(cursor.fetchone()[0])
+    return _fts5_support[connection.alias]
+
+
+def get_backend(connection=None):
+    connection = connection or default_connection
+    backend = get_setting('BACKEND')
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
+
+
+def ensure_search_index(connection):
+    """Instala el índice si falta y lo reconstruye; devuelve True si hubo que hacerlo."""
+    backend = get_backend(connection)
+    if backend.is_installed(connection):
+        return False
+    backend.install(connection)
+    backend.rebuild(connection)
+    return True
+
+
+def search_products(queryset, text):
+    """
+    Filtra el queryset con el índice de búsqueda y lo ordena por relevancia.
+
+    El queryset ya debe traer los filtros de categoría o disponibilidad, así
+    el tope de MAX_RESULTS cuenta solo productos que cumplen con ellos. El
+    ranking queda anotado en search_rank (0 es el mejor resultado).
+    """
+    ids = get_backend().search_ids(text, get_setting('MAX_RESULTS'), queryset)
+    if not ids:
+        return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+    ranking = Case(
+        *[When(id=pk, then=Value(position)) for position, pk in enumerate(ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(id__in=ids).annotate(search_rank=ranking).order_by('search_rank')
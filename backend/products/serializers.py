@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Category, Product
+from api.compiled import CompiledSerializer
+from api.fieldsets import SparseFieldsMixin
+from .models import Category, Product, StockMovement
+from .stock import apply_movement
 
 class CategorySerializer(serializers.ModelSerializer):
     product_count = serializers.IntegerField(read_only=True)
@@ -15,7 +19,7 @@ class CategorySerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.image.url)
             return obj.image.url
         return None
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
 
     class Meta:
@@ -23,6 +27,7 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = [
             'id', 
             'name', 
+            'sku',
             'description', 
             'price', 
             'category',
@@ -31,4 +36,56 @@ class ProductSerializer(serializers.ModelSerializer):
             'image',
             'stock',
             'created_at'
-        ]
\ No newline at end of file
+        ]
+
+    def validate_sku(self, value):
+        # Vacío se guarda como NULL para que la restricción única no choque entre productos sin código
+        return value or None
+
+    def create(self, validated_data):
+        # El stock inicial entra como movimiento para que el libro cuadre con Product.stock
+        initial_stock = validated_data.pop('stock', 0)
+        request = self.context.get('request')
+        with transaction.atomic():
+            product = super().create(validated_data)
+            if initial_stock:
+                apply_movement(
+                    product.pk,
+                    initial_stock,
+                    StockMovement.ADJUSTMENT,
+                    reference='Stock inicial',
+                    user=getattr(request, 'user', None)
+                )
+                product.stock = initial_stock
+        return product
+
+    def update(self, instance, validated_data):
+        # Después de creado, el stock solo cambia mediante movimientos
+        validated_data.pop('stock', None)
+        return super().update(instance, validated_data)
+
+class CompiledProductSerializer(CompiledSerializer):
+    serializer_class = ProductSerializer
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    # Signo esperado del delta según el motivo; el ajuste admite ambos
+    NEGATIVE_REASONS = (StockMovement.SALE, StockMovement.WASTE)
+    POSITIVE_REASONS = (StockMovement.RESTOCK, StockMovement.RETURN)
+
+    # Entero simple: validar cada producto con una consulta no escala en lotes grandes
+    product = serializers.IntegerField(source='product_id')
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'product', 'quantity', 'reason', 'reference', 'created_by', 'created_at']
+        read_only_fields = ['id', 'created_by', 'created_at']
+
+    def validate(self, data):
+        quantity = data['quantity']
+        if quantity == 0:
+            raise serializers.ValidationError({'quantity': 'La cantidad no puede ser cero'})
+        if data['reason'] in self.NEGATIVE_REASONS and quantity > 0:
+            raise serializers.ValidationError({'quantity': 'Las ventas y mermas deben ser negativas'})
+        if data['reason'] in self.POSITIVE_REASONS and quantity < 0:
+            raise serializers.ValidationError({'quantity': 'Las reposiciones y devoluciones deben ser positivas'})
+        return data
@@ -0,0 +1,53 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.versions import bump_version_on_commit
+from . import autocomplete
+from .models import CatalogTombstone, Category, Product
+
+
+# El índice vive en memoria: un cambio revertido no debe quedar en él, y
+# catalog_signature no lo detectaría (mismo conteo y mismo updated_at)
+def put_on_commit(kind, pk, name):
+    transaction.on_commit(partial(autocomplete.index.put, kind, pk, name))
+
+
+def remove_on_commit(kind, pk):
+    transaction.on_commit(partial(autocomplete.index.remove, kind, pk))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if instance.is_available:
+        put_on_commit(autocomplete.PRODUCT, instance.pk, instance.name)
+    else:
+        remove_on_commit(autocomplete.PRODUCT, instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    remove_on_commit(autocomplete.PRODUCT, instance.pk)
+    CatalogTombstone.objects.create(model=CatalogTombstone.PRODUCT, object_id=instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    if instance.is_active:
+        put_on_commit(autocomplete.CATEGORY, instance.pk, instance.name)
+    else:
+        remove_on_commit(autocomplete.CATEGORY, instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    remove_on_commit(autocomplete.CATEGORY, instance.pk)
+    CatalogTombstone.objects.create(model=CatalogTombstone.CATEGORY, object_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def bump_catalog_version(sender, instance, **kwargs):
+    bump_version_on_commit('catalog')
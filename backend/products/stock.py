@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from api.versions import bump_version_on_commit
+from .models import Product, StockMovement, StockSnapshot
+
+DEFAULTS = {
+    # Movimientos más antiguos que esto se compactan en StockSnapshot
+    'COMPACT_AFTER_DAYS': 30,
+    # Máximo de movimientos aceptados en un solo lote
+    'MAX_BATCH': 500,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'STOCK_LEDGER', {}).get(name, DEFAULTS[name])
+
+
+class InsufficientStock(Exception):
+    """Uno o más productos no tienen stock suficiente; no se aplicó nada."""
+
+    def __init__(self, shortages):
+        # {product_id: (solicitado, disponible)}
+        self.shortages = shortages
+        detail = ', '.join(
+            f'producto {pk}: solicitado {requested}, disponible {available}'
+            for pk, (requested, available) in sorted(shortages.items())
+        )
+        super().__init__(f'Stock insuficiente ({detail})')
+
+
+def apply_movement(product_id, quantity, reason, reference='', user=None):
+    """Aplica un único movimiento; ver apply_movements."""
+    return apply_movements(
+        [{'product_id': product_id, 'quantity': quantity, 'reason': reason, 'reference': reference}],
+        user=user
+    )[0]
+
+
+def apply_movements(movements, user=None):
+    """
+    Aplica varios movimientos de stock en una sola transacción.
+
+    Los deltas se agrupan por producto y se aplican con un único UPDATE
+    condicional (stock + delta >= 0), de modo que la base de datos resuelve
+    la concurrencia sin leer y reescribir el valor. Si algún producto no
+    alcanza se lanza InsufficientStock y no se aplica ningún movimiento.
+    """
+    if not movements:
+        return []
+
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[int(movement['product_id'])] += movement['quantity']
+    changed = {pk: delta for pk, delta in deltas.items() if delta}
+
+    with transaction.atomic():
+        if changed:
+            allowed = Q()
+            for pk, delta in changed.items():
+                allowed |= Q(pk=pk, stock__gte=-delta) if delta < 0 else Q(pk=pk)
+            applied_at = timezone.now()
+            updated = Product.objects.filter(allowed).update(
+                stock=F('stock') + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in changed.items()],
+                    output_field=IntegerField()
+                ),
+                # Sin updated_at el cambio no llegaría a los ETags ni a la sincronización
+                updated_at=applied_at
+            )
+            if updated != len(changed):
+                raise_shortages(changed, applied_at)
+            # UPDATE no emite señales: el stock visible en el catálogo cambió
+            bump_version_on_commit('catalog')
+
+        created_by_id = getattr(user, 'pk', None)
+        return StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=int(movement['product_id']),
+                quantity=movement['quantity'],
+                reason=movement['reason'],
+                reference=movement.get('reference', ''),
+                created_by_id=created_by_id
+            )
+            for movement in movements
+        ])
+
+
+def raise_shortages(deltas, applied_at):
+    """
+    Lanza InsufficientStock con los productos que el UPDATE rechazó.
+
+    No basta con releer el stock: otra transacción puede reponerlo entre el
+    UPDATE y la lectura y el detalle quedaría vacío. Las filas que sí se
+    actualizaron tienen updated_at = applied_at y siguen bloqueadas por esta
+    transacción; las demás son las rechazadas.
+    """
+    rows = {
+        pk: (stock, updated_at)
+        for pk, stock, updated_at in Product.objects.filter(pk__in=deltas).values_list('id', 'stock', 'updated_at')
+    }
+    missing = set(deltas) - set(rows)
+    if missing:
+        raise Product.DoesNotExist(f'Productos inexistentes: {sorted(missing)}')
+    raise InsufficientStock({
+        pk: (-delta, rows[pk][0])
+        for pk, delta in deltas.items()
+        if rows[pk][1] != applied_at
+    })
+
+
+def compact_ledger(before=None):
+    """
+    Suma los movimientos anteriores a `before` en StockSnapshot y los borra.
+
+    Devuelve (movimientos compactados, productos afectados).
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=get_setting('COMPACT_AFTER_DAYS'))
+
+    with transaction.atomic():
+        # Se corta por id para que el rango sea estable aunque entren movimientos nuevos
+        cutoff = StockMovement.objects.filter(created_at__lt=before).aggregate(last=Max('id'))['last']
+        if cutoff is None:
+            return 0, 0
+
+        compacted = StockMovement.objects.filter(id__lte=cutoff)
+        totals = dict(
+            compacted.order_by().values('product_id').annotate(total=Sum('quantity'))
+            .values_list('product_id', 'total')
+        )
+        snapshots = {
+            snapshot.product_id: snapshot
+            for snapshot in StockSnapshot.objects.select_for_update().filter(product_id__in=totals)
+        }
+        for product_id, total in totals.items():
+            snapshot = snapshots.setdefault(product_id, StockSnapshot(product_id=product_id))
+            snapshot.quantity += total
+            snapshot.last_movement_id = cutoff
+
+        now = timezone.now()
+        existing = [snapshot for snapshot in snapshots.values() if snapshot.pk is not None]
+        for snapshot in existing:
+            snapshot.updated_at = now
+        StockSnapshot.objects.bulk_update(existing, ['quantity', 'last_movement_id', 'updated_at'])
+        StockSnapshot.objects.bulk_create(
+            [snapshot for snapshot in snapshots.values() if snapshot.pk is None]
+        )
+        deleted, _ = compacted.delete()
+    return deleted, len(totals)
+
+
+def ledger_drift():
+    """
+    Productos cuyo stock no coincide con saldo compactado + movimientos.
+
+    Devuelve {product_id: (stock, saldo según el libro)}.
+    """
+    movements = dict(
+        StockMovement.objects.order_by().values('product_id').annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    snapshots = dict(StockSnapshot.objects.values_list('product_id', 'quantity'))
+    drift = {}
+    for pk, stock in Product.objects.values_list('id', 'stock').iterator():
+        expected = snapshots.get(pk, 0) + movements.get(pk, 0)
+        if expected != stock:
+            drift[pk] = (stock, expected)
+    return drift
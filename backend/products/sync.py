@@ -0,0 +1,158 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CatalogTombstone, Category, Product
+from .serializers import CategorySerializer, ProductSerializer
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    # Margen para no saltarse filas cuyo updated_at se fijó antes del commit
+    'WATERMARK_LAG': 2,
+    'TOMBSTONE_RETENTION_DAYS': 30,
+}
+
+# Las categorías van primero para que los productos siempre referencien una existente
+PHASES = ('categories', 'products', 'deleted')
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+def get_setting(name):
+    return getattr(settings, 'CATALOG_SYNC', {}).get(name, DEFAULTS[name])
+
+
+def encode_token(state):
+    raw = json.dumps(state, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_token(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidSyncToken('Token de continuación inválido')
+    if not isinstance(state, dict) or state.get('phase') not in PHASES or not state.get('until'):
+        raise InvalidSyncToken('Token de continuación inválido')
+    return state
+
+
+def parse_watermark(value):
+    if not value:
+        return None
+    watermark = parse_datetime(value)
+    if watermark is None:
+        raise InvalidSyncToken('Watermark inválido')
+    if timezone.is_naive(watermark):
+        watermark = timezone.make_aware(watermark, timezone.utc)
+    return watermark
+
+
+def phase_queryset(phase, since, until):
+    if phase == 'categories':
+        queryset = Category.objects.annotate(num_products=Count('products'))
+        field = 'updated_at'
+    elif phase == 'products':
+        queryset = Product.objects.select_related('category')
+        field = 'updated_at'
+    else:
+        queryset = CatalogTombstone.objects.all()
+        field = 'deleted_at'
+
+    queryset = queryset.filter(**{f'{field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gt': since})
+    return queryset.order_by(field, 'id'), field
+
+
+def sync_catalog(since=None, token=None, limit=None, context=None):
+    """
+    Cambios del catálogo entre un watermark y ahora.
+
+    Devuelve upserts de categorías y productos, ids eliminados y, al llegar
+    al final, el nuevo watermark. Si el lote no cabe en `limit` filas se
+    devuelve un token para continuar desde donde quedó.
+    """
+    limit = min(limit or get_setting('PAGE_SIZE'), get_setting('MAX_PAGE_SIZE'))
+    if token:
+        state = decode_token(token)
+        reset = state.get('reset', False)
+    else:
+        since_value = parse_watermark(since)
+        horizon = timezone.now() - timedelta(days=get_setting('TOMBSTONE_RETENTION_DAYS'))
+        # Si el watermark es más viejo que los tombstones retenidos hay que resincronizar todo
+        reset = since_value is None or since_value < horizon
+        until = timezone.now() - timedelta(seconds=get_setting('WATERMARK_LAG'))
+        state = {
+            'since': None if reset else since_value.isoformat(),
+            'until': until.isoformat(),
+            'phase': PHASES[0],
+            'after': None,
+            'reset': reset,
+        }
+
+    since_value = parse_watermark(state['since'])
+    until = parse_watermark(state['until'])
+    result = {
+        'categories': [],
+        'products': [],
+        'deleted': {'products': [], 'categories': []},
+        'reset': reset,
+        'next': None,
+        'watermark': None,
+    }
+
+    remaining = limit
+    for phase in PHASES[PHASES.index(state['phase']):]:
+        # En una sincronización completa no hace falta enviar borrados
+        if phase == 'deleted' and state['since'] is None:
+            continue
+
+        queryset, field = phase_queryset(phase, since_value, until)
+        after = state['after'] if phase == state['phase'] else None
+        if after:
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': after[0]}) | Q(**{field: after[0], 'id__gt': after[1]})
+            )
+        rows = list(queryset[:remaining + 1])
+        has_more = len(rows) > remaining
+        rows = rows[:remaining]
+        remaining -= len(rows)
+
+        if phase == 'categories':
+            result['categories'] = CategorySerializer(rows, many=True, context=context).data
+        elif phase == 'products':
+            result['products'] = ProductSerializer(rows, many=True, context=context).data
+        else:
+            for tombstone in rows:
+                key = 'products' if tombstone.model == CatalogTombstone.PRODUCT else 'categories'
+                result['deleted'][key].append(tombstone.object_id)
+
+        if has_more or (remaining == 0 and phase != PHASES[-1]):
+            last = rows[-1] if rows else None
+            state.update({
+                'phase': phase,
+                'after': [getattr(last, field).isoformat(), last.pk] if last else state['after'],
+            })
+            if not has_more:
+                # La fase terminó justo al llenar el lote; se continúa con la siguiente
+                state.update({'phase': PHASES[PHASES.index(phase) + 1], 'after': None})
+            result['next'] = encode_token(state)
+            return result
+
+    result['watermark'] = state['until']
+    return result
+
+
+def purge_tombstones():
+    horizon = timezone.now() - timedelta(days=get_setting('TOMBSTONE_RETENTION_DAYS'))
+    deleted, _ = CatalogTombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
@@ -1,3 +1,433 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api.models import User
+from . import autocomplete
+from .models import Category, Product, StockMovement
+from .search import search_products
+from .stock import InsufficientStock, apply_movements, compact_ledger, ledger_drift, raise_shortages
+
+
+# Los presupuestos miden las consultas de la vista, no las de la caché de respuestas
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CatalogQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        cls.categories = [Category.objects.create(name=f'Categoría {i}') for i in range(5)]
+        for i in range(30):
+            Product.objects.create(
+                name=f'Producto {i:02d}',
+                price=1000 + i,
+                category=cls.categories[i % 5],
+                stock=i % 3,
+                is_available=i % 4 != 0,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    # Presupuesto por página: 1 consulta para el ETag del catálogo + 1 para los datos
+    def test_product_list_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/?page_size=20')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['category_name'], 'Categoría 0')
+
+    def test_category_list_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/categories/')
+        self.assertEqual([c['product_count'] for c in response.data['results']], [6] * 5)
+
+    def test_product_pages_cover_catalog(self):
+        ids = []
+        url = '/api/products/?page_size=7&ordering=-price'
+        while url:
+            response = self.client.get(url)
+            ids.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        prices = list(Product.objects.filter(id__in=ids).order_by('-price').values_list('id', flat=True))
+        self.assertEqual(ids, prices)
+        self.assertEqual(len(ids), 30)
+
+    def test_not_modified_skips_serialization(self):
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_availability_filters(self):
+        response = self.client.get('/api/products/?page_size=100&is_available=true&in_stock=true')
+        expected = Product.objects.filter(is_available=True, stock__gt=0).count()
+        self.assertEqual(len(response.data['results']), expected)
+        self.assertTrue(all(p['is_available'] and p['stock'] > 0 for p in response.data['results']))
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        cls.drinks = Category.objects.create(name='Bebidas')
+        cls.beers = Category.objects.create(name='Cervezas')
+        Product.objects.create(name='Jugo de Limón', description='natural', price=1500, category=cls.drinks)
+        Product.objects.create(name='Cerveza Kunstmann', description='limón de pica', price=2500, category=cls.beers)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        return [p['name'] for p in self.client.get(f'/api/products/?{query}').data['results']]
+
+    # Sin tildes y con el nombre mejor rankeado que la descripción
+    def test_search_ranks_name_matches_first(self):
+        self.assertEqual(self.search('search=limon'), ['Jugo de Limón', 'Cerveza Kunstmann'])
+
+    def test_index_follows_updates_and_deletes(self):
+        pisco = Product.objects.create(name='Pisco', price=3000, category=self.drinks)
+        pisco.name = 'Pisco Sour limón'
+        pisco.save()
+        self.assertEqual(len(self.search('search=lim')), 3)
+        pisco.delete()
+        self.assertEqual(len(self.search('search=lim')), 2)
+
+    def test_quotes_do_not_break_query(self):
+        self.assertEqual(self.search('search=pisco "'), [])
+
+    # El tope se aplica después de filtrar: los otros resultados no desplazan a los de la categoría
+    @override_settings(PRODUCT_SEARCH={'MAX_RESULTS': 2})
+    def test_max_results_applies_after_filters(self):
+        for i in range(3):
+            Product.objects.create(name=f'Limón {i}', price=1000, category=self.drinks, stock=0)
+        self.assertEqual(self.search(f'search=limon&category={self.beers.id}'), ['Cerveza Kunstmann'])
+        Product.objects.filter(name='Jugo de Limón').update(stock=5)
+        self.assertEqual(self.search('search=limon&in_stock=true'), ['Jugo de Limón'])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123', is_staff=True)
+        cls.beers = Category.objects.create(name='Cervezas')
+        Product.objects.create(name='Cerveza Kunstmann Torobayo', price=2500, category=cls.beers)
+        Product.objects.create(name='Jugo de Limón', price=1500, category=cls.beers)
+
+    def setUp(self):
+        # El índice vive en el proceso: se reconstruye con los datos de cada prueba
+        autocomplete.index.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, query):
+        return [item['name'] for item in self.client.get(f'/api/products/autocomplete/?{query}').data['results']]
+
+    def test_prefix_matches_products_and_categories(self):
+        self.assertEqual(self.names('q=cer'), ['Cerveza Kunstmann Torobayo', 'Cervezas'])
+        self.assertEqual(self.names('q=LIMON'), ['Jugo de Limón'])
+
+    # Las señales mantienen el índice al día sin volver a la base de datos
+    def test_index_follows_writes_without_queries(self):
+        self.names('q=cer')
+        with self.captureOnCommitCallbacks(execute=True):
+            austral = Product.objects.create(name='Cerveza Austral', price=2000, category=self.beers)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('q=cerveza a&type=product'), ['Cerveza Austral'])
+        with self.captureOnCommitCallbacks(execute=True):
+            austral.delete()
+        self.assertEqual(self.names('q=austral'), [])
+
+    # Un cambio revertido no llega al índice: la firma del catálogo no lo detectaría
+    def test_rolled_back_writes_are_not_indexed(self):
+        self.names('q=cer')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Product.objects.create(name='Fantasma', price=1000, category=self.beers)
+                    self.beers.name = 'Mojito'
+                    self.beers.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.beers.refresh_from_db()
+        self.assertEqual(self.names('q=fantas'), [])
+        self.assertEqual(self.names('q=mojito'), [])
+        self.assertEqual(self.names('q=cervezas'), ['Cervezas'])
+
+    def test_stats_are_for_staff(self):
+        self.names('q=cer')
+        self.assertEqual(self.client.get('/api/products/autocomplete/stats/').data['items'], 3)
+        self.user.is_staff = False
+        self.assertEqual(self.client.get('/api/products/autocomplete/stats/').status_code, 403)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CatalogConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        cls.category = Category.objects.create(name='Bebidas')
+        cls.product = Product.objects.create(name='Jugo', price=1500, category=cls.category)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_on_catalog_lists(self):
+        for url in ('/api/products/', '/api/categories/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+    def test_delete_changes_etag(self):
+        etag = self.client.get('/api/products/')['ETag']
+        self.product.delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    # Un borrado no toca updated_at: la fecha del tombstone hace avanzar Last-Modified
+    def test_delete_advances_last_modified(self):
+        past = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=past)
+        Category.objects.update(updated_at=past)
+        since = self.client.get('/api/products/')['Last-Modified']
+        self.assertEqual(since, http_date(past.timestamp()))
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+        self.product.delete()
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_writes_ignore_conditional_headers(self):
+        etag = self.client.get('/api/products/')['ETag']
+        self.assertEqual(self.client.post('/api/products/', {}, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+
+# Sin margen: las filas creadas en la prueba ya caen bajo el watermark
+@override_settings(CATALOG_SYNC={'WATERMARK_LAG': 0})
+class CatalogSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        cls.categories = [Category.objects.create(name=f'Categoría {i}') for i in range(3)]
+        cls.products = [
+            Product.objects.create(name=f'Producto {i}', price=1000, category=cls.categories[i % 3])
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def full_sync(self):
+        products, categories = [], []
+        url = '/api/catalog/sync/?limit=4'
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            products += [p['id'] for p in response.data['products']]
+            categories += [c['id'] for c in response.data['categories']]
+            if not response.data['next']:
+                return response.data, products, categories
+            url = f'/api/catalog/sync/?cursor={response.data["next"]}'
+
+    def test_full_sync_pages_cover_catalog(self):
+        data, products, categories = self.full_sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual(sorted(products), sorted(p.id for p in self.products))
+        self.assertEqual(sorted(categories), sorted(c.id for c in self.categories))
+
+    def test_delta_sync_returns_changes_and_deletes(self):
+        watermark = self.full_sync()[0]['watermark']
+        changed, gone = self.products[:2]
+        gone_id = gone.id
+        changed.name = 'Producto renombrado'
+        changed.save()
+        gone.delete()
+        response = self.client.get('/api/catalog/sync/', {'since': watermark})
+        self.assertFalse(response.data['reset'])
+        self.assertEqual([p['id'] for p in response.data['products']], [changed.id])
+        self.assertEqual(response.data['deleted']['products'], [gone_id])
+
+    def test_invalid_tokens(self):
+        self.assertEqual(self.client.get('/api/catalog/sync/?cursor=zzz').status_code, 400)
+        self.assertEqual(self.client.get('/api/catalog/sync/?since=nope').status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class StockLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        category = Category.objects.create(name='Bebidas')
+        cls.juice = Product.objects.create(name='Jugo', price=1500, category=category)
+        cls.water = Product.objects.create(name='Agua', price=1000, category=category)
+        # El stock inicial entra por el libro para que ledger_drift cuadre
+        apply_movements([
+            {'product_id': cls.juice.id, 'quantity': 10, 'reason': StockMovement.RESTOCK},
+            {'product_id': cls.water.id, 'quantity': 3, 'reason': StockMovement.RESTOCK},
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def move(self, *movements):
+        return self.client.post('/api/stock/movements/', {'movements': [
+            {'product': product.id, 'quantity': quantity, 'reason': 'sale'} for product, quantity in movements
+        ]}, format='json')
+
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock
+
+    def test_only_staff_restocks(self):
+        response = self.client.post(f'/api/products/{self.juice.id}/stock/', {'quantity': 5, 'reason': 'restock'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(f'/api/products/{self.juice.id}/stock/', {'quantity': -4, 'reason': 'sale'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(self.juice), 6)
+
+    # Un UPDATE para todos los productos y un INSERT para los movimientos
+    def test_batch_query_budget(self):
+        with self.assertNumQueries(4):
+            response = self.move((self.juice, -3), (self.water, -3), (self.juice, -1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((self.stock(self.juice), self.stock(self.water)), (6, 0))
+        self.assertEqual(ledger_drift(), {})
+
+    def test_shortage_applies_nothing(self):
+        response = self.move((self.juice, -3), (self.water, -4))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['shortages'][0]['product'], self.water.id)
+        self.assertEqual((self.stock(self.juice), self.stock(self.water)), (10, 3))
+
+    def test_unknown_product(self):
+        response = self.client.post('/api/stock/movements/', {'movements': [
+            {'product': 9999, 'quantity': -1, 'reason': 'sale'}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    # Reposición entre el UPDATE rechazado y la lectura: el detalle no puede quedar vacío
+    def test_shortage_reports_rejected_rows_after_restock(self):
+        applied_at = timezone.now()
+        Product.objects.filter(pk=self.juice.pk).update(stock=20, updated_at=applied_at)
+        Product.objects.filter(pk=self.water.pk).update(stock=50)
+        with self.assertRaises(InsufficientStock) as raised:
+            raise_shortages({self.juice.id: -5, self.water.id: -4}, applied_at)
+        self.assertEqual(raised.exception.shortages, {self.water.id: (4, 50)})
+
+    def test_compaction_keeps_balance(self):
+        self.move((self.juice, -2), (self.water, -1))
+        self.assertEqual(compact_ledger(timezone.now() + timedelta(seconds=1)), (4, 2))
+        self.assertEqual(StockMovement.objects.count(), 0)
+        self.move((self.juice, -1))
+        self.assertEqual(compact_ledger(timezone.now() + timedelta(seconds=1)), (1, 1))
+        self.assertEqual(ledger_drift(), {})
+
+
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123', is_staff=True)
+        cls.user = User.objects.create_user('garzon', 'garzon@moonbar.cl', 'clave123')
+        category = Category.objects.create(name='Bebidas')
+        Product.objects.create(name='Jugo, "natural"', price='1.50', category=category, stock=3)
+
+    def test_jsonl_export(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.get('/api/products/export/?output=jsonl')
+        row = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual((row['name'], row['price'], row['stock']), ('Jugo, "natural"', '1.50', 3))
+
+    def test_export_is_for_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/products/export/').status_code, 403)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('admin', 'admin@moonbar.cl', 'clave123', is_staff=True)
+        cls.drinks = Category.objects.create(name='Bebidas')
+        Product.objects.create(name='Viejo', sku='A1', price=1, category=cls.drinks)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def upload(self, content, name='catalogo.csv'):
+        return self.client.post('/api/products/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    # Punto y coma, coma decimal, BOM, categorías nuevas y filas inválidas en un mismo archivo
+    @override_settings(PRODUCT_IMPORT={'CHUNK_SIZE': 50})
+    def test_import_creates_updates_and_reports(self):
+        lines = [
+            'sku;name;price;category;stock;extra',
+            'A1;Cerveza Kunstmann;1990,5;bebidas;4;x',
+            'B2;Limón;500;Frutas;7;',
+            ';Sin sku;1;Frutas;;',
+            'C3;Malo;abc;Frutas;-1;',
+            'B2;Repetido;1;Frutas;1;',
+            ';;;;;',
+        ]
+        lines += [f'S{i};Producto {i};{i};Categoría {i % 7};{i % 5};' for i in range(120)]
+        response = self.upload('\n'.join(lines).encode('utf-8-sig'))
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (121, 1, 3))
+        updated = Product.objects.get(sku='A1')
+        self.assertEqual(
+            (updated.name, str(updated.price), updated.stock, updated.category.name),
+            ('Cerveza Kunstmann', '1990.50', 4, 'Bebidas')
+        )
+        self.assertEqual(Category.objects.count(), 9)
+        # bulk_create no emite señales: el índice de búsqueda y el libro de stock quedan al día igual
+        self.assertEqual(list(search_products(Product.objects.all(), 'kunst')), [updated])
+        self.assertEqual(ledger_drift(), {})
+
+    def test_missing_stock_column_keeps_stock(self):
+        self.upload('sku;name;price;category;stock\nA1;Jugo;1;Bebidas;4\n'.encode())
+        response = self.upload(b'sku,name,price,category\nA1,Otro,1,Bebidas\n')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Product.objects.get(sku='A1').stock, 4)
+
+    def test_invalid_files(self):
+        self.assertEqual(self.upload(b'name,price\n').status_code, 400)
+        self.assertEqual(self.upload(b'x', name='catalogo.xlsx').status_code, 400)
+        # Un campo sobre el límite del módulo csv
+        oversized = b'sku,name,price,category\nA1,' + b'x' * 200000 + b',1,Bebidas\n'
+        self.assertEqual(self.upload(oversized).status_code, 400)
+
+    # Excel en español guarda en cp1252: se lee igual que UTF-8
+    def test_cp1252_file(self):
+        content = 'sku;name;price;category\nP1;Piña colada;3500;Cócteles\nP2;Limón;500;Cócteles\n'
+        response = self.upload(content.encode('cp1252'))
+        self.assertEqual((response.data['created'], response.data['error_count']), (2, 0))
+        self.assertEqual(Product.objects.get(sku='P1').category.name, 'Cócteles')
+
+    # Un bloque revertido no deja en el mapa las categorías que creó
+    @override_settings(PRODUCT_IMPORT={'CHUNK_SIZE': 1})
+    def test_rolled_back_chunk_forgets_its_categories(self):
+        with mock.patch('products.imports.apply_movements', side_effect=[InsufficientStock({1: (1, 0)}), None]):
+            response = self.upload(b'sku,name,price,category,stock\nN1,Uno,1,Nueva,3\nN2,Dos,1,Nueva,3\n')
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 1))
+        self.assertEqual(response.data['categories_created'], 1)
+        self.assertEqual(Product.objects.get(sku='N2').category.name, 'Nueva')
+        self.assertFalse(Product.objects.filter(sku='N1').exists())
+
+    # sku vacío se guarda como NULL: varios productos sin sku no chocan con la restricción única
+    def test_products_without_sku(self):
+        for name in ('Uno', 'Dos'):
+            response = self.client.post(
+                '/api/products/', {'name': name, 'price': 1, 'category': self.drinks.id, 'sku': ''}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
@@ -7,4 +7,11 @@ urlpatterns = [
     path('categories/', views.category_list, name='category-list'),
     path('categories/<int:pk>/', views.category_detail, name='category-detail'),
     path('products/', views.product_list, name='product-list'),
+    path('products/export/', views.product_export, name='product-export'),
+    path('products/import/', views.product_import, name='product-import'),
+    path('products/autocomplete/', views.product_autocomplete, name='product-autocomplete'),
+    path('products/autocomplete/stats/', views.product_autocomplete_stats, name='product-autocomplete-stats'),
+    path('products/<int:pk>/stock/', views.product_stock, name='product-stock'),
+    path('stock/movements/', views.stock_movements_batch, name='stock-movements-batch'),
+    path('catalog/sync/', views.catalog_sync, name='catalog-sync'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,18 +1,46 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
-from django.db.models import Q
+from .models import Category, Product, StockMovement
+from .serializers import CategorySerializer, ProductSerializer, StockMovementSerializer, CompiledProductSerializer
+from .search import search_products
+from .pagination import ProductPagination, CategoryPagination, StockMovementPagination
+from .conditional import catalog_etag, catalog_last_modified
+from api.conditional import conditional_get
+from api import compiled, exports
+from api.response_cache import cache_response
+from api.streaming import StreamingJSONResponse, wants_stream
+from api.fieldsets import requested_fields
+from django.db.models import Count
+from . import autocomplete
+from .sync import InvalidSyncToken, sync_catalog
+from .imports import ImportFormatError, import_products
+from .stock import InsufficientStock, apply_movements, get_setting as get_stock_setting
+import time
+
+def parse_bool(value):
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes', 'si')
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@conditional_get(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+@cache_response(('catalog',))
 def category_list(request):
     if request.method == 'GET':
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True, context={'request': request})
-        return Response(serializer.data)
+        categories = Category.objects.annotate(num_products=Count('products'))
+
+        is_active = parse_bool(request.query_params.get('is_active'))
+        if is_active is not None:
+            categories = categories.filter(is_active=is_active)
+
+        paginator = CategoryPagination()
+        page = paginator.paginate_queryset(categories, request)
+        serializer = CategorySerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
     elif request.method == 'POST':
         serializer = CategorySerializer(data=request.data, context={'request': request})
@@ -46,24 +74,46 @@ def category_detail(request, pk):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@conditional_get(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+@cache_response(('catalog',))
 def product_list(request):
     if request.method == 'GET':
         search = request.query_params.get('search', '')
         category = request.query_params.get('category', '')
         
-        products = Product.objects.all()
-        
-        if search:
-            products = products.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search)
-            )
+        products = Product.objects.select_related('category')
+        paginator = ProductPagination()
         
         if category:
             products = products.filter(category_id=category)
-            
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+
+        is_available = parse_bool(request.query_params.get('is_available'))
+        if is_available is not None:
+            products = products.filter(is_available=is_available)
+
+        in_stock = parse_bool(request.query_params.get('in_stock'))
+        if in_stock is not None:
+            products = products.filter(stock__gt=0) if in_stock else products.filter(stock=0)
+
+        if search:
+            # Usa el índice de texto completo y ordena por relevancia; va después de los filtros
+            products = search_products(products, search)
+            paginator.ordering = ('search_rank', 'id')
+
+        # ?fields=id,name,price,stock para terminales: sin description, image ni el join a categoría
+        fields = requested_fields(request, CompiledProductSerializer.field_names())
+        ordering = paginator.get_ordering(request)
+        if wants_stream(request):
+            return StreamingJSONResponse(products, CompiledProductSerializer(fields=fields), ordering=ordering)
+
+        if compiled.get_setting('ENABLED'):
+            return CompiledProductSerializer(fields=fields).paginate(paginator, products, request)
+
+        extra = [field.lstrip('-') for field in ordering]
+        products = ProductSerializer.prune_queryset(products, fields, extra=extra)
+        page = paginator.paginate_queryset(products, request)
+        serializer = ProductSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
 
     elif request.method == 'POST':
         if not request.user.is_staff:
@@ -71,8 +121,190 @@ def product_list(request):
                 {"detail": "No tienes permiso para realizar esta acción"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer = ProductSerializer(data=request.data)
+        serializer = ProductSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+PRODUCT_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('category', 'category__name'),
+    ('price', 'price'),
+    ('stock', 'stock'),
+    ('is_available', 'is_available'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_export(request):
+    if not request.user.is_staff:
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    output = request.query_params.get('output', exports.CSV)
+    if output not in exports.FORMATS:
+        return Response(
+            {"detail": f"El parámetro output debe ser uno de: {', '.join(exports.FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    products = Product.objects.order_by('id')
+    category = request.query_params.get('category', '')
+    if category:
+        products = products.filter(category_id=category)
+    is_available = parse_bool(request.query_params.get('is_available'))
+    if is_available is not None:
+        products = products.filter(is_available=is_available)
+    return exports.export_response(products, PRODUCT_EXPORT_COLUMNS, 'productos', output)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def product_import(request):
+    if not request.user.is_staff:
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({"detail": "Debes adjuntar el archivo en el campo file"}, status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = upload.name.rsplit('.', 1)[-1].lower() if '.' in upload.name else ''
+    try:
+        report = import_products(upload, file_format, user=request.user)
+    except ImportFormatError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def catalog_sync(request):
+    try:
+        limit = int(request.query_params.get('limit', 0))
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        return Response({"detail": "El parámetro limit debe ser un entero positivo"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data = sync_catalog(
+            since=request.query_params.get('since'),
+            token=request.query_params.get('cursor'),
+            limit=limit or None,
+            context={'request': request}
+        )
+    except InvalidSyncToken as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_autocomplete(request):
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('type') or None
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), autocomplete.get_setting('MAX_LIMIT'))
+    except ValueError:
+        return Response(
+            {"detail": "El parámetro limit debe ser un número"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start = time.perf_counter()
+    results = autocomplete.autocomplete(query, limit=max(limit, 1), kind=kind)
+    return Response({
+        'results': results,
+        'took_ms': round((time.perf_counter() - start) * 1000, 3),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_autocomplete_stats(request):
+    if not request.user.is_staff:
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return Response(autocomplete.index.stats())
+
+def can_apply_movements(user, movements):
+    # Cualquier usuario puede registrar ventas; el resto de los movimientos es de staff
+    return user.is_staff or all(m['reason'] == StockMovement.SALE for m in movements)
+
+def insufficient_stock_response(error):
+    return Response(
+        {
+            "detail": str(error),
+            "shortages": [
+                {"product": pk, "requested": requested, "available": available}
+                for pk, (requested, available) in sorted(error.shortages.items())
+            ]
+        },
+        status=status.HTTP_409_CONFLICT
+    )
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def product_stock(request, pk):
+    if request.method == 'GET':
+        movements = StockMovement.objects.filter(product_id=pk)
+        paginator = StockMovementPagination()
+        page = paginator.paginate_queryset(movements, request)
+        serializer = StockMovementSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    elif request.method == 'POST':
+        data = request.data.copy()
+        data['product'] = pk
+        serializer = StockMovementSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not can_apply_movements(request.user, [serializer.validated_data]):
+            return Response(
+                {"detail": "No tienes permiso para realizar esta acción"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            movement = apply_movements([serializer.validated_data], user=request.user)[0]
+        except Product.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
+            return insufficient_stock_response(e)
+        return Response(StockMovementSerializer(movement).data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stock_movements_batch(request):
+    movements = request.data.get('movements')
+    if not isinstance(movements, list) or not movements:
+        return Response(
+            {"detail": "Se requiere una lista de movimientos"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(movements) > get_stock_setting('MAX_BATCH'):
+        return Response(
+            {"detail": f"Máximo {get_stock_setting('MAX_BATCH')} movimientos por lote"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = StockMovementSerializer(data=movements, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not can_apply_movements(request.user, serializer.validated_data):
+        return Response(
+            {"detail": "No tienes permiso para realizar esta acción"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    try:
+        created = apply_movements(serializer.validated_data, user=request.user)
+    except Product.DoesNotExist as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except InsufficientStock as e:
+        return insufficient_stock_response(e)
+    return Response(StockMovementSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
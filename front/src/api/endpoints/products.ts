@@ -1,11 +1,11 @@
 import api from '../axios';
-import { Category, PaginatedProducts, Product } from '../../interfaces/product.interface';
+import { Category, Product } from '../../interfaces/product.interface';
+import { fetchAllPages } from '../pagination';
 
 export const ProductAPI = {
   // Categorías
   getCategories: async () => {
-    const response = await api.get<Category[]>('/api/categories/');
-    return response.data;
+    return fetchAllPages<Category>('/api/categories/');
   },
 
   createCategory: async (formData: FormData) => {
@@ -32,12 +32,13 @@ export const ProductAPI = {
 
   // Productos
   getProducts: async (params?: { 
-    page?: number; 
     page_size?: number; 
-    search?: string 
+    search?: string;
+    ordering?: string;
+    is_available?: boolean;
+    in_stock?: boolean;
   }) => {
-    const response = await api.get<PaginatedProducts>('/api/products/', { params });
-    return response.data;
+    return fetchAllPages<Product>('/api/products/', params);
   },
 
   getProductById: async (id: number) => {
@@ -1,10 +1,10 @@
 import { User, UserActivity } from "../../interfaces";
 import api from "../axios";
+import { fetchAllPages } from "../pagination";
 
 export const UserAPI = {
   getAll: async () => {
-    const response = await api.get<User[]>("/api/users/");
-    return response.data;
+    return fetchAllPages<User>("/api/users/");
   },
 
   updateUser: async (id: number, userData: Partial<User>) => {
@@ -61,8 +61,7 @@ export const UserAPI = {
     activity_type?: string;
     username?: string;
   }) => {
-    const response = await api.get("/api/users/activity-logs/", { params });
-    return response.data;
+    return fetchAllPages<UserActivity>("/api/users/activity-logs/", params);
   },
 
   logActivity: async (activityData: UserActivity) => {
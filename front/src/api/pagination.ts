@@ -0,0 +1,21 @@
+import api from "./axios";
+
+export interface CursorPage<T> {
+  next: string | null;
+  results: T[];
+}
+
+// El backend pagina por cursor; se recorren las páginas siguiendo "next"
+export const fetchAllPages = async <T,>(url: string, params?: object): Promise<T[]> => {
+  const items: T[] = [];
+  let next: string | null = url;
+  let query = params;
+  while (next) {
+    const response: { data: CursorPage<T> } = await api.get<CursorPage<T>>(next, { params: query });
+    items.push(...response.data.results);
+    next = response.data.next;
+    // La URL "next" ya incluye los filtros
+    query = undefined;
+  }
+  return items;
+};
@@ -64,4 +64,4 @@ export interface Group {
   user_count: number;
 }
 
-export type PartialUser = Partial<User>
\ No newline at end of file
+export type PartialUser = Partial<User>